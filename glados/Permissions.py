@@ -32,6 +32,13 @@ class Permissions(Module):
     def get_ban_expiry(self, member):
         raise NotImplementedError()
 
+    def invalidate(self, member=None):
+        """
+        Called when the roles of a member changed. If member is None, then roles of the server were changed or deleted,
+        which can affect anyone. Implementations caching resolved permissions need to forget them.
+        """
+        pass
+
     async def inform_about_failure(self, message, permission_code):
         """
         If check_permissions() doesn't return OK, then you can call this to send a direct message to the user informing
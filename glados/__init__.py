@@ -1,7 +1,14 @@
 from .bot import Bot
 from .module import Module
+from .module_loader import ModuleSpec, LazyModule
 from .Log import log
 from .cooldown import Cooldown
 from .Permissions import Permissions
 from .DummyModuleManager import DummyModuleManager
 
+from .http_client import HTTPClient, HTTPResponse
+from .persistence import JSONStore
+from .database import Database, KeyValueStore, Table
+from .members import MemberIndex
+from .help_index import HelpIndex
+from .scheduler import Scheduler, Job
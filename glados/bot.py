@@ -5,43 +5,85 @@ import asyncio
 import inspect
 import re
 import math
-import copy
 import difflib
 import os
 import quart
 from .Log import log
 from .cooldown import Cooldown
+from .database import Databases
+from .executor import CallbackExecutor, CallbackError
+from .help_index import get_help_index
+from .http_client import HTTPClient
+from .members import MemberIndex
+from .module_loader import ModuleSpec
+from .persistence import JSONStore
+from .rules import RuleEngine
+from .scheduler import Scheduler
+from .settings import TrackedDict
 from .tools.path import add_import_paths
 from .Permissions import Permissions
 from .DummyModuleManager import DummyModuleManager
 from os.path import isfile
-from .module import Module
+from .module import Module, current_server_instance
 comment_pattern = re.compile('`(.*?)`')
 
+# Module class -> names of its callback methods
+_callback_names = dict()
+
 
 class ServerInstance(object):
-    def __init__(self, client, settings, server, webapp):
+    def __init__(self, client, settings, server, webapp, http, persistence, databases, scheduler):
         self.client = client
         self.settings = settings
         self.server = server
         self.webapp = webapp
+        self.http = http
+        self.persistence = persistence
+        self.databases = databases
+        self.scheduler = scheduler
+        self.member_index = MemberIndex(server)
         self.callbacks = list()
+        self.modules = list()
         self.permissions = None
         self.module_manager = None
         self.__cooldown = Cooldown()
 
+        # Dispatch index built from self.callbacks, see rebuild_dispatch_index()
+        self.__command_index = dict()  # command name -> [(obj, callback), ...]
+        self.__rule_engine = RuleEngine(())
+        self.__bot_rule_engine = RuleEngine(())
+        self.__help_index = None
+
+        execution = self.settings.setdefault('callbacks', {})
+        execution.setdefault('concurrent', False)
+        execution.setdefault('max concurrent', 16)
+        execution.setdefault('timeout', 0)
+        self.__executor = CallbackExecutor(execution['max concurrent'], execution['timeout'])
+
         self.root_data_dir = self.settings.setdefault('modules', {}).setdefault('data', 'data')
         self.global_data_dir = os.path.join(self.root_data_dir, 'global_cache')
         self.local_data_dir = os.path.join(self.root_data_dir, self.server.id)
 
-    def instantiate_modules(self, class_list, whitelist):
-        for full_name, class_ in sorted(class_list):
+    def instantiate_modules(self, class_list, whitelist, lazy=True):
+        """
+        :param class_list: A list of (full name, glados.ModuleSpec or class) tuples.
+        :param whitelist: Maps the full names of modules to the IDs of the only servers they are loaded on.
+        :param lazy: If False, modules that could be loaded on first use are instantiated right away.
+        """
+        # Modules expect their data directories to exist in __init__ already
+        if not os.path.isdir(self.global_data_dir):
+            os.mkdir(self.global_data_dir)
+        if not os.path.isdir(self.local_data_dir):
+            os.mkdir(self.local_data_dir)
+
+        for full_name, class_ in sorted(class_list, key=lambda x: x[0]):
             mod_whitelist = whitelist.get(full_name, ())
             if len(mod_whitelist) > 0 and self.server.id not in mod_whitelist:
                 continue
-            obj = class_(self, full_name)
-            self.callbacks += [(obj, member) for name, member in inspect.getmembers(obj, predicate=inspect.ismethod)
-                         if hasattr(member, 'commands') or hasattr(member, 'rules') or hasattr(member, 'bot_rules')]
+            obj = class_(self, full_name) if lazy or not isinstance(class_, ModuleSpec) else \
+                class_.instantiate(self, full_name)
+            self.modules.append(obj)
+            self.callbacks += self.__callbacks_of(obj)
 
             # Need access to the permissions module for managing things like admins/botmods
             if full_name.split('.')[-1] == 'Permissions':
@@ -49,15 +91,129 @@ class ServerInstance(object):
             if full_name.split('.')[-1] == 'ModuleManager':
                 self.module_manager = obj
 
+            self.scheduler.register(self.job_owner(obj), self.__job_handler(obj))
+
         if self.permissions is None:
             self.permissions = Permissions(self, 'bot.dummy.DummyPermissions')
         if self.module_manager is None:
             self.module_manager = DummyModuleManager(self, 'bot.dummy.DummyModuleManager')
 
-        if not os.path.isdir(self.global_data_dir):
-            os.mkdir(self.global_data_dir)
-        if not os.path.isdir(self.local_data_dir):
-            os.mkdir(self.local_data_dir)
+        self.rebuild_dispatch_index()
+
+    def replace_module(self, old, new):
+        """
+        Puts a module in place of the glados.LazyModule that stood in for it until it was needed.
+        """
+        self.modules[self.modules.index(old)] = new
+        callbacks = list()
+        for obj, callback in self.callbacks:
+            if obj is not old:
+                callbacks.append((obj, callback))
+            elif not any(x[0] is new for x in callbacks):
+                callbacks += self.__callbacks_of(new)
+        self.callbacks = callbacks
+        self.scheduler.register(self.job_owner(new), self.__job_handler(new))
+        self.rebuild_dispatch_index()
+
+    @staticmethod
+    def __callbacks_of(obj):
+        # Looked up once per class instead of on every instance, which would also evaluate properties like
+        # local_database (and open the database) for every module on every server
+        names = _callback_names.get(type(obj), None)
+        if names is None:
+            names = _callback_names[type(obj)] = [
+                name for name, member in inspect.getmembers(type(obj), predicate=inspect.isfunction)
+                if hasattr(member, 'commands') or hasattr(member, 'rules') or hasattr(member, 'bot_rules')]
+        return [(obj, member) for member in (getattr(obj, name) for name in names) if inspect.ismethod(member)]
+
+    def rebuild_dispatch_index(self):
+        """
+        Builds the lookup tables used to figure out which callbacks need to be called for a message, and the help
+        index. Blacklisted modules are left out, so this has to be called again whenever a module is blacklisted or
+        whitelisted.
+        """
+        command_index = dict()
+        rule_list = list()
+        bot_rule_list = list()
+        for obj, callback in self.callbacks:
+            if self.module_manager.is_blacklisted(obj):
+                continue
+            for command, argument_list_str, description in getattr(callback, 'commands', ()):
+                callbacks = command_index.setdefault(command, list())
+                if (obj, callback) not in callbacks:
+                    callbacks.append((obj, callback))
+            for rule, ignorecommands in getattr(callback, 'rules', ()):
+                rule_list.append((obj, callback, rule, ignorecommands))
+            for rule, ignorecommands in getattr(callback, 'bot_rules', ()):
+                bot_rule_list.append((obj, callback, rule, ignorecommands))
+
+        self.__command_index = command_index
+        self.__rule_engine = RuleEngine(rule_list)
+        self.__bot_rule_engine = RuleEngine(bot_rule_list)
+        self.__help_index = self.__build_help_index()
+
+    @property
+    def help_index(self):
+        """
+        :return: Returns the glados.HelpIndex of the commands on this server. It's rebuilt with the dispatch index, and
+        when the command prefix was changed.
+        """
+        if self.__help_index is None or self.__help_index.prefix != self.command_prefix:
+            self.__help_index = self.__build_help_index()
+        return self.__help_index
+
+    def __build_help_index(self):
+        return get_help_index(self.command_prefix, [
+            (type(obj), callback.__func__, not self.module_manager.is_blacklisted(obj))
+            for obj, callback in self.callbacks if hasattr(callback, 'commands')])
+
+    def shutdown(self):
+        """
+        Gives all modules a chance to write buffered data to disk. Called when the bot exits or the server becomes
+        unavailable.
+        """
+        for obj in self.modules:
+            self.scheduler.unregister(self.job_owner(obj))
+            if obj.scope == Module.PROCESS:
+                continue  # shut down by the bot when it exits
+            try:
+                obj.shutdown()
+            except:
+                log('Error: Failed to shut down module {}\n{}'.format(obj.full_name, traceback.format_exc()))
+        self.persistence.flush()
+        self.databases.flush()
+
+    def job_owner(self, obj):
+        """
+        :return: Returns the name the jobs of a module are stored under in the scheduler.
+        """
+        return '{}/{}'.format(self.server.id, obj.full_name)
+
+    def __job_handler(self, obj):
+        async def handler(job):
+            # Jobs of blacklisted modules are dropped (or skipped, if periodic)
+            if not self.module_manager.is_blacklisted(obj):
+                current_server_instance.set(self)
+                await obj.on_scheduled(job)
+        return handler
+
+    async def member_joined(self, member):
+        self.member_index.add(member)
+        await self.__call_member_hooks('on_member_join', member)
+
+    async def member_left(self, member):
+        self.member_index.remove(member)
+        await self.__call_member_hooks('on_member_remove', member)
+
+    async def __call_member_hooks(self, name, member):
+        current_server_instance.set(self)
+        for obj in self.modules:
+            if self.module_manager.is_blacklisted(obj):
+                continue
+            try:
+                await getattr(obj, name)(member)
+            except:
+                log('Error: {}.{} failed\n{}'.format(obj.full_name, name, traceback.format_exc()))
 
     @property
     def command_prefix(self):
@@ -90,45 +246,18 @@ class ServerInstance(object):
             return ret
 
         # check if any issued commands match anything in the loaded callbacks
-        for obj, callback in self.callbacks:
-            if self.module_manager.is_blacklisted(obj):
-                continue
-            if hasattr(callback, 'commands'):
-                callback_commands = list(zip(*callback.commands))[0]
-                for command, content in commands:
-                    if command in callback_commands:
-                        ret.append((obj, callback, content))
+        for command, content in commands:
+            for obj, callback in self.__command_index.get(command, ()):
+                ret.append((obj, callback, content))
         return ret
 
     def __get_matches_that_could_be_executed(self, message):
-        ret = list()
-        for obj, callback in self.callbacks:
-            if self.module_manager.is_blacklisted(obj):
-                continue
-
-            # process bot messages
-            if message.author.bot:
-                if hasattr(callback, 'bot_rules'):
-                    for rule, ignorecommands in callback.bot_rules:
-                        if ignorecommands and message.content.startswith(self.command_prefix):
-                            continue
-                        match = rule.match(message.content)
-                        if match is None:
-                            continue
-                        ret.append((obj, callback, match))
-                continue
+        # process bot messages separately from message responses
+        rule_engine = self.__bot_rule_engine if message.author.bot else self.__rule_engine
+        if len(rule_engine) == 0:
+            return list()
 
-            # process message responses
-            if hasattr(callback, 'rules'):
-                for rule, ignorecommands in callback.rules:
-                    if ignorecommands and message.content.startswith(self.command_prefix):
-                        continue
-                    match = rule.match(message.content)
-                    if match is None:
-                        continue
-                    ret.append((obj, callback, match))
-
-        return ret
+        return rule_engine.match(message.content, message.content.startswith(self.command_prefix))
 
     def __apply_cooldown(self, message):
         author = message.author.name
@@ -154,6 +283,10 @@ class ServerInstance(object):
                 x.startswith(cmd_prefix)]
 
     async def process_message(self, message):
+        # Process wide modules take the server from here. Every message is handled in a task of its own, and tasks
+        # started from here (e.g. concurrent callbacks) inherit it.
+        current_server_instance.set(self)
+
         # Check if this bot has been authorized by the owner to be on this server (if enabled)
         if not self.permissions.is_server_authorized() \
             and not self.permissions.require_owner(message.author):
@@ -162,6 +295,12 @@ class ServerInstance(object):
         commands_to_process = self.__get_commands_that_could_be_executed(message, commands)
         commands_to_process += self.__get_matches_that_could_be_executed(message)
 
+        # In concurrent mode, all callbacks are submitted before anything is awaited, so that consecutive messages
+        # reach each module in order. Messages informing the user are sent afterwards.
+        concurrent = self.settings['callbacks']['concurrent']
+        jobs = list()
+        notifications = list()
+
         punish_checked = False
         user_is_punished = False
         for obj, callback, content in commands_to_process:
@@ -169,9 +308,9 @@ class ServerInstance(object):
             if code < 0:
                 cooldown = self.__apply_cooldown(message)
                 if cooldown:
-                    await self.client.send_message(message.author, cooldown)
+                    notifications.append(self.client.send_message(message.author, cooldown))
                 else:
-                    await self.permissions.inform_about_failure(message, code)
+                    notifications.append(self.permissions.inform_about_failure(message, code))
                 continue
 
             if code == Permissions.PUNISHABLE:
@@ -179,10 +318,7 @@ class ServerInstance(object):
                     cooldown = self.__apply_cooldown(message)
                     if cooldown:
                         user_is_punished = True
-                        try:
-                            await self.client.send_message(message.author, cooldown)
-                        except:
-                            log(f"User {message.author.name} was punished for using command {callback}")
+                        notifications.append(self.__send_cooldown(message, callback, cooldown))
                     punish_checked = True
                 if user_is_punished:
                     continue
@@ -193,25 +329,68 @@ class ServerInstance(object):
                 arg_string = callback.commands[-1][1]  # first command (if more than one), argument list string
                 required_arg_count = len(arg_string.split('<')) - 1
                 if len(content.split()) < required_arg_count:
-                    await obj.provide_help(callback.commands[-1][0], message)
+                    notifications.append(obj.provide_help(callback.commands[-1][0], message))
                     continue
 
-            await callback(message, content)
+            if concurrent:
+                jobs.append((obj, callback, self.__executor.submit(obj, callback, message, content)))
+                continue
+
+            for notification in notifications:
+                await notification
+            notifications = list()
+            await self.__executor.run(callback, message, content)
+
+        try:
+            for notification in notifications:
+                await notification
+        finally:
+            await self.__executor.wait(jobs)
+
+    async def __send_cooldown(self, message, callback, cooldown):
+        try:
+            await self.client.send_message(message.author, cooldown)
+        except:
+            log(f"User {message.author.name} was punished for using command {callback}")
 
 
 class Bot(object):
     def __init__(self):
         self.client = discord.Client()
+        # Modifications to the settings are recorded as they happen, and saved shortly after
+        self.__settings_changed = False
+        self.__save_settings_handle = None
         if isfile('settings.json'):
-            self.settings = json.loads(open('settings.json').read())
+            self.settings = TrackedDict(json.loads(open('settings.json').read()), self.__on_settings_changed)
         else:
-            self.settings = dict()
-        self.__original_settings = copy.deepcopy(self.settings)
-        self.class_list = list()  # (fullname, class)
+            self.settings = TrackedDict({}, self.__on_settings_changed)
+        self.__saved_settings = self.__as_json(self.settings)
+        config = self.settings.setdefault('settings', {})
+        self.__save_settings_delay = config.setdefault('save delay', 5)
+        self.__log_settings_diff = config.setdefault('log diff', False)
+        self.class_list = list()  # (fullname, ModuleSpec)
         self.server_instances = dict()
         self.whitelist = dict()
         self.webapp = quart.Quart(__name__)
 
+        http = self.settings.setdefault('http', {})
+        self.http = HTTPClient(http.setdefault('max connections', 64),
+                               http.setdefault('max connections per host', 8),
+                               http.setdefault('timeout', 30),
+                               http.setdefault('cache size', 256))
+
+        # JSON documents of the modules, see Module.store()
+        persistence = self.settings.setdefault('persistence', {})
+        self.persistence = JSONStore(persistence.setdefault('flush interval', 30))
+
+        # SQLite databases in the data directories, see Module.local_database
+        database = self.settings.setdefault('database', {})
+        self.databases = Databases(database.setdefault('flush interval', 1), database.setdefault('readers', 4))
+
+        # Timed and periodic jobs of all modules, stored in the database of the root data directory
+        data_dir = self.settings.setdefault('modules', {}).setdefault('data', 'data')
+        self.scheduler = Scheduler(self.databases.open(data_dir))
+
         self.settings.setdefault('command prefix', {}).setdefault('default', '.')
         self.settings.setdefault('auto join', {
             'note': 'This doesn\'t seem to work for bots, they don\'t have permission to just join servers. But this will work if the bot uses a normal user account instead.',
@@ -231,25 +410,16 @@ class Bot(object):
 
             try:
                 await self.server_instances[message.server.id].process_message(message)
+            except CallbackError as e:
+                for obj, callback, exc in e.failures:
+                    strings = ['**An exception occurred in {}.{} while processing a message:**'.format(
+                        obj.full_name, callback.__name__)]
+                    strings += ''.join(traceback.format_exception(type(exc), exc, exc.__traceback__)).split('\n')
+                    await self.__report_exception(message, strings)
             except Exception as e:
-                for member in self.client.get_all_members():
-                    if member.id == self.settings['permissions']['bot owner']:
-                        bot_owner = member
-                        strings = ['**An exception occurred while processing a message:**']
-                        strings += traceback.format_exc().split('\n')
-                        msgs = ['```' + x + '```' for x in Module.pack_into_messages(strings)]
-                        msgs.append('**Message by {}:**: ```{}```\n'.format(message.author.name, message.content) +
-                                    '**Server:**: ```{}```\n'.format(message.server.name) +
-                                    '**Feel free to submit this info to the issue tracker:** ' +
-                                    'https://github.com/TheComet/GLaDOS2/issues')
-                        for msg in msgs:
-                            await self.client.send_message(bot_owner, msg)
-                            if not message.author == bot_owner:
-                                await self.client.send_message(message.author, msg)
-                        break
-
-            # Write settings dict to disc (and print a diff) if a command changed it in any way
-            self.__check_if_settings_changed()
+                strings = ['**An exception occurred while processing a message:**']
+                strings += traceback.format_exc().split('\n')
+                await self.__report_exception(message, strings)
 
         @self.client.event
         async def on_message(message):
@@ -263,7 +433,7 @@ class Bot(object):
         async def on_ready():
             await self.__auto_join_channels()
             log('Running as {}'.format(self.client.user.name))
-            self.__check_if_settings_changed()
+            self.__log_startup_report()
 
         @self.client.event
         async def on_server_available(server):
@@ -271,14 +441,73 @@ class Bot(object):
                 return ()
 
             log('Server {} became available'.format(server.name))
-            s = ServerInstance(self.client, self.settings, server, self.webapp)
+            s = ServerInstance(self.client, self.settings, server, self.webapp, self.http, self.persistence,
+                               self.databases, self.scheduler)
             s.instantiate_modules(self.class_list, self.whitelist)
             self.server_instances[server.id] = s
 
+        @self.client.event
+        async def on_member_join(member):
+            s = self.server_instances.get(member.server.id, None)
+            if s is not None:
+                await s.member_joined(member)
+
+        @self.client.event
+        async def on_member_remove(member):
+            s = self.server_instances.get(member.server.id, None)
+            if s is not None:
+                await s.member_left(member)
+
+        @self.client.event
+        async def on_member_update(before, after):
+            s = self.server_instances.get(after.server.id, None)
+            if s is None:
+                return
+            s.member_index.update(before, after)
+            if before.roles != after.roles:
+                s.permissions.invalidate(after)
+
+        @self.client.event
+        async def on_server_role_create(role):
+            s = self.server_instances.get(role.server.id, None)
+            if s is not None:
+                s.member_index.rebuild_roles()
+
+        @self.client.event
+        async def on_server_role_update(before, after):
+            s = self.server_instances.get(after.server.id, None)
+            if s is not None:
+                s.member_index.rebuild_roles()
+                s.permissions.invalidate()
+
+        @self.client.event
+        async def on_server_role_delete(role):
+            s = self.server_instances.get(role.server.id, None)
+            if s is not None:
+                s.member_index.rebuild_roles()
+                s.permissions.invalidate()
+
         @self.client.event
         async def on_server_unavailable(server):
             log('Server {} became unavailable, cleaning up instances'.format(server.name))
-            self.server_instances.pop(server.id, None)
+            s = self.server_instances.pop(server.id, None)
+            if s is not None:
+                s.shutdown()
+
+    async def __report_exception(self, message, strings):
+        for member in self.client.get_all_members():
+            if member.id == self.settings['permissions']['bot owner']:
+                bot_owner = member
+                msgs = ['```' + x + '```' for x in Module.pack_into_messages(strings)]
+                msgs.append('**Message by {}:**: ```{}```\n'.format(message.author.name, message.content) +
+                            '**Server:**: ```{}```\n'.format(message.server.name) +
+                            '**Feel free to submit this info to the issue tracker:** ' +
+                            'https://github.com/TheComet/GLaDOS2/issues')
+                for msg in msgs:
+                    await self.client.send_message(bot_owner, msg)
+                    if not message.author == bot_owner:
+                        await self.client.send_message(message.author, msg)
+                break
 
     async def __auto_join_channels(self):
         for url in self.settings['auto join']['invite urls']:
@@ -293,17 +522,35 @@ class Bot(object):
                 log('Forbidden')
         return tuple()
 
-    def __check_if_settings_changed(self):
-        if self.settings == self.__original_settings:
+    def __on_settings_changed(self):
+        self.__settings_changed = True
+        if self.__save_settings_handle is not None:
             return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Not running yet, login() and run() save any changes
+            return
+        self.__save_settings_handle = loop.call_later(self.__save_settings_delay, self.__save_settings_if_changed)
 
-        a = self.__as_json(self.__original_settings).split('\n')
-        b = self.__as_json(self.settings).split('\n')
+    def __save_settings_if_changed(self):
+        """
+        Writes settings.json (and logs a diff, if enabled) if anything modified the settings since they were last saved.
+        """
+        if self.__save_settings_handle is not None:
+            self.__save_settings_handle.cancel()
+            self.__save_settings_handle = None
+        if not self.__settings_changed:
+            return
+        self.__settings_changed = False
 
-        log('Settings diff:\n{}'.format('\n'.join(difflib.unified_diff(a, b))))
+        settings = self.__as_json(self.settings)
+        if self.__log_settings_diff:
+            diff = difflib.unified_diff(self.__saved_settings.split('\n'), settings.split('\n'))
+            log('Settings diff:\n{}'.format('\n'.join(diff)))
         log('settings.json has been modified, you probably want to go edit it now')
-        self.__save_settings()
-        self.__original_settings = copy.deepcopy(self.settings)
+        self.__save_settings(settings)
+        self.__saved_settings = settings
 
     def load_classlist(self):
         add_import_paths(self.settings.setdefault('modules', {}).setdefault('paths', [
@@ -328,28 +575,42 @@ class Bot(object):
             'bot.uptime.UpTime',
         ])).union(self.whitelist)
 
-        # time to load all modules
+        # Modules whose commands and rules can be read from their source code are only imported when a server first
+        # needs them, the others are imported now
+        lazy = self.settings['modules'].setdefault('lazy', True)
         for modfullname in sorted(modules_to_import):
-
-            # get class name and namespace
-            modnamespace = modfullname.split('.')
-            classname = modnamespace[-1]
-            modnamespace = '.'.join(modnamespace[:-1])
-
-            # try importing the module
             try:
-                m = __import__(modnamespace, fromlist=[classname])
-                self.class_list.append((modfullname, getattr(m, classname)))
+                self.class_list.append((modfullname, ModuleSpec(modfullname, lazy)))
             except:
-                log('Error: Failed to import class {0}\n{1}'.format(modfullname, traceback.print_exc()))
+                log('Error: Failed to import class {0}\n{1}'.format(modfullname, traceback.format_exc()))
                 continue
 
+    def __log_startup_report(self):
+        """
+        Logs how long importing and instantiating each module took so far, slowest first.
+        """
+        specs = sorted((spec for name, spec in self.class_list),
+                       key=lambda x: -((x.import_time or 0) + x.init_time))
+        strings = ['Module startup times (import, __init__ on all servers):']
+        for spec in specs:
+            if spec.import_time is None:
+                strings.append('  {}: not loaded yet'.format(spec.full_name))
+            else:
+                strings.append('  {}: {:.1f}ms, {:.1f}ms on {} server(s){}'.format(
+                    spec.full_name, 1000 * spec.import_time, 1000 * spec.init_time, spec.instances,
+                    ' (loaded on first use)' if spec.is_lazy else ''))
+        log('\n'.join(strings))
+
     @staticmethod
     def __as_json(o):
         return json.dumps(o, indent=2, sort_keys=True)
 
-    def __save_settings(self):
-        open('settings.json', 'w').write(self.__as_json(self.settings))
+    @staticmethod
+    def __save_settings(settings):
+        # Write to a temporary file first, so a crash can't leave a half written settings.json behind
+        with open('settings.json.tmp', 'w') as f:
+            f.write(settings)
+        os.replace('settings.json.tmp', 'settings.json')
 
     async def login(self):
         args = list()
@@ -368,12 +629,13 @@ class Bot(object):
             server = type('Server', (object,), {})
             server.name = 'default'
             server.id = 'default'  # This is also a hack, so we don't create an extra entry in "command prefix"
-            s = ServerInstance(self.client, self.settings, server, self.webapp)
-            s.instantiate_modules(self.class_list, self.whitelist)
+            s = ServerInstance(self.client, self.settings, server, self.webapp, self.http, self.persistence,
+                               self.databases, self.scheduler)
+            s.instantiate_modules(self.class_list, self.whitelist, lazy=False)
 
-            self.__check_if_settings_changed()
+            self.__save_settings_if_changed()
             return ()
-        self.__check_if_settings_changed()
+        self.__save_settings_if_changed()
 
         log('Connecting...')
         await self.client.login(*args)
@@ -391,4 +653,16 @@ class Bot(object):
             traceback.print_exc()
             loop.run_until_complete(self.client.logout())
         finally:
+            for s in self.server_instances.values():
+                s.shutdown()
+            for name, spec in self.class_list:
+                if spec.shared_instance is not None:
+                    try:
+                        spec.shared_instance.shutdown()
+                    except:
+                        log('Error: Failed to shut down module {}\n{}'.format(name, traceback.format_exc()))
+            self.__save_settings_if_changed()
+            self.scheduler.shutdown()
+            self.databases.close()
+            loop.run_until_complete(self.http.close())
             loop.close()
@@ -0,0 +1,325 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Database(object):
+    """
+    An SQLite database (in WAL mode) for module data that changes a little at a time. Changing a value costs one row
+    instead of rewriting a whole JSON file. Writes are queued and committed in batches by a worker thread, so the event
+    loop never waits for the disk.
+
+    Reads can be done in two ways: fetch() runs on the worker thread after everything that was queued before it, so it
+    sees all of your own writes. read() runs on a pool of separate connections and only sees what was committed, but it
+    doesn't have to wait for any writes, which is what the web endpoints should use.
+    """
+
+    FILE_NAME = 'glados.sqlite3'
+
+    def __init__(self, file_name, flush_interval=1, readers=4):
+        """
+        :param file_name: Path of the database file, it is created if necessary.
+        :param flush_interval: Maximum number of seconds a write stays queued before it is committed.
+        :param readers: Number of threads serving read().
+        """
+        self.file_name = file_name
+        self.flush_interval = flush_interval
+
+        self.__queue = list()  # (sequence number, sql, parameters)
+        self.__sequence = 0
+        self.__pending_values = dict()  # (namespace, key) -> (sequence number, json or None if deleted)
+        self.__flush_handle = None
+        self.__local = threading.local()  # read connections of each thread
+
+        directory = os.path.dirname(file_name)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.__writer = ThreadPoolExecutor(max_workers=1)
+        self.__readers = ThreadPoolExecutor(max_workers=readers)
+        self.__connection = self.__writer.submit(self.__connect).result()
+        self.__run(self.__create_key_value_table)
+
+    def __connect(self):
+        connection = sqlite3.connect(self.file_name, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def __create_key_value_table(self, connection):
+        connection.execute('CREATE TABLE IF NOT EXISTS key_value ('
+                           'namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, '
+                           'PRIMARY KEY (namespace, key)) WITHOUT ROWID')
+        connection.commit()
+
+    def __run(self, func, *args):
+        # Runs something on the worker thread and waits for it. Only meant for things like creating tables.
+        return self.__writer.submit(func, self.__connection, *args).result()
+
+    def key_value(self, namespace):
+        """
+        :param namespace: Name of the key-value store, e.g. the name of your module.
+        :return: Returns a KeyValueStore.
+        """
+        return KeyValueStore(self, namespace)
+
+    def table(self, name, columns):
+        """
+        Creates the table if it doesn't exist yet.
+        :param name: Name of the table.
+        :param columns: Column definitions, e.g. 'name TEXT PRIMARY KEY, score INTEGER NOT NULL DEFAULT 0'
+        :return: Returns a Table.
+        """
+        def create(connection):
+            connection.execute('CREATE TABLE IF NOT EXISTS {} ({})'.format(name, columns))
+            connection.commit()
+        self.__run(create)
+        return Table(self, name)
+
+    def execute(self, sql, parameters=()):
+        """
+        Queues a statement that changes the database. It is committed together with the other queued statements some
+        time later.
+        """
+        self.__enqueue(sql, parameters)
+
+    async def fetch(self, sql, parameters=()):
+        """
+        Runs a query after all queued statements were committed.
+        :return: Returns a list of rows (sqlite3.Row, they can be indexed by column name).
+        """
+        await self.flush_async()
+        return await asyncio.get_event_loop().run_in_executor(self.__writer, self.__query, self.__connection, sql,
+                                                              parameters)
+
+    async def read(self, sql, parameters=()):
+        """
+        Runs a query on a separate connection. It doesn't wait for queued statements, so it might not see them yet.
+        :return: Returns a list of rows (sqlite3.Row, they can be indexed by column name).
+        """
+        return await asyncio.get_event_loop().run_in_executor(self.__readers, self.read_now, sql, parameters)
+
+    def read_now(self, sql, parameters=()):
+        """
+        Same as read(), except it runs right away in the calling thread. Only use it for lookups by primary key or
+        other queries that are guaranteed to be quick.
+        """
+        connection = getattr(self.__local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.file_name)
+            connection.row_factory = sqlite3.Row
+            self.__local.connection = connection
+        return self.__query(connection, sql, parameters)
+
+    @staticmethod
+    def __query(connection, sql, parameters):
+        return connection.execute(sql, parameters).fetchall()
+
+    def import_json(self, file_name, namespace):
+        """
+        Copies the entries of a JSON file containing a dict into a key-value store. Existing keys are overwritten.
+        :return: Returns the number of imported entries.
+        """
+        with open(file_name, 'rb') as f:
+            data = json.loads(f.read().decode('utf-8'))
+        store = self.key_value(namespace)
+        for key, value in data.items():
+            store[key] = value
+        self.flush()
+        return len(data)
+
+    def flush(self):
+        """
+        Commits all queued statements and waits for it. Called when the bot exits or a server becomes unavailable.
+        """
+        if self.__flush_handle is not None:
+            self.__flush_handle.cancel()
+            self.__flush_handle = None
+        if len(self.__queue) > 0:
+            queue, self.__queue = self.__queue, list()
+            self.__forget_pending_values(self.__writer.submit(self.__commit, self.__connection, queue).result())
+
+    async def flush_async(self):
+        """
+        Same as flush(), except the event loop isn't blocked while waiting.
+        """
+        if self.__flush_handle is not None:
+            self.__flush_handle.cancel()
+            self.__flush_handle = None
+        if len(self.__queue) > 0:
+            queue, self.__queue = self.__queue, list()
+            sequence = await asyncio.get_event_loop().run_in_executor(self.__writer, self.__commit, self.__connection,
+                                                                      queue)
+            self.__forget_pending_values(sequence)
+
+    def close(self):
+        self.flush()
+        self.__writer.submit(self.__connection.close).result()
+        self.__writer.shutdown()
+        self.__readers.shutdown()
+
+    @staticmethod
+    def __commit(connection, queue):
+        # One transaction for the whole batch
+        with connection:
+            for sequence, sql, parameters in queue:
+                connection.execute(sql, parameters)
+        return queue[-1][0]
+
+    def __enqueue(self, sql, parameters):
+        self.__sequence += 1
+        self.__queue.append((self.__sequence, sql, parameters))
+        if self.__flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # Not running (yet), flush() will take care of it
+        self.__flush_handle = loop.call_later(self.flush_interval, self.__start_flush)
+
+    def __start_flush(self):
+        self.__flush_handle = None
+        asyncio.ensure_future(self.flush_async())
+
+    # Values written to key-value stores are remembered until they are committed, so they can be read back right away
+
+    def _set_value(self, namespace, key, value):
+        value = json.dumps(value)
+        self.__enqueue('INSERT OR REPLACE INTO key_value (namespace, key, value) VALUES (?, ?, ?)',
+                       (namespace, key, value))
+        self.__pending_values[(namespace, key)] = (self.__sequence, value)
+
+    def _delete_value(self, namespace, key):
+        self.__enqueue('DELETE FROM key_value WHERE namespace = ? AND key = ?', (namespace, key))
+        self.__pending_values[(namespace, key)] = (self.__sequence, None)
+
+    def _get_value(self, namespace, key):
+        """
+        :return: Returns the value as a JSON string, or None if it doesn't exist.
+        """
+        pending = self.__pending_values.get((namespace, key), None)
+        if pending is not None:
+            return pending[1]
+        rows = self.read_now('SELECT value FROM key_value WHERE namespace = ? AND key = ?', (namespace, key))
+        return rows[0][0] if len(rows) > 0 else None
+
+    def __forget_pending_values(self, sequence):
+        self.__pending_values = {k: v for k, v in self.__pending_values.items() if v[0] > sequence}
+
+
+class KeyValueStore(object):
+    """
+    A dict-like view on the rows of a namespace in the key_value table of a Database. Keys are strings, values can be
+    anything that can be serialized to JSON. Getting and setting single values is cheap and doesn't block, listing all
+    of them has to be awaited.
+    """
+
+    def __init__(self, database, namespace):
+        self.database = database
+        self.namespace = namespace
+
+    def get(self, key, default=None):
+        value = self.database._get_value(self.namespace, key)
+        return default if value is None else json.loads(value)
+
+    def __getitem__(self, key):
+        value = self.database._get_value(self.namespace, key)
+        if value is None:
+            raise KeyError(key)
+        return json.loads(value)
+
+    def __setitem__(self, key, value):
+        self.database._set_value(self.namespace, key, value)
+
+    def __delitem__(self, key):
+        self.database._delete_value(self.namespace, key)
+
+    def __contains__(self, key):
+        return self.database._get_value(self.namespace, key) is not None
+
+    async def items(self):
+        """
+        :return: Returns a list of (key, value) tuples, including values that were not committed yet.
+        """
+        rows = await self.database.fetch('SELECT key, value FROM key_value WHERE namespace = ?', (self.namespace,))
+        return [(key, json.loads(value)) for key, value in rows]
+
+    async def is_empty(self):
+        rows = await self.database.fetch('SELECT 1 FROM key_value WHERE namespace = ? LIMIT 1', (self.namespace,))
+        return len(rows) == 0
+
+
+class Table(object):
+    """
+    Thin helper around a table of a Database. Changes are queued like Database.execute(), select() sees them.
+    """
+
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+
+    def insert(self, row, replace=False):
+        """
+        :param row: A dict mapping column names to values.
+        :param replace: Replace the existing row if the primary key already exists.
+        """
+        columns = list(row)
+        self.database.execute('INSERT {}INTO {} ({}) VALUES ({})'.format(
+            'OR REPLACE ' if replace else '', self.name, ', '.join(columns), ', '.join('?' * len(columns))),
+            tuple(row[c] for c in columns))
+
+    def update(self, values, where, parameters=()):
+        """
+        :param values: A dict mapping column names to their new values.
+        :param where: SQL condition, e.g. 'name = ?'
+        """
+        columns = list(values)
+        self.database.execute('UPDATE {} SET {} WHERE {}'.format(
+            self.name, ', '.join('{} = ?'.format(c) for c in columns), where),
+            tuple(values[c] for c in columns) + tuple(parameters))
+
+    def delete(self, where, parameters=()):
+        self.database.execute('DELETE FROM {} WHERE {}'.format(self.name, where), parameters)
+
+    async def select(self, where=None, parameters=(), order_by=None, limit=None):
+        """
+        :return: Returns a list of rows (sqlite3.Row, they can be indexed by column name).
+        """
+        sql = 'SELECT * FROM {}'.format(self.name)
+        if where is not None:
+            sql += ' WHERE {}'.format(where)
+        if order_by is not None:
+            sql += ' ORDER BY {}'.format(order_by)
+        if limit is not None:
+            sql += ' LIMIT {:d}'.format(limit)
+        return await self.database.fetch(sql, parameters)
+
+
+class Databases(object):
+    """
+    Opens one Database per data directory and keeps it open for the lifetime of the bot.
+    """
+
+    def __init__(self, flush_interval=1, readers=4):
+        self.flush_interval = flush_interval
+        self.readers = readers
+        self.__databases = dict()  # directory -> Database
+
+    def open(self, directory):
+        database = self.__databases.get(directory, None)
+        if database is None:
+            database = Database(os.path.join(directory, Database.FILE_NAME), self.flush_interval, self.readers)
+            self.__databases[directory] = database
+        return database
+
+    def flush(self):
+        for database in self.__databases.values():
+            database.flush()
+
+    def close(self):
+        for database in self.__databases.values():
+            database.close()
+        self.__databases.clear()
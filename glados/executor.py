@@ -0,0 +1,88 @@
+import asyncio
+
+
+class CallbackError(Exception):
+    """
+    Raised after all callbacks for a message have finished, if one or more of them raised an exception.
+    """
+    def __init__(self, failures):
+        """
+        :param failures: A list of (obj, callback, exception) tuples.
+        """
+        super(CallbackError, self).__init__('{} callback(s) failed'.format(len(failures)))
+        self.failures = failures
+
+
+class CallbackExecutor(object):
+    """
+    Runs module callbacks as concurrent tasks. Callbacks belonging to the same module are still executed one after
+    another, in the order they were submitted, so modules like Log or Seen see messages in order. Callbacks of
+    different modules run concurrently, up to a maximum number of callbacks at a time.
+    """
+
+    def __init__(self, max_concurrent=16, timeout=0):
+        """
+        :param max_concurrent: The maximum number of callbacks allowed to run at the same time.
+        :param timeout: The number of seconds a callback may run before it is cancelled. 0 means no timeout.
+        """
+        self.__max_concurrent = max_concurrent
+        self.__semaphore = None
+        self.__timeout = timeout
+        self.__tails = dict()  # module -> the last task submitted for that module
+
+    def submit(self, obj, callback, *args):
+        """
+        Schedules a callback for execution. This does not yield to the event loop, so callbacks submitted for
+        consecutive messages keep their order.
+        :param obj: The module the callback belongs to.
+        :param callback: The coroutine function to call.
+        :param args: Arguments to pass to the callback.
+        :return: Returns the task running the callback.
+        """
+        previous = self.__tails.get(obj, None)
+        task = asyncio.ensure_future(self.__run(previous, callback, args))
+        self.__tails[obj] = task
+
+        def forget(t):
+            if self.__tails.get(obj, None) is t:
+                del self.__tails[obj]
+        task.add_done_callback(forget)
+        return task
+
+    async def wait(self, jobs):
+        """
+        Waits for the submitted callbacks to finish.
+        :param jobs: A list of (obj, callback, task) tuples.
+        :raises CallbackError: If any of the callbacks raised an exception or timed out.
+        """
+        if len(jobs) == 0:
+            return
+        results = await asyncio.gather(*(task for obj, callback, task in jobs), return_exceptions=True)
+        failures = [(obj, callback, result) for (obj, callback, task), result in zip(jobs, results)
+                    if isinstance(result, BaseException)]
+        if failures:
+            raise CallbackError(failures)
+
+    async def run(self, callback, *args):
+        """
+        Calls a callback directly, applying the configured timeout.
+        """
+        if self.__timeout > 0:
+            try:
+                await asyncio.wait_for(callback(*args), self.__timeout)
+            except asyncio.TimeoutError:
+                raise asyncio.TimeoutError('Callback {} timed out after {} seconds'.format(
+                    callback.__qualname__, self.__timeout))
+        else:
+            await callback(*args)
+
+    async def __run(self, previous, callback, args):
+        # Wait for the module's previous callback to complete. Its result (or exception) is reported elsewhere.
+        if previous is not None:
+            await asyncio.wait([previous])
+
+        # Semaphores bind to the event loop on creation, so create it once we know we're running inside it
+        if self.__semaphore is None:
+            self.__semaphore = asyncio.Semaphore(self.__max_concurrent)
+        async with self.__semaphore:
+            await self.run(callback, *args)
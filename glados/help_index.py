@@ -0,0 +1,113 @@
+import weakref
+
+# Privileged help levels. A command that has none of these attributes (see glados.Permissions) is listed by .help
+LEVELS = ('moderator', 'admin', 'owner')
+
+
+def trigrams(string):
+    return set(string[i:i+3] for i in range(len(string) - 2))
+
+
+def render_help(prefix, func):
+    """
+    :param func: A callback function decorated with glados.Module.command().
+    :return: Returns the help strings of the commands of the callback.
+    """
+    for command, argument_list_str, description in func.commands[::-1]:  # decorators are applied in reverse
+        if not description:
+            continue
+        if argument_list_str:
+            yield '{}{} **{}** -- *{}*'.format(prefix, command, argument_list_str, description)
+        else:
+            yield '{}{} -- *{}*'.format(prefix, command, description)
+
+
+class HelpIndex(object):
+    """
+    The help strings of all commands on a server, rendered with the server's command prefix. The lists sent by .help
+    and the privileged help commands are sorted up front, the help of a single command is looked up by module and
+    command name, and searches only check the strings that contain all trigrams of the search term. Servers with the
+    same prefix and the same active modules (which is most of them) share one index, see get_help_index().
+    """
+
+    def __init__(self, prefix, entries):
+        """
+        :param prefix: The command prefix the help strings start with.
+        :param entries: (module class, callback function, active) tuples for every callback that has commands. Commands
+        of modules that aren't active (because they're blacklisted) can be looked up, but aren't listed.
+        """
+        self.prefix = prefix
+        self.__commands = dict()  # (module class, command) -> help strings
+        self.__modules = dict()  # (module class, level) -> help strings, level is None for casual commands
+        lists = {level: list() for level in (None,) + LEVELS}
+        for class_, func, active in sorted(entries, key=lambda x: (x[0].__qualname__, x[1].__name__)):
+            strings = list(render_help(prefix, func))
+            for command in set(x[0] for x in func.commands):
+                self.__commands.setdefault((class_, command), list()).extend(strings)
+            for level in [level for level in LEVELS if hasattr(func, level)] or [None]:
+                self.__modules.setdefault((class_, level), list()).extend(strings)
+                if active:
+                    lists[level] += strings
+
+        self.__lists = dict()  # level -> sorted help strings
+        self.__postings = dict()  # level -> {trigram: set of indices into the list}
+        for level, strings in lists.items():
+            strings.sort()
+            postings = dict()
+            for i, string in enumerate(strings):
+                for gram in trigrams(string):
+                    postings.setdefault(gram, set()).add(i)
+            self.__lists[level] = strings
+            self.__postings[level] = postings
+
+    def command_help(self, class_, command):
+        """
+        :return: Returns the help strings of all callbacks of the module class that handle the command.
+        """
+        return self.__commands.get((class_, command), [])
+
+    def module_help(self, class_, level=None):
+        """
+        :param level: None for the commands anyone can use, or one of 'moderator', 'admin' and 'owner'.
+        :return: Returns the help strings of the commands of the module class.
+        """
+        return self.__modules.get((class_, level), [])
+
+    def search(self, level=None, terms=()):
+        """
+        :param level: None for the commands anyone can use, or one of 'moderator', 'admin' and 'owner'.
+        :param terms: If not empty, only help strings containing at least one of these are returned.
+        :return: Returns a sorted list of the help strings of the active modules. It may be shared, don't modify it.
+        """
+        strings = self.__lists[level]
+        if len(terms) == 0:
+            return strings
+        found = set()
+        for term in terms:
+            found.update(self.__find(level, term))
+        return [strings[i] for i in sorted(found)]
+
+    def __find(self, level, term):
+        strings = self.__lists[level]
+        grams = trigrams(term)
+        if len(grams) == 0:
+            return (i for i, string in enumerate(strings) if term in string)
+        postings = self.__postings[level]
+        candidates = sorted((postings.get(gram, set()) for gram in grams), key=len)
+        return (i for i in candidates[0].intersection(*candidates[1:]) if term in strings[i])
+
+
+# Indices in use by at least one server, so servers with the same prefix and modules don't each build their own
+_help_indices = weakref.WeakValueDictionary()
+
+
+def get_help_index(prefix, entries):
+    """
+    :return: Returns the glados.HelpIndex for the prefix and callbacks (see HelpIndex.__init__()), building it if no
+    server uses the same one yet.
+    """
+    key = (prefix, frozenset(entries))
+    index = _help_indices.get(key, None)
+    if index is None:
+        index = _help_indices[key] = HelpIndex(prefix, entries)
+    return index
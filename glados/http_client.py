@@ -0,0 +1,133 @@
+import asyncio
+import json
+import time
+import aiohttp
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+
+class HTTPResponse(object):
+    """
+    A fully read HTTP response. Unlike aiohttp's response object, this can be kept around (and cached) after the
+    connection was released.
+    """
+
+    def __init__(self, url, status, headers, body):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def text(self, encoding='utf-8'):
+        return self.body.decode(encoding, errors='replace')
+
+    def json(self):
+        return json.loads(self.text())
+
+
+class HTTPClient(object):
+    """
+    Shared asynchronous HTTP client. All modules go through the same connection pool, so a slow upstream never blocks
+    the event loop. The number of simultaneous requests to a single host is limited, every request has a timeout,
+    and responses to GET requests can optionally be cached.
+    """
+
+    def __init__(self, max_connections=64, max_connections_per_host=8, timeout=30, cache_size=256):
+        """
+        :param max_connections: Size of the connection pool.
+        :param max_connections_per_host: Maximum number of simultaneous requests to the same host.
+        :param timeout: Default number of seconds a request may take, including reading the body.
+        :param cache_size: Maximum number of responses kept in the response cache.
+        """
+        self.__max_connections = max_connections
+        self.__max_connections_per_host = max_connections_per_host
+        self.__timeout = timeout
+        self.__cache_size = cache_size
+        self.__cache = OrderedDict()  # key -> (expiry time, HTTPResponse)
+        self.__host_semaphores = dict()
+        self.__session = None
+
+    @property
+    def session(self):
+        """
+        :return: The underlying aiohttp.ClientSession. It is created the first time it's needed, because it has to be
+        created from within the event loop.
+        """
+        if self.__session is None or self.__session.closed:
+            connector = aiohttp.TCPConnector(limit=self.__max_connections)
+            self.__session = aiohttp.ClientSession(connector=connector)
+        return self.__session
+
+    async def request(self, method, url, params=None, headers=None, data=None, json=None, timeout=None, cache=0,
+                      verify_ssl=True):
+        """
+        Performs an HTTP request and reads the whole response.
+        :param method: 'GET', 'POST', etc.
+        :param url: The URL to request.
+        :param params: Optional dict of query string parameters.
+        :param headers: Optional dict of headers.
+        :param data: Optional request body.
+        :param json: Optional object to send as a JSON request body.
+        :param timeout: Number of seconds before giving up. Defaults to the client's timeout.
+        :param cache: Number of seconds the response to a GET request may be served from the cache. 0 disables caching.
+        :param verify_ssl: If False, the certificate of an HTTPS server isn't checked.
+        :return: An HTTPResponse.
+        :raises asyncio.TimeoutError: If the request took too long.
+        """
+        key = None
+        if cache > 0 and method == 'GET':
+            key = (url, tuple(sorted((params or {}).items())), tuple(sorted((headers or {}).items())))
+            cached = self.__cache.get(key, None)
+            if cached is not None:
+                expiry, response = cached
+                if expiry > time.monotonic():
+                    self.__cache.move_to_end(key)
+                    return response
+                del self.__cache[key]
+
+        host = urlsplit(url).netloc
+        semaphore = self.__host_semaphores.get(host, None)
+        if semaphore is None:
+            semaphore = self.__host_semaphores[host] = asyncio.Semaphore(self.__max_connections_per_host)
+
+        async with semaphore:
+            response = await asyncio.wait_for(
+                self.__do_request(method, url, params=params, headers=headers, data=data, json=json,
+                                  ssl=None if verify_ssl else False),
+                timeout or self.__timeout)
+
+        if key is not None and response.status == 200:
+            self.__cache[key] = (time.monotonic() + cache, response)
+            while len(self.__cache) > self.__cache_size:
+                self.__cache.popitem(last=False)
+        return response
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def download(self, url, file_name, **kwargs):
+        """
+        Downloads a URL into a file.
+        :return: Returns the file name.
+        :raises aiohttp.ClientError: If the server didn't respond with 200.
+        """
+        response = await self.get(url, **kwargs)
+        if response.status != 200:
+            raise aiohttp.ClientError('Failed to download {} (HTTP {})'.format(url, response.status))
+        with open(file_name, 'wb') as f:
+            f.write(response.body)
+        return file_name
+
+    async def close(self):
+        if self.__session is not None:
+            await self.__session.close()
+            self.__session = None
+
+    async def __do_request(self, method, url, **kwargs):
+        kwargs = {k: v for k, v in kwargs.items() if v is not None}
+        async with self.session.request(method, url, **kwargs) as resp:
+            body = await resp.read()
+            return HTTPResponse(str(resp.url), resp.status, dict(resp.headers), body)
@@ -0,0 +1,125 @@
+class MemberIndex(object):
+    """
+    Looks up the members and roles of a server by ID, name or nickname without going through all of them. The index is
+    built the first time it is used and is kept up to date by the bot from member join, leave and update events and
+    role events. If the number of members doesn't add up anyway (e.g. because offline members were sent by discord
+    after the server became available), it is rebuilt.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.__built = False
+        self.__members = dict()  # member id -> member
+        self.__names = dict()  # name or nick -> {member id: member}
+        self.__folded_names = dict()  # same, but case folded
+        self.__role_members = dict()  # role id -> {member id: member}
+        self.__roles = dict()  # role name -> {role id: role}
+        self.__folded_roles = dict()
+
+    def get(self, member_id):
+        """
+        :return: Returns the member with the specified ID, or None if there is no such member.
+        """
+        self.__check()
+        return self.__members.get(member_id, None)
+
+    def find(self, name, ignore_case=False):
+        """
+        :param name: A user name or nickname.
+        :return: Returns a list of all members with this name or nickname.
+        """
+        self.__check()
+        if ignore_case:
+            return list(self.__folded_names.get(name.casefold(), {}).values())
+        return list(self.__names.get(name, {}).values())
+
+    def find_roles(self, name, ignore_case=False):
+        """
+        :return: Returns a list of all roles with the specified name.
+        """
+        self.__check()
+        if ignore_case:
+            return list(self.__folded_roles.get(name.casefold(), {}).values())
+        return list(self.__roles.get(name, {}).values())
+
+    def with_role(self, role):
+        """
+        :param role: A discord role object or a role ID.
+        :return: Returns a list of all members that have the role.
+        """
+        self.__check()
+        return list(self.__role_members.get(getattr(role, 'id', role), {}).values())
+
+    def __len__(self):
+        self.__check()
+        return len(self.__members)
+
+    def add(self, member):
+        if not self.__built:
+            return
+        self.remove(member)
+        self.__members[member.id] = member
+        for name in self.__names_of(member):
+            self.__names.setdefault(name, {})[member.id] = member
+            self.__folded_names.setdefault(name.casefold(), {})[member.id] = member
+        for role in member.roles:
+            self.__role_members.setdefault(role.id, {})[member.id] = member
+
+    def remove(self, member):
+        if not self.__built:
+            return
+        old = self.__members.pop(member.id, None)
+        if old is None:
+            return
+        for name in self.__names_of(old):
+            self.__discard(self.__names, name, member.id)
+            self.__discard(self.__folded_names, name.casefold(), member.id)
+        for role in old.roles:
+            self.__discard(self.__role_members, role.id, member.id)
+
+    def update(self, before, after):
+        if not self.__built:
+            return
+        # discord.py updates the member object in place, so the old names and roles have to be taken from "before"
+        self.__members[before.id] = before
+        self.add(after)
+
+    def rebuild_roles(self):
+        """
+        Called when a role was created, renamed or deleted.
+        """
+        if not self.__built:
+            return
+        self.__roles = dict()
+        self.__folded_roles = dict()
+        for role in self.server.roles:
+            self.__roles.setdefault(role.name, {})[role.id] = role
+            self.__folded_roles.setdefault(role.name.casefold(), {})[role.id] = role
+
+    def rebuild(self):
+        self.__built = True
+        self.__members = dict()
+        self.__names = dict()
+        self.__folded_names = dict()
+        self.__role_members = dict()
+        for member in list(self.server.members):
+            self.add(member)
+        self.rebuild_roles()
+
+    def __check(self):
+        if not self.__built or not len(self.__members) == len(self.server.members):
+            self.rebuild()
+
+    @staticmethod
+    def __names_of(member):
+        if member.nick and not member.nick == member.name:
+            return member.name, member.nick
+        return member.name,
+
+    @staticmethod
+    def __discard(index, key, member_id):
+        entries = index.get(key, None)
+        if entries is not None:
+            entries.pop(member_id, None)
+            if len(entries) == 0:
+                del index[key]
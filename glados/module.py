@@ -1,18 +1,41 @@
+import os
 import re
-import inspect
 import sys
+import contextvars
+
+# The server instance whose message (or event, or job) is being handled. Modules with scope PROCESS are shared by all
+# servers and take everything server specific from here.
+current_server_instance = contextvars.ContextVar('current_server_instance')
 
 
 class Module(object):
 
+    # Modules are instantiated once per server by default. A module that doesn't keep any per server state in its
+    # attributes can set scope = Module.PROCESS. It is then instantiated once and shared by all servers, and properties
+    # like server, local_data_dir, store() or command_prefix refer to the server of the message being handled.
+    SERVER = 'server'
+    PROCESS = 'process'
+    scope = SERVER
+    # Modules whose commands, rules and hooks can be read from the source are only loaded when a server first uses
+    # them (see glados.ModuleSpec). A module whose __init__ has to run at startup (to start a background task, schedule
+    # jobs, ...) is detected and loaded right away, but it can also set lazy = False to make sure.
+    lazy = True
+
     def __init__(self, server_instance, full_name):
-        # reference to the bot object, required for getting the client object or a list of all loaded modules
-        self.__server_instance = server_instance
+        # reference to the bot object, required for getting the client object or a list of all loaded modules. For
+        # process wide modules, this is the server they happened to be created for.
+        self.__own_server_instance = server_instance
         # set when the module is loaded. It will be something like "test.foo.Hello".
         self.__full_name = full_name
         # cache the discord.Member object of the bot owner
         self.__owner = None
 
+    @property
+    def __server_instance(self):
+        if self.scope == Module.PROCESS:
+            return current_server_instance.get(self.__own_server_instance)
+        return self.__own_server_instance
+
     @property
     def settings(self):
         """
@@ -29,6 +52,14 @@ class Module(object):
     def webapp(self):
         return self.__server_instance.webapp
 
+    @property
+    def http(self):
+        """
+        :return: The shared asynchronous HTTP client (glados.HTTPClient). Use this instead of requests or urllib so
+        network I/O doesn't block the bot.
+        """
+        return self.__server_instance.http
+
     @property
     def full_name(self):
         """
@@ -85,6 +116,40 @@ class Module(object):
         """
         return self.__server_instance.local_data_dir
 
+    @property
+    def local_database(self):
+        """
+        :return: Returns the glados.Database (SQLite) stored in local_data_dir. Use it instead of store() for data that
+        grows large or changes a little at a time, e.g. a score per user. Example:
+
+            self.scores = self.local_database.key_value('hello.scores')
+            self.scores[member.id] = self.scores.get(member.id, 0) + 1
+        """
+        return self.__server_instance.databases.open(self.local_data_dir)
+
+    @property
+    def global_database(self):
+        """
+        :return: Returns the glados.Database (SQLite) stored in global_data_dir, which is shared among all servers.
+        """
+        return self.__server_instance.databases.open(self.global_data_dir)
+
+    @property
+    def member_index(self):
+        """
+        :return: Returns the glados.MemberIndex of the current server. Use it to look up members by ID, name or nickname
+        instead of going through self.server.members.
+        """
+        return self.__server_instance.member_index
+
+    @property
+    def help_index(self):
+        """
+        :return: Returns the glados.HelpIndex of the current server, which has the help strings of all commands rendered
+        with the server's command prefix.
+        """
+        return self.__server_instance.help_index
+
     @property
     def owner(self):
         """
@@ -98,6 +163,89 @@ class Module(object):
                 self.__owner = member
                 return self.__owner
 
+    def store(self, name, default=None):
+        """
+        Loads a JSON document from the local data directory. The document is kept in memory and written back to disk in
+        the background some time after it was modified (and when the bot exits), so there is no need to save it
+        yourself. Example:
+
+            self.db = self.store('hello.json')
+            self.db['greetings'] = self.db.get('greetings', 0) + 1
+
+        :param name: File name of the document, relative to local_data_dir.
+        :param default: The document to start with if the file doesn't exist yet (empty dict if not specified).
+        :return: Returns the document as a dict (or list, if default is a list). Always modify it in place instead of
+        assigning a new object to your attribute, otherwise the changes won't be saved.
+        """
+        return self.__server_instance.persistence.open(os.path.join(self.local_data_dir, name), default)
+
+    def schedule(self, name, when, interval=None, data=None):
+        """
+        Makes the bot call on_scheduled() of this module at the specified time, and optionally every interval seconds
+        after that. Jobs are stored in the database and survive restarts. If they became due while the bot was offline,
+        they are run (once) as soon as the server is available again. Example:
+
+            self.schedule('daily greeting', datetime.now() + timedelta(hours=1), interval=24*3600, data='Hello!')
+
+        :param name: Name of the job. Scheduling a job with the same name again replaces it.
+        :param when: A datetime (naive ones are local time) or UNIX timestamp.
+        :param interval: Number of seconds between runs, or None if the job should only run once.
+        :param data: Anything that can be serialized to JSON. It is available as job.data in on_scheduled().
+        :return: Returns the glados.Job.
+        """
+        return self.__server_instance.scheduler.schedule(self.__job_owner, name, when, interval, data)
+
+    def unschedule(self, name):
+        """
+        :return: Returns True if a job with this name existed.
+        """
+        return self.__server_instance.scheduler.unschedule(self.__job_owner, name)
+
+    def scheduled_jobs(self):
+        """
+        :return: Returns a list of all jobs of this module, ordered by due time.
+        """
+        return self.__server_instance.scheduler.jobs(self.__job_owner)
+
+    @property
+    def __job_owner(self):
+        return self.__server_instance.job_owner(self)
+
+    def rebuild_dispatch_index(self):
+        """
+        Rebuilds the table the server instance uses to look up which callbacks to call for a message. This needs to be
+        called whenever a module is blacklisted or whitelisted.
+        """
+        self.__server_instance.rebuild_dispatch_index()
+
+    def shutdown(self):
+        """
+        Called when the bot exits or the server this module belongs to becomes unavailable. Override this if your
+        module holds data in memory that needs to be written to disk.
+        """
+        pass
+
+    async def on_member_join(self, member):
+        """
+        Called when a member joins the server this module belongs to. Override this instead of registering an event
+        with the discord client, which would replace the handlers of the bot and of other modules.
+        """
+        pass
+
+    async def on_member_remove(self, member):
+        """
+        Called when a member leaves (or is kicked or banned from) the server this module belongs to.
+        """
+        pass
+
+    async def on_scheduled(self, job):
+        """
+        Called when a job that was added with schedule() is due.
+        :param job: The glados.Job. job.name and job.data are what was passed to schedule(), job.late is the number of
+        seconds the job is late by (e.g. because the bot was offline).
+        """
+        pass
+
     def is_banned(self, member):
         """
         Checks if the specified member is banned or not.
@@ -150,33 +298,14 @@ class Module(object):
         :param message: The discord.message object
         :return: Returns a generator, must be yielded (asyncio coroutine).
         """
-        command_list = list()
-        for name, member in inspect.getmembers(self, predicate=inspect.ismethod):
-            if not hasattr(member, 'commands') or not any(x[0] == command for x in member.commands):
-                continue
-            command_list += list(self.__help_string_from_member_func(member))
-        await self.client.send_message(message.channel, '\n'.join(command_list))
+        help_strings = self.help_index.command_help(type(self), command)
+        await self.client.send_message(message.channel, '\n'.join(help_strings))
 
     def get_casual_help_strings(self):
-        for name, member in inspect.getmembers(self, predicate=inspect.ismethod):
-            if not hasattr(member, 'commands') or any(hasattr(member, x) for x in ('moderator', 'admin', 'owner')):
-                continue
-            yield from self.__help_string_from_member_func(member)
+        yield from self.help_index.module_help(type(self))
 
     def get_privileged_help_strings(self, level):
-        for name, member in inspect.getmembers(self, predicate=inspect.ismethod):
-            if not hasattr(member, 'commands') or not hasattr(member, level):
-                continue
-            yield from self.__help_string_from_member_func(member)
-
-    def __help_string_from_member_func(self, member_func):
-        for command, argument_list_str, description in member_func.commands[::-1]:  # decorators are applied in reverse
-            if not description:
-                continue
-            if argument_list_str:
-                yield '{}{} **{}** -- *{}*'.format(self.command_prefix, command, argument_list_str, description)
-            else:
-                yield '{}{} -- *{}*'.format(self.command_prefix, command, description)
+        yield from self.help_index.module_help(type(self), level)
 
     def parse_members_roles(self, message, content, membercount=sys.maxsize, rolecount=sys.maxsize):
         """
@@ -211,14 +340,8 @@ class Module(object):
             words = content.split()
             for name in words:
                 name = name.strip('@').split('#')[0]
-                submembers = set()
-                subroles = set()
-                for member in self.server.members:
-                    if member.nick == name or member.name == name:
-                        submembers.add(member)
-                for role in self.server.roles:
-                    if role.name == name:
-                        subroles.add(role)
+                submembers = set(self.member_index.find(name))
+                subroles = set(self.member_index.find_roles(name))
 
                 # These errors can only occur if the members/roles were not mentioned
                 if len(submembers) > 0 and len(subroles) > 0:
@@ -0,0 +1,271 @@
+import ast
+import importlib.util
+import time
+from .Log import log
+from .module import Module
+from .Permissions import Permissions
+
+
+# Decorators whose effect on a callback can be reproduced from the source code of a module, without importing it
+_CALLBACK_DECORATORS = {
+    'Module.command': Module.command,
+    'Module.rule': Module.rule,
+    'Module.bot_rule': Module.bot_rule,
+    'Permissions.command': Permissions.command,
+    'Permissions.rule': Permissions.rule,
+    'Permissions.bot_rule': Permissions.bot_rule,
+}
+_PERMISSION_DECORATORS = {
+    'Permissions.spamalot': Permissions.spamalot,
+    'Permissions.owner': Permissions.owner,
+    'Permissions.admin': Permissions.admin,
+    'Permissions.moderator': Permissions.moderator,
+}
+
+# Decorators that can't turn a method into a callback
+_HARMLESS_DECORATORS = ('staticmethod', 'classmethod', 'property')
+
+# Hooks a stand-in forwards to the real module, loading it first
+_HOOKS = ('on_member_join', 'on_member_remove', 'on_scheduled')
+
+# Calls that may be delayed until a module is first used, apart from assigning attributes: creating the module's data
+# folders and filling in default settings
+_DEFERRABLE_CALLS = ('exists', 'isdir', 'isfile', 'makedirs', 'mkdir', 'ensure_path_exists', 'setdefault')
+
+# Calls in an attribute assignment that start something which has to run whether or not the module is used
+_STARTING_CALLS = ('ensure_future', 'create_task', 'run_in_executor', 'Thread', 'schedule', 'listen')
+
+
+def _dotted_name(node):
+    """
+    :return: Returns something like 'glados.Module.command' for a chain of ast.Attribute nodes, or None.
+    """
+    parts = list()
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    name = '.'.join(reversed(parts))
+    return name[len('glados.'):] if name.startswith('glados.') else name
+
+
+def _read_decorator(node):
+    """
+    :return: Returns a tuple (is callback decorator, function applying the decorator), or None if the decorator isn't
+    known or its arguments aren't literals.
+    """
+    if not isinstance(node, ast.Call):
+        decorator = _PERMISSION_DECORATORS.get(_dotted_name(node), None)
+        return None if decorator is None else (False, decorator)
+
+    factory = _CALLBACK_DECORATORS.get(_dotted_name(node.func), None)
+    if factory is None or any(x.arg is None for x in node.keywords):
+        return None
+    try:
+        args = [ast.literal_eval(x) for x in node.args]
+        kwargs = {x.arg: ast.literal_eval(x.value) for x in node.keywords}
+    except ValueError:
+        return None
+    return True, lambda func: factory(*args, **kwargs)(func)
+
+
+def _calls(node):
+    """
+    :return: Returns the names of the functions called anywhere in the node (the last part of dotted names).
+    """
+    for x in ast.walk(node):
+        if isinstance(x, ast.Call):
+            name = _dotted_name(x.func)
+            yield name.split('.')[-1] if name is not None else None
+
+
+def _is_super_init(node):
+    return isinstance(node, ast.Expr) and isinstance(node.value, ast.Call) and \
+        isinstance(node.value.func, ast.Attribute) and node.value.func.attr == '__init__'
+
+
+def _init_only_assigns(func):
+    """
+    :return: Returns True if the __init__ method only calls the base class, assigns attributes, creates folders and sets
+    default settings, i.e. if nothing is lost when it runs when the module is first used instead of at startup.
+    """
+    for node in func.body:
+        if isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) or _is_super_init(node):
+            continue
+        if isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+            if any(x in _STARTING_CALLS for x in _calls(node)):
+                return False
+        elif not isinstance(node, (ast.If, ast.Expr)) or any(x not in _DEFERRABLE_CALLS for x in _calls(node)):
+            return False
+    return True
+
+
+def read_callbacks(file_name, class_name):
+    """
+    Reads the callbacks and hooks of a module class from its source code.
+    :return: Returns a tuple (callbacks, hooks). callbacks is a list of (method name, decorators) tuples, where
+    decorators are functions to apply to a stand-in for the method, innermost first. hooks is a list of the names of
+    the hooks the class overrides. Returns None if the class can't be described without importing it, or if it has to
+    be instantiated at startup (it sets lazy = False, or its __init__ does more than assign attributes).
+    """
+    with open(file_name, 'rb') as f:
+        source = f.read()
+    # Web routes have to exist before the first request comes in
+    if b'webapp' in source:
+        return None
+    tree = ast.parse(source, file_name)
+    cls = next((x for x in tree.body if isinstance(x, ast.ClassDef) and x.name == class_name), None)
+    if cls is None or cls.decorator_list or cls.keywords or len(cls.bases) != 1 or \
+            _dotted_name(cls.bases[0]) != 'Module':
+        return None
+
+    callbacks = list()
+    hooks = list()
+    for node in cls.body:
+        if isinstance(node, ast.Assign) and any(isinstance(x, ast.Name) and x.id == 'lazy' for x in node.targets) and \
+                not (isinstance(node.value, ast.Constant) and node.value.value is True):
+            return None
+        if isinstance(node, ast.FunctionDef) and node.name == '__init__' and not _init_only_assigns(node):
+            return None
+        # Aliases like "hello = hi" could be callbacks too
+        if isinstance(node, (ast.Assign, ast.AnnAssign)) and isinstance(node.value, (ast.Name, ast.Attribute)) and \
+                not _dotted_name(node.value) in ('Module.SERVER', 'Module.PROCESS'):
+            return None
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        if node.name in _HOOKS:
+            hooks.append(node.name)
+        if any(_dotted_name(x) in _HARMLESS_DECORATORS for x in node.decorator_list):
+            continue
+        decorators = [_read_decorator(x) for x in reversed(node.decorator_list)]
+        if None in decorators:
+            return None
+        if not any(is_callback for is_callback, decorator in decorators):
+            continue
+        callbacks.append((node.name, [decorator for is_callback, decorator in decorators]))
+    return callbacks, hooks
+
+
+def _stand_in_callback(name, decorators):
+    async def callback(self, message, content):
+        return await getattr(self.load(), name)(message, content)
+    callback.__name__ = callback.__qualname__ = name
+    for decorator in decorators:
+        callback = decorator(callback)
+    return callback
+
+
+def _stand_in_hook(name):
+    async def hook(self, *args):
+        return await getattr(self.load(), name)(*args)
+    hook.__name__ = hook.__qualname__ = name
+    return hook
+
+
+class LazyModule(Module):
+    """
+    Stands in for a module that wasn't loaded on this server yet. It has the same commands and rules as the real
+    module, so it appears in the help and in the dispatch index, and replaces itself with the real module the first
+    time one of them (or one of the module's hooks) is called.
+    """
+
+    def __init__(self, server_instance, full_name, spec):
+        super(LazyModule, self).__init__(server_instance, full_name)
+        self.__server_instance = server_instance
+        self.__spec = spec
+        self.__module = None
+
+    def load(self):
+        """
+        :return: Returns the real module, importing and instantiating it if this is the first time it's needed.
+        """
+        if self.__module is None:
+            imported = self.__spec.import_time is not None
+            module = self.__spec.instantiate(self.__server_instance, self.full_name)
+            log('Loaded {} on server {} ({}{:.0f}ms __init__)'.format(
+                self.full_name, self.server.name, '' if imported else '{:.0f}ms import, '.format(
+                    1000 * self.__spec.import_time), 1000 * self.__spec.last_init_time))
+            self.__module = module
+            self.__server_instance.replace_module(self, module)
+        return self.__module
+
+
+class ModuleSpec(object):
+    """
+    A module class listed in the settings. If its commands, rules and hooks can be read from the source code, the
+    Python module is only imported when a server first needs it, and servers get a LazyModule until then. Otherwise
+    it's imported right away. Either way, the time spent importing and in __init__ is recorded for the startup report.
+    Classes with scope Module.PROCESS are only instantiated once, all servers get the same instance.
+    """
+
+    def __init__(self, full_name, lazy=True):
+        """
+        :param full_name: Something like 'general.activity.Activity'.
+        :param lazy: Import the module only when it's needed, if possible.
+        :raises Exception: Whatever importing the module raised, if it can't be loaded lazily.
+        """
+        self.full_name = full_name
+        namespace = full_name.split('.')
+        self.module_name = '.'.join(namespace[:-1])
+        self.class_name = namespace[-1]
+        self.import_time = None  # seconds, None until the module was imported
+        self.init_time = 0.0  # seconds spent in __init__, on all servers
+        self.last_init_time = 0.0
+        self.instances = 0
+        self.shared_instance = None  # the instance of a class with scope Module.PROCESS, once it was created
+        self.__class = None
+        self.__stand_in = self.__create_stand_in() if lazy else None
+        if self.__stand_in is None:
+            self.load_class()
+
+    @property
+    def is_lazy(self):
+        return self.__stand_in is not None
+
+    def load_class(self):
+        if self.__class is None:
+            start = time.perf_counter()
+            m = __import__(self.module_name, fromlist=[self.class_name])
+            self.__class = getattr(m, self.class_name)
+            self.import_time = time.perf_counter() - start
+        return self.__class
+
+    def instantiate(self, server_instance, full_name):
+        """
+        :return: Returns an instance of the real module class.
+        """
+        if self.shared_instance is not None:
+            self.last_init_time = 0.0
+            return self.shared_instance
+        class_ = self.load_class()
+        start = time.perf_counter()
+        obj = class_(server_instance, full_name)
+        self.last_init_time = time.perf_counter() - start
+        self.init_time += self.last_init_time
+        self.instances += 1
+        if getattr(class_, 'scope', Module.SERVER) == Module.PROCESS:
+            self.shared_instance = obj
+        return obj
+
+    def __call__(self, server_instance, full_name):
+        if self.__stand_in is not None and self.shared_instance is None:
+            return self.__stand_in(server_instance, full_name, self)
+        return self.instantiate(server_instance, full_name)
+
+    def __create_stand_in(self):
+        spec = importlib.util.find_spec(self.module_name)
+        if spec is None or not spec.has_location or not spec.origin.endswith('.py'):
+            return None
+        try:
+            result = read_callbacks(spec.origin, self.class_name)
+            if result is None:
+                return None
+            callbacks, hooks = result
+            namespace = {name: _stand_in_callback(name, decorators) for name, decorators in callbacks}
+        except Exception:
+            # Syntax errors, invalid regular expressions, ... are reported by the import
+            return None
+        namespace.update({name: _stand_in_hook(name) for name in hooks})
+        return type('Lazy' + self.class_name, (LazyModule,), namespace)
@@ -0,0 +1,112 @@
+import asyncio
+import json
+import os
+import threading
+
+from .settings import TrackedDict, TrackedList
+
+
+class JSONStore(object):
+    """
+    Keeps the JSON documents of all modules in memory and writes them back to disk in the background. A document is
+    marked dirty whenever it is modified and gets written at most once every flush_interval seconds, so modules can
+    change their data on every message without touching the disk each time. Files are replaced atomically, so a crash
+    can't leave a half written document behind.
+    """
+
+    def __init__(self, flush_interval=30):
+        """
+        :param flush_interval: Number of seconds a modification may stay in memory before it is written to disk.
+        """
+        self.flush_interval = flush_interval
+        self.writes = 0  # Number of files written so far
+
+        self.__documents = dict()  # file name -> tracked dict/list
+        self.__dirty = set()  # file names
+        self.__versions = dict()  # file name -> number of times the document was serialized
+        self.__written_versions = dict()  # file name -> version that is on disk
+        self.__write_lock = threading.Lock()
+        self.__flush_handle = None
+
+    def open(self, file_name, default=None):
+        """
+        Loads the specified JSON file, or starts a new document if it doesn't exist. Opening the same file twice returns
+        the same document.
+        :param file_name: Path of the JSON file.
+        :param default: The document to start with if the file doesn't exist (a dict or list, it is copied). An empty
+        dict is used if not specified.
+        :return: Returns the document as a dict or list. Modify it in place, it is saved automatically. Sets aren't
+        supported, use lists instead.
+        """
+        document = self.__documents.get(file_name, None)
+        if document is not None:
+            return document
+
+        if os.path.isfile(file_name):
+            with open(file_name, 'rb') as f:
+                data = json.loads(f.read().decode('utf-8'))
+        else:
+            data = dict() if default is None else default
+
+        def on_change():
+            self.__mark_dirty(file_name)
+        document = TrackedList(data, on_change) if isinstance(data, list) else TrackedDict(data, on_change)
+        self.__documents[file_name] = document
+        self.__versions[file_name] = 0
+        self.__written_versions[file_name] = 0
+        return document
+
+    def flush(self):
+        """
+        Writes all modified documents to disk right away. Called when the bot exits or a server becomes unavailable.
+        """
+        if self.__flush_handle is not None:
+            self.__flush_handle.cancel()
+            self.__flush_handle = None
+        for file_name in list(self.__dirty):
+            self.__write(*self.__serialize(file_name))
+
+    async def flush_async(self):
+        """
+        Same as flush(), except the files are written in a worker thread so the event loop isn't blocked.
+        """
+        loop = asyncio.get_event_loop()
+        for file_name in list(self.__dirty):
+            await loop.run_in_executor(None, self.__write, *self.__serialize(file_name))
+
+    def __mark_dirty(self, file_name):
+        if file_name in self.__dirty:
+            return
+        self.__dirty.add(file_name)
+        if self.__flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # Not running (yet), flush() will take care of it
+        self.__flush_handle = loop.call_later(self.flush_interval, self.__start_flush)
+
+    def __start_flush(self):
+        self.__flush_handle = None
+        asyncio.ensure_future(self.flush_async())
+
+    def __serialize(self, file_name):
+        # This has to happen on the event loop, so the document doesn't change while it is being serialized
+        self.__dirty.discard(file_name)
+        self.__versions[file_name] += 1
+        text = json.dumps(self.__documents[file_name], indent=2, sort_keys=True)
+        return file_name, self.__versions[file_name], text
+
+    def __write(self, file_name, version, text):
+        with self.__write_lock:
+            # A newer version may have been written by flush() while this one was waiting for the lock
+            if version <= self.__written_versions[file_name]:
+                return
+            directory = os.path.dirname(file_name)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(file_name + '.tmp', 'wb') as f:
+                f.write(text.encode('utf-8'))
+            os.replace(file_name + '.tmp', file_name)
+            self.__written_versions[file_name] = version
+            self.writes += 1
@@ -0,0 +1,164 @@
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+
+# Patterns that match every single-line message. These are shared by lots of logging modules and only need to be
+# evaluated once per message, no matter how many modules registered them.
+CATCH_ALL_PATTERNS = ('^.*$', '^(.*)$')
+
+# Non-ASCII characters that match an ASCII letter when re.IGNORECASE is used, but that str.lower() doesn't map to that
+# letter. Folding these before lowering a message makes the literal prefilter exact for ASCII literals.
+_FOLD_TABLE = str.maketrans({
+    '\u0130': 'i',  # LATIN CAPITAL LETTER I WITH DOT ABOVE
+    '\u0131': 'i',  # LATIN SMALL LETTER DOTLESS I
+    '\u017f': 's',  # LATIN SMALL LETTER LONG S
+    '\u212a': 'k',  # KELVIN SIGN
+})
+
+
+def fold_case(text):
+    """
+    :return: Returns the text in lower case, with the characters in _FOLD_TABLE folded first. Look for the strings
+    returned by required_literals() in this.
+    """
+    return text.translate(_FOLD_TABLE).lower()
+
+
+def _best_requirement(items):
+    """
+    Walks a parsed regular expression and finds a set of literal strings of which at least one must appear (lower
+    case) in any string the expression can match.
+    :param items: A list of (opcode, argument) tuples as produced by sre_parse.
+    :return: A frozenset of lower case strings, or None if no such literal could be found.
+    """
+    requirements = list()
+    run = list()
+
+    def end_run():
+        if run:
+            requirements.append(frozenset([''.join(run)]))
+            del run[:]
+
+    for op, av in items:
+        if op == sre_parse.LITERAL and av < 128:
+            run.append(chr(av).lower())
+            continue
+        end_run()
+
+        if op == sre_parse.SUBPATTERN:
+            requirement = _best_requirement(av[-1])
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] > 0:
+            requirement = _best_requirement(av[2])
+        elif op == sre_parse.ASSERT:
+            # Positive look-aheads and look-behinds still have to find their content somewhere in the message
+            requirement = _best_requirement(av[1])
+        elif op == sre_parse.BRANCH:
+            branches = [_best_requirement(branch) for branch in av[1]]
+            if all(branches):
+                requirement = frozenset().union(*branches)
+            else:
+                requirement = None
+        else:
+            requirement = None
+
+        if requirement:
+            requirements.append(requirement)
+    end_run()
+
+    if len(requirements) == 0:
+        return None
+    # Prefer requirements made of long strings, they rule out the most messages
+    return max(requirements, key=lambda x: (min(len(s) for s in x), -len(x)))
+
+
+# (pattern, flags) -> result of required_literals(), every server builds a RuleEngine from the same rules
+_required_literals_cache = dict()
+
+
+def required_literals(rule):
+    """
+    Figures out which literal strings a compiled rule needs to see before it can possibly match.
+    :param rule: A compiled regular expression.
+    :return: A frozenset of lower case strings (the message must contain at least one of them), or None if the rule
+    has to be evaluated on every message.
+    """
+    key = (rule.pattern, rule.flags)
+    try:
+        return _required_literals_cache[key]
+    except KeyError:
+        pass
+    try:
+        requirement = _best_requirement(sre_parse.parse(rule.pattern, rule.flags))
+    except Exception:
+        requirement = None
+    if requirement is not None and '' in requirement:
+        requirement = None
+    _required_literals_cache[key] = requirement
+    return requirement
+
+
+class RuleEngine(object):
+    """
+    Matches a message against a list of rules, scanning the message as few times as possible:
+      + Rules that share the same pattern (most importantly the catch-all patterns used by logging modules) are
+        evaluated once per message and the match object is handed to every callback.
+      + Rules that require a literal substring are only evaluated if that substring appears in the message. Each
+        distinct literal is looked for exactly once.
+      + Everything else is evaluated as before.
+    """
+
+    def __init__(self, rule_list):
+        """
+        :param rule_list: A list of (obj, callback, rule, ignorecommands) tuples, in the order callbacks should be
+        called.
+        """
+        self.__entries = list()
+        self.__always = list()  # indices of entries that need evaluating on every message
+        self.__by_literal = dict()  # literal -> indices of entries requiring it
+
+        for index, (obj, callback, rule, ignorecommands) in enumerate(rule_list):
+            self.__entries.append((obj, callback, rule, ignorecommands, (rule.pattern, rule.flags)))
+            literals = None if rule.pattern in CATCH_ALL_PATTERNS else required_literals(rule)
+            if literals is None:
+                self.__always.append(index)
+                continue
+            for literal in literals:
+                self.__by_literal.setdefault(literal, list()).append(index)
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __candidates(self, content):
+        if len(self.__by_literal) == 0:
+            return self.__always
+
+        folded = fold_case(content)
+        candidates = set(self.__always)
+        for literal, indices in self.__by_literal.items():
+            if literal in folded:
+                candidates.update(indices)
+        return sorted(candidates)
+
+    def match(self, content, is_command):
+        """
+        :param content: The message content to match.
+        :param is_command: Whether the message starts with the command prefix. Rules registered with
+        ignorecommands=True are skipped if so.
+        :return: A list of (obj, callback, match) tuples for every rule that matched.
+        """
+        ret = list()
+        matches = dict()  # (pattern, flags) -> match, so identical patterns are only evaluated once
+        for index in self.__candidates(content):
+            obj, callback, rule, ignorecommands, key = self.__entries[index]
+            if ignorecommands and is_command:
+                continue
+            try:
+                match = matches[key]
+            except KeyError:
+                match = matches[key] = rule.match(content)
+            if match is None:
+                continue
+            ret.append((obj, callback, match))
+        return ret
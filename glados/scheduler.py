@@ -0,0 +1,190 @@
+import asyncio
+import heapq
+import json
+import time
+import traceback
+from datetime import datetime
+from .Log import log
+
+
+class Job(object):
+    """
+    A job of the Scheduler. It is passed to the handler when it is due.
+    """
+
+    def __init__(self, owner, name, due, interval=None, data=None):
+        self.owner = owner
+        self.name = name
+        self.due = due  # UNIX timestamp
+        self.interval = interval  # seconds, None if the job only runs once
+        self.data = data
+        self.late = 0  # seconds the job was run after it was due, e.g. because the bot was offline
+        self.sequence = 0
+
+    @property
+    def is_periodic(self):
+        return self.interval is not None
+
+
+class Scheduler(object):
+    """
+    Runs jobs at a specific time or periodically, for all modules of all servers. The jobs are kept in a heap ordered
+    by due time and a single timer is set to when the earliest one is due, so it doesn't matter how many jobs there are
+    and nothing has to poll.
+
+    Jobs are stored in a database, so they survive restarts. Jobs that became due while the bot was offline (or while
+    their server was unavailable) are run as soon as their owner registers its handler again. A periodic job is run only
+    once in that case and then continues on its original schedule, so its due times don't drift.
+    """
+
+    TABLE = 'scheduled_jobs'
+
+    def __init__(self, database):
+        """
+        :param database: The glados.Database the jobs are stored in.
+        """
+        self.__table = database.table(self.TABLE, 'owner TEXT NOT NULL, name TEXT NOT NULL, due REAL NOT NULL, '
+                                                  'interval REAL, data TEXT, PRIMARY KEY (owner, name)')
+        self.__jobs = dict()  # (owner, name) -> Job
+        self.__heap = list()  # (due, sequence number, owner, name)
+        self.__sequence = 0
+        self.__handlers = dict()  # owner -> async function taking a Job
+        self.__waiting = dict()  # owner -> list of jobs that became due before the owner registered
+        self.__timer = None
+        self.__timer_due = None
+
+        for row in database.read_now('SELECT * FROM {}'.format(self.TABLE)):
+            data = None if row['data'] is None else json.loads(row['data'])
+            self.__add(Job(row['owner'], row['name'], row['due'], row['interval'], data))
+
+    def register(self, owner, handler):
+        """
+        Jobs of the owner are only run while it has a handler. Jobs that are already overdue are run right away.
+        :param owner: A string identifying whoever schedules the jobs, e.g. the server ID and name of a module.
+        :param handler: An async function taking a Job.
+        """
+        self.__handlers[owner] = handler
+        for job in self.__waiting.pop(owner, ()):
+            self.__push(job)
+        self.__set_timer()
+
+    def unregister(self, owner):
+        """
+        Jobs of the owner are kept, but not run until it registers again.
+        """
+        self.__handlers.pop(owner, None)
+
+    def schedule(self, owner, name, when, interval=None, data=None):
+        """
+        Adds a job, or replaces it if the owner already has a job with this name.
+        :param when: A datetime (naive ones are local time) or UNIX timestamp of when the job is due for the first
+        time. If it lies in the past, the job is run right away.
+        :param interval: Number of seconds between runs if the job should repeat, None if it should only run once.
+        :param data: Anything that can be serialized to JSON. It is passed to the handler as job.data.
+        :return: Returns the Job.
+        """
+        if isinstance(when, datetime):
+            when = when.timestamp()
+        if interval is not None and interval <= 0:
+            raise ValueError('Interval must be greater than 0')
+        job = Job(owner, name, when, interval, data)
+        self.__add(job)
+        self.__save(job)
+        self.__set_timer()
+        return job
+
+    def unschedule(self, owner, name):
+        """
+        :return: Returns True if the job existed.
+        """
+        job = self.__jobs.pop((owner, name), None)
+        if job is None:
+            return False
+        self.__table.delete('owner = ? AND name = ?', (owner, name))
+        return True
+
+    def get(self, owner, name):
+        return self.__jobs.get((owner, name), None)
+
+    def jobs(self, owner):
+        """
+        :return: Returns a list of all jobs of the owner, ordered by due time.
+        """
+        return sorted((job for job in self.__jobs.values() if job.owner == owner), key=lambda x: x.due)
+
+    def __len__(self):
+        return len(self.__jobs)
+
+    def shutdown(self):
+        if self.__timer is not None:
+            self.__timer.cancel()
+            self.__timer = None
+
+    def __add(self, job):
+        self.__jobs[(job.owner, job.name)] = job
+        self.__push(job)
+
+    def __push(self, job):
+        # Jobs that were replaced or removed in the meantime stay in the heap and are skipped when they come up
+        self.__sequence += 1
+        job.sequence = self.__sequence
+        heapq.heappush(self.__heap, (job.due, job.sequence, job.owner, job.name))
+
+    def __save(self, job):
+        self.__table.insert({
+            'owner': job.owner,
+            'name': job.name,
+            'due': job.due,
+            'interval': job.interval,
+            'data': None if job.data is None else json.dumps(job.data)
+        }, replace=True)
+
+    def __set_timer(self):
+        if len(self.__heap) == 0:
+            return
+        due = self.__heap[0][0]
+        if self.__timer is not None:
+            if self.__timer_due <= due:
+                return
+            self.__timer.cancel()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.__timer = None
+            return  # Not running yet, register() will take care of it
+        self.__timer_due = due
+        self.__timer = loop.call_later(max(0, due - time.time()), self.__run_due_jobs)
+
+    def __run_due_jobs(self):
+        self.__timer = None
+        now = time.time()
+        while len(self.__heap) > 0 and self.__heap[0][0] <= now:
+            due, sequence, owner, name = heapq.heappop(self.__heap)
+            job = self.__jobs.get((owner, name), None)
+            if job is None or not job.sequence == sequence:
+                continue
+
+            handler = self.__handlers.get(owner, None)
+            if handler is None:
+                self.__waiting.setdefault(owner, list()).append(job)
+                continue
+
+            job.late = now - job.due
+            if job.is_periodic:
+                # Skip the runs that were missed, but stay on the original schedule
+                job.due += (int((now - job.due) / job.interval) + 1) * job.interval
+                self.__push(job)
+                self.__save(job)
+            else:
+                self.__jobs.pop((owner, name))
+                self.__table.delete('owner = ? AND name = ?', (owner, name))
+            asyncio.ensure_future(self.__run(handler, job))
+
+        self.__set_timer()
+
+    @staticmethod
+    async def __run(handler, job):
+        try:
+            await handler(job)
+        except:
+            log('Error: Scheduled job {} of {} failed\n{}'.format(job.name, job.owner, traceback.format_exc()))
@@ -0,0 +1,128 @@
+def track(value, on_change):
+    """
+    Wraps dicts and lists (and everything nested in them) so on_change() is called whenever they are modified. Other
+    values are returned as they are.
+    """
+    if isinstance(value, (TrackedDict, TrackedList)) and value.on_change is on_change:
+        return value
+    if isinstance(value, dict):
+        return TrackedDict(value, on_change)
+    if isinstance(value, list):
+        return TrackedList(value, on_change)
+    return value
+
+
+class TrackedDict(dict):
+    """
+    A dict that calls on_change() when it is modified. Dicts and lists stored in it are wrapped as well, so changes to
+    nested values are noticed too. Since the values are copied when they are wrapped, keep using the value stored in
+    the dict (e.g. the one returned by setdefault()) instead of the one you put in.
+    """
+
+    def __init__(self, items, on_change):
+        super(TrackedDict, self).__init__()
+        self.on_change = on_change
+        for key, value in dict(items).items():
+            dict.__setitem__(self, key, track(value, on_change))
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, track(value, self.on_change))
+        self.on_change()
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self.on_change()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        if key not in self:
+            return dict.pop(self, key, *default)
+        value = dict.pop(self, key)
+        self.on_change()
+        return value
+
+    def popitem(self):
+        item = dict.popitem(self)
+        self.on_change()
+        return item
+
+    def clear(self):
+        dict.clear(self)
+        self.on_change()
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            dict.__setitem__(self, key, track(value, self.on_change))
+        self.on_change()
+
+
+class TrackedList(list):
+    """
+    A list that calls on_change() when it is modified. See TrackedDict.
+    """
+
+    def __init__(self, items, on_change):
+        super(TrackedList, self).__init__(track(value, on_change) for value in items)
+        self.on_change = on_change
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            value = [track(x, self.on_change) for x in value]
+        else:
+            value = track(value, self.on_change)
+        list.__setitem__(self, index, value)
+        self.on_change()
+
+    def __delitem__(self, index):
+        list.__delitem__(self, index)
+        self.on_change()
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def __imul__(self, n):
+        list.__imul__(self, n)
+        self.on_change()
+        return self
+
+    def append(self, value):
+        list.append(self, track(value, self.on_change))
+        self.on_change()
+
+    def extend(self, values):
+        list.extend(self, [track(x, self.on_change) for x in values])
+        self.on_change()
+
+    def insert(self, index, value):
+        list.insert(self, index, track(value, self.on_change))
+        self.on_change()
+
+    def remove(self, value):
+        list.remove(self, value)
+        self.on_change()
+
+    def pop(self, *index):
+        value = list.pop(self, *index)
+        self.on_change()
+        return value
+
+    def clear(self):
+        list.clear(self)
+        self.on_change()
+
+    def sort(self, *args, **kwargs):
+        list.sort(self, *args, **kwargs)
+        self.on_change()
+
+    def reverse(self):
+        list.reverse(self)
+        self.on_change()
@@ -0,0 +1,46 @@
+import sys
+import os
+from glados.database import Database
+
+
+# Imports JSON files from the data directories into the SQLite database of the same directory. Every file ends up in the
+# key-value store named after its path, e.g. data/1234/reputation/config.json -> "reputation/config".
+# Usage: python migrate_json.py [file name relative to the data directories...]
+# If no file names are given, all JSON files are imported. Files are left in place.
+
+data_dir = "data"
+file_names = [os.path.normpath(x) for x in sys.argv[1:]]
+
+imported = list()
+for server_id in os.listdir(data_dir):
+    server_dir = os.path.join(data_dir, server_id)
+    if not os.path.isdir(server_dir):
+        print("skipping file " + server_dir)
+        continue
+
+    database = None
+    for directory, dirs, files in os.walk(server_dir):
+        for file_name in sorted(files):
+            if not file_name.endswith(".json"):
+                continue
+            path = os.path.join(directory, file_name)
+            relative_path = os.path.relpath(path, server_dir)
+            if len(file_names) > 0 and relative_path not in file_names:
+                continue
+
+            if database is None:
+                database = Database(os.path.join(server_dir, Database.FILE_NAME))
+            namespace = relative_path[:-len(".json")].replace(os.sep, "/")
+            try:
+                count = database.import_json(path, namespace)
+            except (ValueError, AttributeError) as e:
+                print("Failed to import {}: {}".format(path, e))
+                continue
+            imported.append("{} ({} entries)  ->  {} \"{}\"".format(path, count, database.file_name, namespace))
+
+    if database is not None:
+        database.close()
+
+for line in imported:
+    print(line)
+print("Imported {} files".format(len(imported)))
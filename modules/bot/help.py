@@ -5,17 +5,13 @@ class Help(glados.Module):
 
     @glados.Module.command('help', '[search]', 'Get a list of all commands, or of a specific command')
     async def help(self, message, content):
-        help_strings = (string for module in self.active_modules for string in module.get_casual_help_strings())
-
-        # Filter relevant modules if the user is requesting a specific command
-        if len(content) > 0:
-            help_strings = filter(
-                lambda hlp: any(True for search in content.split() if search in hlp), help_strings)
+        # Filter relevant commands if the user is requesting a specific command
+        help_strings = self.help_index.search(None, content.split())
 
         await self.client.send_message(message.channel,
                 'I\'m sending you a gigantic wall of direct message with a list of commands!')
 
-        for msg in self.pack_into_messages(sorted(help_strings)):
+        for msg in self.pack_into_messages(help_strings):
             await self.client.send_message(message.author, msg)
 
     @glados.Module.command('modhelp', '[search]', 'Get a list of moderator bot commands')
@@ -31,16 +27,11 @@ class Help(glados.Module):
         await self.__privileged_help(message, content, 'owner')
 
     async def __privileged_help(self, message, content, level):
-        help_strings = (string for module in self.active_modules
-                        for string in module.get_privileged_help_strings(level))
-
-        # Filter relevant modules if the user is requesting a specific command
-        if len(content) > 0:
-            help_strings = filter(
-                lambda hlp: any(True for search in content.split() if search in hlp), help_strings)
+        # Filter relevant commands if the user is requesting a specific command
+        help_strings = self.help_index.search(level, content.split())
 
         await self.client.send_message(message.channel,
                                        'I\'m sending you a list of {} commands.'.format(level))
 
-        for msg in self.pack_into_messages(sorted(help_strings)):
+        for msg in self.pack_into_messages(help_strings):
             await self.client.send_message(message.author, msg)
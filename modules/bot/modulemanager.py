@@ -1,19 +1,19 @@
 import glados
-import json
 from glados import Permissions, Module
-from os.path import join, isfile
 
 
 class ModuleManager(glados.DummyModuleManager):
     def __init__(self, server_instance, full_name):
         super(ModuleManager, self).__init__(server_instance, full_name)
 
-        self.db_file = join(self.local_data_dir, 'modulemanager.json')
-        self.db = dict()
-        self.__load_db()
+        self.db = self.store('modulemanager.json')
+        # make sure all keys exists
+        self.db.setdefault('module blacklist', [])
+        # The document can only hold a list, look ups are done in this set instead
+        self.__blacklist = set(self.db['module blacklist'])
 
     def is_blacklisted(self, mod):
-        return True if mod.full_name in self.db['module blacklist'] else False
+        return True if mod.full_name in self.__blacklist else False
 
     @Permissions.admin
     @Module.command('modulelist', '', 'Dumps a list of all modules and which ones are whitelisted/blacklisted')
@@ -29,7 +29,7 @@ class ModuleManager(glados.DummyModuleManager):
     @Module.command('moduleblack', '<module name> [module name...]', 'Blacklists the specified module(s), thus '
                                                                      'completely disabling them.')
     async def moduleblack(self, message, content):
-        blacklist = self.db['module blacklist']
+        blacklist = self.__blacklist
         modules_to_blacklist = set(content.split()) \
             .difference(blacklist) \
             .intersection(m.full_name for m in self.available_modules)
@@ -46,8 +46,8 @@ class ModuleManager(glados.DummyModuleManager):
                 return  # Already sent a message, not going to send another
             return await self.client.send_message(message.channel, 'Nothing to blacklist!')
 
-        self.db['module blacklist'] = blacklist.union(modules_to_blacklist)
-        self.__save_db()
+        self.__set_blacklist(blacklist.union(modules_to_blacklist))
+        self.rebuild_dispatch_index()
 
         strings = ['Module(s)'] + list(modules_to_blacklist) + ['were blacklisted']
         for msg in self.pack_into_messages(strings, delimiter=' '):
@@ -59,7 +59,7 @@ class ModuleManager(glados.DummyModuleManager):
                     'two things: 1) The module will remain available on your server, even if it is removed from the '
                     'default list in the future. 2) If the module was not available, it will be after this command.')
     async def modulewhite(self, message, content):
-        blacklist = self.db['module blacklist']
+        blacklist = self.__blacklist
         modules_to_whitelist = set(content.split()) \
             .intersection(blacklist)
 
@@ -67,24 +67,13 @@ class ModuleManager(glados.DummyModuleManager):
             return await self.client.send_message(message.channel, 'Nothing to whitelist!')
 
         # Need to update entry in db as well as the set maintained by each module
-        self.db['module blacklist'] = blacklist.difference(modules_to_whitelist)
-        self.__save_db()
+        self.__set_blacklist(blacklist.difference(modules_to_whitelist))
+        self.rebuild_dispatch_index()
 
         strings = ['Module(s)'] + list(modules_to_whitelist) + ['were whitelisted']
         for msg in self.pack_into_messages(strings, delimiter=' '):
             await self.client.send_message(message.channel, msg)
 
-    def __load_db(self):
-        if isfile(self.db_file):
-            self.db = json.loads(open(self.db_file).read())
-
-        # make sure all keys exists
-        self.db.setdefault('module blacklist', set())
-        self.db['module blacklist'] = set(self.db['module blacklist'])
-
-    def __save_db(self):
-        with open(self.db_file, 'w') as f:
-            self.db['module blacklist'] = list(self.db['module blacklist'])
-            s = json.dumps(self.db, indent=2, sort_keys=True)
-            f.write(s)
-            self.db['module blacklist'] = set(self.db['module blacklist'])
+    def __set_blacklist(self, blacklist):
+        self.__blacklist = blacklist
+        self.db['module blacklist'] = sorted(blacklist)
@@ -1,9 +1,11 @@
 import glados
-import os
-import json
+import time
+import heapq
 import dateutil.parser
 from datetime import datetime, timedelta
 
+MARKS = ('banned', 'blessed', 'moderator', 'admin')
+
 
 class Permissions(glados.Permissions):
 
@@ -16,8 +18,9 @@ class Permissions(glados.Permissions):
         permissions.setdefault('authorized servers', [])
         permissions.setdefault('server authorization', False)
 
-        self.db_file = os.path.join(self.local_data_dir, 'permissions.json')
-        self.db = dict()
+        self.db = self.store('permissions.json')
+        self.__resolved = dict()  # member id -> (list of roles, set of marks)
+        self.__expiry_heap = list()  # (timestamp, expiry date, key, type key, item key)
         self.__load_db()
 
     def is_banned(self, member):
@@ -42,6 +45,31 @@ class Permissions(glados.Permissions):
     def require_moderator(self, member):
         return self.require_admin(member) or self.__is_member_still_marked_as(member, 'moderator')
 
+    def check_permissions(self, member, callback_function):
+        # Same as the base implementation, but the member's marks are only resolved once
+        if hasattr(callback_function, 'spamalot'):
+            return self.SPAMABLE
+
+        marks = self.__resolve(member)
+        owner = self.require_owner(member)
+        admin = owner or 'admin' in marks
+        moderator = admin or 'moderator' in marks
+        if hasattr(callback_function, 'owner') and not owner:
+            return self.NEED_OWNER
+        if hasattr(callback_function, 'admin') and not admin:
+            return self.NEED_ADMIN
+        if hasattr(callback_function, 'moderator') and not moderator:
+            return self.NEED_MODERATOR
+
+        if 'banned' in marks and not owner:
+            return self.BANNED
+
+        # If member is blessed, or a mod or higher, then they can spam
+        if 'blessed' in marks or moderator:
+            return self.SPAMABLE
+
+        return self.PUNISHABLE
+
     def require_admin(self, member):
         return self.require_owner(member) or self.__is_member_still_marked_as(member, 'admin')
 
@@ -51,9 +79,26 @@ class Permissions(glados.Permissions):
     def get_ban_expiry(self, member):
         return self.__get_expiry(member, 'banned')
 
+    def invalidate(self, member=None):
+        if member is None:
+            self.__resolved.clear()
+        else:
+            self.__resolved.pop(member.id, None)
+
     def __compose_list_of_members_for(self, key):
+        # Only members that are marked by ID or have a marked role can be in the list
+        candidates = dict()
+        for member_id in self.db[key]['IDs']:
+            member = self.member_index.get(member_id)
+            if member is not None:
+                candidates[member.id] = member
+        for role_name in self.db[key]['roles']:
+            for role in self.member_index.find_roles(role_name):
+                for member in self.member_index.with_role(role):
+                    candidates[member.id] = member
+
         marked_members = list()
-        for member in self.server.members:
+        for member in candidates.values():
             if self.__is_member_still_marked_as(member, key):
                 expiry_date = self.db[key]['IDs'].get(member.id, None)
                 if expiry_date is None:
@@ -356,66 +401,63 @@ class Permissions(glados.Permissions):
         return '"{}": No longer {}'.format(', '.join(x.name for x in unmarked), key)
 
     def __load_db(self):
-        if os.path.isfile(self.db_file):
-            self.db = json.loads(open(self.db_file).read())
-
         # make sure all keys exists
         def add_default(key):
             self.db.setdefault(key, {
                 'IDs': {},
                 'roles': {}
             })
-        add_default('banned')
-        add_default('blessed')
-        add_default('moderator')
-        add_default('admin')
+        for key in MARKS:
+            add_default(key)
 
-    def __save_db(self):
-        with open(self.db_file, 'w') as f:
-            s = json.dumps(self.db, indent=2, sort_keys=True)
-            f.write(s)
+        for key in MARKS:
+            for type_key in ('IDs', 'roles'):
+                for item_key, expiry_date in self.db[key][type_key].items():
+                    self.__schedule_expiry(key, type_key, item_key, expiry_date)
 
     def __is_member_still_marked_as(self, member, key):
-        try:
-            expiry_dates = [
-                ('IDs', member.id, self.db[key]['IDs'][member.id])
-            ]
-        except KeyError:
-            member_role_names = set(x.name for x in member.roles)
-            key_role_names = set(self.db[key]['roles'])
-            expiry_dates = [('roles', x, self.db[key]['roles'][x])
-                            for x in member_role_names.intersection(key_role_names)]
-            if len(expiry_dates) == 0:
-                return False
-
-        # NOTE: expiry_dates contains a list of tuples, where each tuple is:
-        #   (type_key, item_key, expiry_date)
-        # This is to match the JSON structure so keys can be deleted easily. The structure is:
-        #   key : {
-        #     type_key1 : {
-        #       item_key1 : expiry_date,
-        #       item_key2 : expiry_date
-        #     },
-        #     type_key2: {
-        #       item_key1 : expiry_date
-        #       item_key2 : expiry_date
-        #     }
-        #   }
-
-        expiry_dates_len = len(expiry_dates)
-        for type_key, item_key, expiry_date in expiry_dates:
-            if expiry_date == 'never':
-                continue
-            if datetime.now().isoformat() > expiry_date:
-                self.db[key][type_key].pop(item_key)
-                expiry_dates_len -= 1
+        return key in self.__resolve(member)
+
+    def __resolve(self, member):
+        """
+        :return: Returns the set of keys ('banned', 'moderator', etc.) the member is currently marked as, either by ID
+        or through one of their roles. The result is cached until the member's roles or the database change. Renamed
+        roles are handled by invalidate().
+        """
+        self.__remove_expired_entries()
+
+        resolved = self.__resolved.get(member.id, None)
+        if resolved is not None and resolved[0] == member.roles:
+            return resolved[1]
+
+        role_names = set(x.name for x in member.roles)
+        marks = frozenset(key for key in MARKS
+                          if member.id in self.db[key]['IDs'] or not role_names.isdisjoint(self.db[key]['roles']))
+        self.__resolved[member.id] = (list(member.roles), marks)
+        return marks
+
+    def __schedule_expiry(self, key, type_key, item_key, expiry_date):
+        if expiry_date == 'never':
+            return
+        timestamp = dateutil.parser.parse(expiry_date).timestamp()
+        heapq.heappush(self.__expiry_heap, (timestamp, expiry_date, key, type_key, item_key))
+
+    def __remove_expired_entries(self):
+        # Only the earliest expiry needs to be looked at, so this is cheap unless something is actually due
+        now = time.time()
+        if len(self.__expiry_heap) == 0 or self.__expiry_heap[0][0] > now:
+            return
 
-        if expiry_dates_len < len(expiry_dates):
-            self.__save_db()
+        changed = False
+        while len(self.__expiry_heap) > 0 and self.__expiry_heap[0][0] <= now:
+            timestamp, expiry_date, key, type_key, item_key = heapq.heappop(self.__expiry_heap)
+            # The entry may have been unmarked or marked again with a different expiry date in the meantime
+            if self.db[key][type_key].get(item_key, None) == expiry_date:
+                self.db[key][type_key].pop(item_key)
+                changed = True
 
-        if expiry_dates_len == 0:
-            return False
-        return True
+        if changed:
+            self.__resolved.clear()
 
     def __mark_member_as(self, member, key, duration_h=0):
         if duration_h > 0:
@@ -424,7 +466,8 @@ class Permissions(glados.Permissions):
         else:
             expiry_date = 'never'
         self.db[key]['IDs'][member.id] = expiry_date
-        self.__save_db()
+        self.__schedule_expiry(key, 'IDs', member.id, expiry_date)
+        self.__resolved.clear()
 
     def __mark_role_as(self, role_name, key, duration_h=0):
         if duration_h > 0:
@@ -433,15 +476,16 @@ class Permissions(glados.Permissions):
         else:
             expiry_date = 'never'
         self.db[key]['roles'][role_name] = expiry_date
-        self.__save_db()
+        self.__schedule_expiry(key, 'roles', role_name, expiry_date)
+        self.__resolved.clear()
 
     def __unmark_member(self, member, key):
         self.db[key]['IDs'].pop(member.id, None)
-        self.__save_db()
+        self.__resolved.clear()
 
     def __unmark_role(self, role_name, key):
         self.db[key]['roles'].pop(role_name, None)
-        self.__save_db()
+        self.__resolved.clear()
 
     def __get_expiry(self, member, key):
         try:
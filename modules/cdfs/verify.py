@@ -20,15 +20,14 @@ class Verify(glados.Module):
     def __init__(self, bot, full_name):
         super(Verify, self).__init__(bot, full_name)
 
-        @self.client.event
-        async def on_member_remove(member):
-            if member.server is None or member.server.id != cdfs_server_id:
-                return tuple()
-            channel = self.client.get_channel(off_topic_channel_id)
-            if channel is None:
-                glados.log('ERROR: Failed to retrieve off-topic channel')
-                return tuple()
-            await self.client.send_message(channel, "{} left the server!".format(member.name))
+    async def on_member_remove(self, member):
+        if member.server is None or member.server.id != cdfs_server_id:
+            return tuple()
+        channel = self.client.get_channel(off_topic_channel_id)
+        if channel is None:
+            glados.log('ERROR: Failed to retrieve off-topic channel')
+            return tuple()
+        await self.client.send_message(channel, "{} left the server!".format(member.name))
 
     @glados.Module.command('verify', '', '')
     async def verify(self, message, arg):
@@ -5,6 +5,8 @@ import base64
 
 
 class Conversions(glados.Module):
+    scope = glados.Module.PROCESS
+
     @glados.Module.command('bin', '<data>', 'Convert a number or string to a binary representation')
     async def bin(self, message, data):
         if data == '':
@@ -2,18 +2,12 @@ import glados
 import re
 import time
 import asyncio
-import pylab as plt
-import requests, json
-from os import listdir, makedirs
-from os.path import isfile, join, exists
+from concurrent.futures import ProcessPoolExecutor
+from os import listdir, makedirs, remove, replace, getpid
+from os.path import isfile, join, exists, basename
 from datetime import datetime
 from time import strptime
-from matplotlib.dates import date2num
-from matplotlib.gridspec import GridSpec
-from matplotlib import ticker
-from numpy import *
-from collections import deque
-from glados.tools.json import load_json_compressed, save_json_compressed
+import numpy as np
 from lzma import LZMAFile
 from quart import Quart, request, jsonify, send_file
 from hypercorn.asyncio import serve
@@ -60,47 +54,419 @@ def get_commands_from_message(msg):
             x.startswith(cmd_prefix)]
 
 
-# Cache structure is as follows:
+# The statistics of an author (or of the whole server) are returned as a dict with the following structure. This is
+# also what /activity/getstats sends.
 # {
-#   "authors": {
-#     "author name1": {
-#       "userId": xxx,                 the discord user ID of this user
-#       "messages_total": xxx,         the total number of messages this author has made (including bot commands)
-#       "messages_last_week": xxx,     the number of messages over the last 7 days
-#       "commands_total": xxx,         the total number of messages that contained bot commands
-#       "commands_last_week": xxx,     the number of messages that contained bot commands over the last 7 days
-#       "day_cycle_avg": [0]*24,       each value is the number of messages in that hour averaged over all time
-#       "day_cycle_avg_week": [0]*24,  each value is the number of messages in that hour averaged over the last week
-#       "day_cycle_avg_day": [0]*24,   each value is the number of messages in that hour averaged over the last day
-#       "channels": {
-#         "#channel1": 10,             total number of messages in channel "#channel1"
-#         "#channel2": 3               total number of messages in channel "#channel2"
-#       },
-#       "messages_per_day": {
-#         "stamp 1": 6,                tracks how many messages the user made in that day, where the day is a timestamp
-#         "stamp 2": 29                of the form "%Y-%m-%d". If the user made no messages, no entry exists.
-#     }
+#   "name": "author name",
+#   "userId": xxx,                 the discord user ID of this user (not present for the server)
+#   "messages_total": xxx,         the total number of messages this author has made (including bot commands)
+#   "messages_last_week": xxx,     the number of messages over the last 7 days
+#   "commands_total": xxx,         the total number of messages that contained bot commands
+#   "commands_last_week": xxx,     the number of messages that contained bot commands over the last 7 days
+#   "day_cycle_avg": [0]*24,       each value is the number of messages in that hour averaged over all time
+#   "day_cycle_avg_week": [0]*24,  each value is the number of messages in that hour averaged over the last week
+#   "day_cycle_avg_day": [0]*24,   each value is the number of messages in that hour averaged over the last day
+#   "channels": {
+#     "#channel1": 10,             total number of messages in channel "#channel1"
+#     "#channel2": 3               total number of messages in channel "#channel2"
 #   },
-#   "server": {
-#     (same structure as an author's)
+#   "messages_per_day": {
+#     "stamp 1": 6,                tracks how many messages the user made in that day, where the day is a timestamp
+#     "stamp 2": 29                of the form "%Y-%m-%d". If the user made no messages, no entry exists.
 #   }
 # }
 
 
+def _sum_rows_by(index, values, length):
+    """
+    Adds up the rows of a 2D array that belong to the same index.
+    :return: Returns an array of shape (length, values.shape[1]).
+    """
+    result = np.zeros((length, values.shape[1]))
+    for column in range(values.shape[1]):
+        result[:, column] = np.bincount(index, weights=values[:, column], minlength=length)
+    return result
+
+
+class ActivityStore(object):
+    """
+    Columnar store of everything that was read from the chat logs so far. Every (author, day) pair the author wrote
+    messages on is one row, holding the message count of each hour of that day and the number of commands. Rows are
+    only ever appended, so each day only the new log file needs to be folded in. All statistics are computed from
+    these arrays with vectorized reductions.
+    """
+
+    # Names of the arrays saved to disk
+    ARRAYS = ('days', 'author_ids', 'names', 'first_day', 'row_author', 'row_day', 'row_hours', 'row_commands',
+              'channel_names', 'channel_author', 'channel_index', 'channel_count')
+
+    def __init__(self):
+        self.processed = ''  # the last log file that was processed (empty if none)
+        self.date = None  # the day the statistics were last updated on
+        self.days = np.zeros(0)  # time stamp of every processed day
+        self.author_ids = np.zeros(0, dtype=str)
+        self.names = np.zeros(0, dtype=str)  # first name the author was seen with
+        self.first_day = np.zeros(0, dtype=np.int32)  # index of the day the author was first seen on
+        self.row_author = np.zeros(0, dtype=np.int32)
+        self.row_day = np.zeros(0, dtype=np.int32)
+        self.row_hours = np.zeros((0, 24), dtype=np.int32)
+        self.row_commands = np.zeros(0, dtype=np.int32)
+        self.channel_names = np.zeros(0, dtype=str)
+        self.channel_author = np.zeros(0, dtype=np.int32)  # (author, channel, count) triplets
+        self.channel_index = np.zeros(0, dtype=np.int32)
+        self.channel_count = np.zeros(0, dtype=np.int32)
+
+        self.__author_lookup = dict()  # author id -> index
+        self.__channel_lookup = dict()  # channel name -> index
+        self.__pending_days = list()
+        self.__pending_authors = list()
+        self.__pending_channels = list()
+        self.__pending_rows = list()  # (author, day, hours, commands)
+        self.__pending_channel_counts = list()  # (author, channel, count)
+        self.__refresh()
+
+    @classmethod
+    def load(cls, file_name):
+        store = cls()
+        with np.load(file_name) as data:
+            for name in cls.ARRAYS:
+                setattr(store, name, data[name])
+            store.processed = str(data['processed'])
+            store.date = str(data['date']) or None
+        store.__author_lookup = {author_id: i for i, author_id in enumerate(store.author_ids.tolist())}
+        store.__channel_lookup = {channel: i for i, channel in enumerate(store.channel_names.tolist())}
+        store.__refresh()
+        return store
+
+    def save(self, file_name):
+        # Write to a temporary file first, so a crash can't leave a half written store behind
+        with open(file_name + '.tmp', 'wb') as f:
+            np.savez_compressed(f, processed=np.array(self.processed), date=np.array(self.date or ''),
+                                **{name: getattr(self, name) for name in self.ARRAYS})
+        replace(file_name + '.tmp', file_name)
+
+    def fold_log_file(self, file_name, log_stamp):
+        """
+        Reads one day's log file. Files must be folded in chronological order. The statistics are only updated once
+        commit() is called.
+        :param file_name: Path to a chanlog-*.txt.xz file.
+        :param log_stamp: The day of the log file, as a time.struct_time.
+        """
+        day = len(self.days) + len(self.__pending_days)
+        hours = dict()  # author index -> message count per hour
+        commands = dict()  # author index -> command count
+        channels = dict()  # (author index, channel index) -> message count
+        try:
+            for line in LZMAFile(file_name, 'r'):
+                # parse the message into its components (author, timestamps, channel, etc.)
+                m = Message(line.decode('utf-8'))
+                author = self.__get_author_index(m.author_id, m.author, day)
+                if author not in hours:
+                    hours[author] = [0] * 24
+                    commands[author] = 0
+                hours[author][int(m.stamp.tm_hour)] += 1
+                commands[author] += len(get_commands_from_message(m.message))
+                key = (author, self.__get_channel_index(m.channel))
+                channels[key] = channels.get(key, 0) + 1
+        except:
+            pass
+
+        self.__pending_days.append(time.mktime(log_stamp))
+        for author, h in hours.items():
+            self.__pending_rows.append((author, day, h, commands[author]))
+        for (author, channel), count in channels.items():
+            self.__pending_channel_counts.append((author, channel, count))
+
+    def commit(self):
+        """
+        Appends everything that was folded since the last commit to the arrays, and updates the statistics.
+        """
+        if self.__pending_authors:
+            ids, names, first_day = zip(*self.__pending_authors)
+            self.author_ids = np.concatenate((self.author_ids, ids))
+            self.names = np.concatenate((self.names, names))
+            self.first_day = np.concatenate((self.first_day, np.array(first_day, dtype=np.int32)))
+        if self.__pending_channels:
+            self.channel_names = np.concatenate((self.channel_names, self.__pending_channels))
+        if self.__pending_rows:
+            author, day, hours, commands = zip(*self.__pending_rows)
+            self.row_author = np.concatenate((self.row_author, np.array(author, dtype=np.int32)))
+            self.row_day = np.concatenate((self.row_day, np.array(day, dtype=np.int32)))
+            self.row_hours = np.concatenate((self.row_hours, np.array(hours, dtype=np.int32)))
+            self.row_commands = np.concatenate((self.row_commands, np.array(commands, dtype=np.int32)))
+        if self.__pending_channel_counts:
+            # Merge the new channel counts into the existing triplets
+            author, channel, count = zip(*self.__pending_channel_counts)
+            keys = np.concatenate((self.channel_author.astype(np.int64) * len(self.channel_names) + self.channel_index,
+                                   np.array(author, dtype=np.int64) * len(self.channel_names) + channel))
+            keys, inverse = np.unique(keys, return_inverse=True)
+            counts = np.bincount(inverse, weights=np.concatenate((self.channel_count, count)), minlength=len(keys))
+            self.channel_author = (keys // len(self.channel_names)).astype(np.int32)
+            self.channel_index = (keys % len(self.channel_names)).astype(np.int32)
+            self.channel_count = counts.astype(np.int32)
+        self.days = np.concatenate((self.days, self.__pending_days))
+
+        self.__pending_days = list()
+        self.__pending_authors = list()
+        self.__pending_channels = list()
+        self.__pending_rows = list()
+        self.__pending_channel_counts = list()
+        self.__refresh()
+
+    def stats(self, member_id):
+        """
+        :param member_id: An author's ID, or 'server'.
+        :return: Returns the statistics dict of the author (see above).
+        :raises KeyError: If the author never wrote anything.
+        """
+        if member_id == 'server':
+            return self.__server_stats()
+        i = self.__author_lookup[member_id]
+        if i >= len(self.author_ids):
+            # Authors of a log file that is still being folded
+            raise KeyError(member_id)
+        rows = self.__author_rows[self.__author_offsets[i]:self.__author_offsets[i + 1]]
+        channels = self.__channel_rows[self.__channel_offsets[i]:self.__channel_offsets[i + 1]]
+        a = new_author_dict(str(self.names[i]))
+        a['userId'] = member_id
+        a['messages_total'] = int(self.__messages_total[i])
+        a['messages_last_week'] = int(self.__messages_last_week[i])
+        a['commands_total'] = int(self.__commands_total[i])
+        a['commands_last_week'] = int(self.__commands_last_week[i])
+        a['day_cycle_avg'] = self.__day_cycle_avg[i].tolist()
+        a['day_cycle_avg_week'] = self.__day_cycle_avg_week[i].tolist()
+        a['day_cycle_avg_day'] = self.__day_cycle_avg_day[i].tolist()
+        a['channels'] = {str(self.channel_names[c]): int(n)
+                         for c, n in zip(self.channel_index[channels], self.channel_count[channels])}
+        a['messages_per_day'] = {str(float(self.days[d])): int(n)
+                                 for d, n in zip(self.row_day[rows], self.__row_totals[rows])}
+        return a
+
+    def loudest(self, count):
+        """
+        :return: Returns a list of (name, messages last week) of the authors who wrote the most in the last week.
+        """
+        top = np.argsort(-self.__messages_last_week, kind='stable')[:count]
+        return [(str(self.names[i]), int(self.__messages_last_week[i])) for i in top]
+
+    def botspam_ratios(self, count):
+        """
+        :return: Returns a list of (name, commands last week, messages last week) of the authors with the highest
+        ratio of bot commands to messages in the last week.
+        """
+        # There are people who come on and spam some bot commands, then never return
+        messages = self.__messages_last_week
+        ratios = np.where(messages < 5, 0, self.__commands_last_week / np.maximum(messages, 1))
+        top = np.argsort(-ratios, kind='stable')[:count]
+        return [(str(self.names[i]), int(self.__commands_last_week[i]), int(messages[i])) for i in top]
+
+    def __get_author_index(self, author_id, name, day):
+        i = self.__author_lookup.get(author_id, None)
+        if i is None:
+            i = self.__author_lookup[author_id] = len(self.__author_lookup)
+            self.__pending_authors.append((author_id, name, day))
+        return i
+
+    def __get_channel_index(self, channel):
+        i = self.__channel_lookup.get(channel, None)
+        if i is None:
+            i = self.__channel_lookup[channel] = len(self.__channel_lookup)
+            self.__pending_channels.append(channel)
+        return i
+
+    def __refresh(self):
+        authors = len(self.author_ids)
+        days = len(self.days)
+        self.__row_totals = self.row_hours.sum(axis=1)
+
+        # Group rows and channel counts by author
+        self.__author_rows = np.argsort(self.row_author, kind='stable')
+        self.__author_offsets = np.searchsorted(self.row_author[self.__author_rows], np.arange(authors + 1))
+        self.__channel_rows = np.argsort(self.channel_author, kind='stable')
+        self.__channel_offsets = np.searchsorted(self.channel_author[self.__channel_rows], np.arange(authors + 1))
+
+        self.__messages_total = np.bincount(self.row_author, weights=self.__row_totals, minlength=authors)
+        self.__commands_total = np.bincount(self.row_author, weights=self.row_commands, minlength=authors)
+
+        # Averages are over the number of days since the author was first seen
+        total_days = (days - self.first_day).reshape(-1, 1)
+        self.__day_cycle_avg = _sum_rows_by(self.row_author, self.row_hours, authors) / np.maximum(total_days, 1)
+
+        week = self.row_day >= days - 7
+        day_cycle_week = _sum_rows_by(self.row_author[week], self.row_hours[week], authors)
+        self.__day_cycle_avg_week = day_cycle_week / 7.0
+        self.__messages_last_week = day_cycle_week.sum(axis=1)
+        self.__commands_last_week = np.bincount(self.row_author[week], weights=self.row_commands[week],
+                                                minlength=authors)
+
+        day = self.row_day == days - 1
+        self.__day_cycle_avg_day = _sum_rows_by(self.row_author[day], self.row_hours[day], authors)
+
+    def __server_stats(self):
+        s = new_author_dict('Server')
+        s['messages_total'] = int(self.__messages_total.sum())
+        s['messages_last_week'] = int(self.__messages_last_week.sum())
+        s['commands_total'] = int(self.__commands_total.sum())
+        s['day_cycle_avg'] = self.__day_cycle_avg.sum(axis=0).tolist()
+        s['day_cycle_avg_week'] = self.__day_cycle_avg_week.sum(axis=0).tolist()
+        s['day_cycle_avg_day'] = self.__day_cycle_avg_day.sum(axis=0).tolist()
+        channels = np.bincount(self.channel_index, weights=self.channel_count, minlength=len(self.channel_names))
+        s['channels'] = {str(name): int(n) for name, n in zip(self.channel_names, channels) if n > 0}
+        messages_per_day = np.bincount(self.row_day, weights=self.__row_totals, minlength=len(self.days))
+        s['messages_per_day'] = {str(float(stamp)): int(n) for stamp, n in zip(self.days, messages_per_day) if n > 0}
+        return s
+
+
+# Figures are rendered in worker processes, so matplotlib never blocks the event loop. The pool is shared by all
+# servers and created the first time a figure is needed.
+_render_pool = None
+
+
+def get_render_pool(max_workers):
+    global _render_pool
+    if _render_pool is None:
+        _render_pool = ProcessPoolExecutor(max_workers=max_workers)
+    return _render_pool
+
+
+def render_figure(member, image_file_name, loudest=None, ratios=None):
+    """
+    Plots the activity statistics of an author (or of the server) into a PNG file. This runs in a worker process, so
+    it only receives the data it needs to draw.
+    :param member: The author's (or server's) statistics from ActivityStore.stats().
+    :param image_file_name: Where to save the PNG.
+    :param loudest: For the server figure, a list of (name, messages last week) of the loudest users.
+    :param ratios: For the server figure, a list of (name, commands last week, messages last week) of the users with
+    the highest bot-to-message ratio.
+    :return: Returns the file name of the PNG.
+    """
+    # matplotlib takes a long time to import and is only needed here, so only the render processes import it
+    import pylab as plt
+    from matplotlib.dates import date2num
+    from matplotlib.gridspec import GridSpec
+    from matplotlib import ticker
+
+    # Set up figure
+    if loudest is not None:
+        fig = plt.figure(figsize=(8, 8), dpi=150)
+        gs = GridSpec(3, 2, height_ratios=[1, 1, 0.3])
+        ax1 = fig.add_subplot(gs[0])
+        ax2 = fig.add_subplot(gs[1])
+        ax3 = fig.add_subplot(gs[1, :])
+        ax4 = fig.add_subplot(gs[4])
+        ax5 = fig.add_subplot(gs[5])
+        ax4.axis('off')
+        ax4.set_ylim([1, 0])
+        ax5.axis('off')
+        ax5.set_ylim([1, 0])
+    else:
+        fig = plt.figure(figsize=(8, 6), dpi=150)
+        ax1 = fig.add_subplot(221)
+        ax2 = fig.add_subplot(222)
+        ax3 = fig.add_subplot(212)
+
+    # pyplot keeps a reference to every figure until it's closed
+    try:
+        fig.suptitle('{}\'s activity'.format(member['name']), fontsize=20)
+
+        # Plot 24 hour participation data, accumulated over all time
+        t = [x for x in range(24)]
+        y = [member['day_cycle_avg'][x] for x in t]
+        ax1.plot(t, y)
+        ax1_twin = ax1.twinx()
+        ax1_twin.plot(t, np.cumsum(y), '--')
+        #y = [member['day_cycle_avg_day'][x] for x in t]
+        #ax1.plot(t, y)
+        #ax1_twin.plot(t, np.cumsum(y), '--')
+        y = [member['day_cycle_avg_week'][x] for x in t]
+        ax1.plot(t, y)
+        ax1_twin.plot(t, np.cumsum(y), '--')
+        ax1.set_xlim([0, 24])
+        ax1.grid()
+        ax1.set_title('Daily Activity')
+        ax1.set_xlabel('Hour (UTC)')
+        ax1.set_ylabel('Message Count per Hour')
+        ax1_twin.set_ylabel('Message Count over 1 Day')
+        #ax1.legend(['Average', 'Last Day', 'Last Week'])
+        ax1.legend(['Average', 'Last Week'])
+
+        # Create pie chart of the most active channels
+        top = sorted(member['channels'], key=member['channels'].get, reverse=True)[:5]
+        if len(top) > 0:
+            labels = top
+            sizes = [member['channels'][x] for x in top]
+            explode = [0] * len(top)
+            explode[0] = 0.1
+            ax2.pie(sizes, explode=explode, labels=labels, autopct='%1.1f%%', shadow=True)
+
+        # Create overall activity
+        dates_and_messages = list(zip(*sorted(member['messages_per_day'].items(), key=lambda dv: dv[0])))
+        if len(dates_and_messages) > 0:
+            dates, values = dates_and_messages
+            dates = [datetime.fromtimestamp(float(x)) for x in dates]
+            dates = date2num(dates)
+            if len(values) > 80:
+                ax3.bar(dates, values, width=1)
+            else:
+                ax3.bar(dates, values)
+            ax3.xaxis_date()
+            ax3.set_title('Total Activity')
+            ax3.set_xlim([dates[0], dates[-1]])
+            ax3.set_ylabel('Message Count per Day')
+            ax3.grid()
+            ax3_twin = ax3.twinx()
+            ax3_twin.plot(dates, np.cumsum(values), 'g--')
+            ax3_twin.set_ylabel('Message Count over all Time')
+            ticks = ticker.FuncFormatter(lambda x, pos: '{0:g}k'.format(x / 1000))
+            ax3_twin.yaxis.set_major_formatter(ticks)
+            spacing = 2
+            for label in ax3.xaxis.get_ticklabels()[::spacing]:
+                label.set_visible(False)
+
+        if loudest is not None:
+            # Loudest users
+            if len(loudest) > 0:
+                ax4.text(0, 0.1, 'Loudest users this week')
+                for i, (name, messages) in enumerate(loudest):
+                    ax4.text(0.02, i*0.2+0.3, '{}. {} ({} msgs)'.format(i+1, name, messages))
+
+            # Botspam ratios
+            if len(ratios) > 0:
+                ax5.text(0, 0.1, 'Bot-to-message ratios this week')
+                for i, (name, commands, messages) in enumerate(ratios):
+                    if messages == 0:
+                        continue
+                    ax5.text(0.02, i*0.2+0.3, '{}. {} ({:.2f}%)'.format(i+1, name, 100.0 * commands / messages))
+
+        # Serve the figure only once it's complete, a concurrent request could otherwise send a half written file
+        temp_file_name = '{}.{}.tmp'.format(image_file_name, getpid())
+        fig.savefig(temp_file_name, format='png')
+        replace(temp_file_name, image_file_name)
+    finally:
+        plt.close(fig)
+    return image_file_name
+
+
 class Activity(glados.Module):
     def __init__(self, server_instance, full_name):
         super(Activity, self).__init__(server_instance, full_name)
 
         self.log_dir = join(self.local_data_dir, 'log')
         self.cache_dir = join(self.local_data_dir, 'activity')
-        self.cache_file = join(self.cache_dir, 'activity_cache.json.xz')
-        self.cache = None
+        self.store_file = join(self.cache_dir, 'activity.npz')
+        self.figure_dir = join(self.cache_dir, 'figures')
+        self.store = ActivityStore()
+        self.__is_processing = False
+        self.__renders = dict()  # image file name -> future of a render in progress
 
-        if not exists(self.cache_dir):
-            makedirs(self.cache_dir)
+        config = self.settings.setdefault('activity', {})
+        self.render_processes = config.setdefault('render processes', 2)
 
-        if isfile(self.cache_file):
-            self.cache = load_json_compressed(self.cache_file)
+        if not exists(self.figure_dir):
+            makedirs(self.figure_dir)
+
+        if isfile(self.store_file):
+            self.store = ActivityStore.load(self.store_file)
 
         async def getstats():
             userId = request.args.get("userId")
@@ -108,10 +474,7 @@ class Activity(glados.Module):
                 return jsonify(dict(error="Parameter 'userId' was not specified")), 500
 
             try:
-                if userId == "server":
-                    user = self.cache["server"]
-                else:
-                    user = self.cache["authors"][userId]
+                user = self.store.stats(userId)
             except KeyError:
                 return jsonify(dict(error=f"User with ID {userId} doesn't exist")), 500
 
@@ -123,7 +486,7 @@ class Activity(glados.Module):
                 return jsonify(dict(error="Parameter 'userId' was not specified")), 500
 
             try:
-                image_file_name = self.__generate_figure(userId)
+                image_file_name = await self.__generate_figure(userId)
             except KeyError:
                 return jsonify(dict(error=f"User with ID {userId} doesn't exist")), 500
 
@@ -137,116 +500,78 @@ class Activity(glados.Module):
     async def reprocess_cache(self, message, matches):
         # Check if cache is up to date
         date = datetime.now().strftime('%Y-%m-%d')
-        if self.cache is not None and self.cache['date'] == date:
+        if self.store.date == date:
+            return ()
+        if self.__is_processing:
             return ()
 
+        self.__is_processing = True
+        try:
+            await self.__update_cache(self.store, date)
+        finally:
+            self.__is_processing = False
+        return ()
+
+    @glados.Permissions.admin
+    @glados.Module.command('activityrebuild', '', 'Discards the activity statistics and rebuilds them from all logs')
+    async def rebuild_cache(self, message, args):
+        if self.__is_processing:
+            return await self.client.send_message(message.channel, 'Activity statistics are already being processed')
+
+        self.__is_processing = True
+        try:
+            # The current statistics are served until the new ones are complete
+            await self.client.send_message(message.channel, 'Rebuilding activity statistics, this may take a while...')
+            finished = await self.__update_cache(ActivityStore(), datetime.now().strftime('%Y-%m-%d'))
+        finally:
+            self.__is_processing = False
+        if not finished:
+            return await self.client.send_message(message.channel, 'Some logs are still being written, try again later')
+        await self.client.send_message(message.channel, 'Done!')
+
+    async def __update_cache(self, store, date):
+        """
+        Folds the logs of the days that are over into a store and makes it the current one.
+        :param store: The current store to update it, or an empty ActivityStore to rebuild everything.
+        :return: Returns False if a log file is still being written and the store wasn't finished.
+        """
         # Get list of all channel log files
         files = [join(self.log_dir, f) for f in listdir(self.log_dir) if isfile(join(self.log_dir, f))]
-        self.cache = dict()
-        self.cache['date'] = datetime.now().strftime('%Y-%m-%d')
-        authors = dict()
-        total_days = dict()  # Keep track of how many days a user has existed for, so we can calculate averages
-
-        # We don't want to process the last log file, because it doesn't contain a full day's worth of info
-        #                                  vvvvv
-        for i, f in enumerate(sorted(files)[:-1]):
+
+        # Only process log files of days that are over. Everything up to and including the watermark was already
+        # folded into the store.
+        for f in sorted(files):
             match = re.match('^.*/chanlog-([0-9]+-[0-9]+-[0-9]+).txt.xz$', f)
             if match is None:
                 continue
-            print(f)
-            log_stamp = strptime(match.group(1), '%Y-%m-%d')
-
-            # Update the total days counter of all users we've seen so far
-            for author in total_days:
-                total_days[author] += 1
-
-            # Update cycle counters to the current day
-            for k, v in authors.items():
-                v['day_cycle_acc_day'].appendleft([0]*24)
-                v['day_cycle_acc_week'].appendleft([0]*24)
-                v['commands_acc'].appendleft(0)
-
-            try:
-                for line in LZMAFile(f, 'r'):
-                    # parse the message into its components (author, timestamps, channel, etc.)
-                    m = Message(line.decode('utf-8'))
-
-                    # create an entry in the top-level "authors" dict in the cache structure, if not already there
-                    if m.author_id not in authors:
-                        authors[m.author_id] = new_author_dict(m.author)
-                        authors[m.author_id]['userId'] = m.author_id
-                        authors[m.author_id]['day_cycle_acc'] = [0]*24
-                        authors[m.author_id]['day_cycle_acc_day'] = deque([[0]*24], maxlen=1)
-                        authors[m.author_id]['day_cycle_acc_week'] = deque([[0]*24], maxlen=7)
-                        authors[m.author_id]['commands_acc'] = deque([0], maxlen=7)
-                        total_days[m.author_id] = 1
-
-                    a = authors[m.author_id]
-
-                    # keep track of the total message count
-                    a['messages_total'] += 1
-
-                    # See if message contains any commands
-                    command_count = len(get_commands_from_message(m.message))
-                    a['commands_total'] += command_count
-                    a['commands_acc'][0] += command_count
-
-                    # Accumulate message count cycles for later averaging
-                    a['day_cycle_acc'][int(m.stamp.tm_hour)] += 1
-                    a['day_cycle_acc_day'][0][int(m.stamp.tm_hour)] += 1
-                    a['day_cycle_acc_week'][0][int(m.stamp.tm_hour)] += 1
-
-                    # count messages per channel
-                    a['channels'][m.channel] = a['channels'].get(m.channel, 0) + 1
-
-                    # count how many messages the user makes for every day
-                    key = time.mktime(log_stamp)
-                    a['messages_per_day'][key] = a['messages_per_day'].get(key, 0) + 1
-            except:
+            if match.group(1) >= date:
+                break
+            if basename(f) <= store.processed:
                 continue
+            # The Log module keeps a journal while it still has buffered messages for a file. Try again later.
+            if isfile(join(self.log_dir, '.{}.journal'.format(basename(f)))):
+                return False
+            print(f)
+            store.fold_log_file(f, strptime(match.group(1), '%Y-%m-%d'))
+            store.processed = basename(f)
 
             # This process does take some time, so yield after processing every file
             await asyncio.sleep(0)
 
-        server_stats = new_author_dict('Server')
-
-        def sum_lists(a, b):
-            return [float(sum(x)) for x in zip(*[a, b])]
-        def add_dicts(a, b):
-            return {x: a.get(x, 0) + b.get(x, 0) for x in set(a).union(b)}
-
-        for author, a in authors.items():
-            # Calculate average day cycle using the accumulated cycle
-            for i, v in enumerate(a['day_cycle_acc']):
-                a['day_cycle_avg'][i] = float(v / total_days[author])
-            # There are 7 lists of day cycles that need to be added up, then divided by 7
-            a['day_cycle_avg_week'] = [float(sum(x)/7.0) for x in zip(*a['day_cycle_acc_week'])]
-            # Days are easier, just use the first (and only) item
-            a['day_cycle_avg_day'] = [float(x) for x in a['day_cycle_acc_day'][0]]
-            a['messages_last_week'] = int(sum(sum(x) for x in zip(*a['day_cycle_acc_week'])))
-            a['commands_last_week'] = int(sum(a['commands_acc']))
-
-            # Accumulate all of these stats into the server stats
-            server_stats['messages_total'] += a['messages_total']
-            server_stats['messages_last_week'] += a['messages_last_week']
-            server_stats['commands_total'] += a['commands_total']
-            server_stats['day_cycle_avg'] = sum_lists(server_stats['day_cycle_avg'], a['day_cycle_avg'])
-            server_stats['day_cycle_avg_week'] = sum_lists(server_stats['day_cycle_avg_week'], a['day_cycle_avg_week'])
-            server_stats['day_cycle_avg_day'] = sum_lists(server_stats['day_cycle_avg_day'], a['day_cycle_avg_day'])
-            server_stats['channels'] = add_dicts(server_stats['channels'], a['channels'])
-            server_stats['messages_per_day'] = add_dicts(server_stats['messages_per_day'], a['messages_per_day'])
-
-            # Delete the temporary keys before saving
-            del a['day_cycle_acc']
-            del a['day_cycle_acc_day']
-            del a['day_cycle_acc_week']
-            del a['commands_acc']
-
-        # Finally, save cache
-        self.cache['server'] = server_stats
-        self.cache['authors'] = authors
-        save_json_compressed(self.cache_file, self.cache)
-        return ()
+        # Finally, update statistics and save the store
+        store.commit()
+        store.date = date
+        store.save(self.store_file)
+        self.store = store
+
+        # The store replaces the JSON cache older versions kept, which can be rebuilt from the logs at any time
+        for f in ('activity_cache.json.xz', 'activity_state.json.xz'):
+            if isfile(join(self.cache_dir, f)):
+                remove(join(self.cache_dir, f))
+
+        # Figures of the previous statistics are outdated now
+        self.__clear_figures()
+        return True
 
     @glados.Module.command('activity', '[user]',
                            'Plots activity statistics for a user')
@@ -277,119 +602,49 @@ class Activity(glados.Module):
             member_ids = [message.author.id]
         await self.plot_activity_for_ids(message.channel, member_ids)
 
-        resp = requests.post("http://discordgrapher.net/api/consumeusage", headers={"Content-type":"application/json"}, json=self.cache["authors"][member_ids[0]])
-        if resp.status_code == 200:
-            json_response = json.loads(resp.content)
+        resp = await self.http.post("http://discordgrapher.net/api/consumeusage", headers={"Content-type":"application/json"}, json=self.store.stats(member_ids[0]))
+        if resp.status == 200:
+            json_response = resp.json()
             await self.client.send_message(message.channel, f"View realtime graph @ {json_response['url']}")
         else:
             await self.client.send_message(message.channel,
-                                           f"Error occured in request to discordgrapher @ {resp.status_code} : {resp.content}")
+                                           f"Error occured in request to discordgrapher @ {resp.status} : {resp.body}")
 
     async def plot_activity_for_ids(self, channel, member_ids):
         for member_id in member_ids:
-            image_file_name = self.__generate_figure(member_id)
+            image_file_name = await self.__generate_figure(member_id)
             await self.client.send_file(channel, image_file_name)
 
-    def __generate_figure(self, member_id):
-        # Set up figure
-        if member_id == 'server':
-            member = self.cache['server']
-            fig = plt.figure(figsize=(8, 8), dpi=150)
-            gs = GridSpec(3, 2, height_ratios=[1, 1, 0.3])
-            ax1 = fig.add_subplot(gs[0])
-            ax2 = fig.add_subplot(gs[1])
-            ax3 = fig.add_subplot(gs[1, :])
-            ax4 = fig.add_subplot(gs[4])
-            ax5 = fig.add_subplot(gs[5])
-            ax4.axis('off')
-            ax4.set_ylim([1, 0])
-            ax5.axis('off')
-            ax5.set_ylim([1, 0])
-        else:
-            member = self.cache['authors'][member_id]
-            fig = plt.figure(figsize=(8, 6), dpi=150)
-            ax1 = fig.add_subplot(221)
-            ax2 = fig.add_subplot(222)
-            ax3 = fig.add_subplot(212)
-        fig.suptitle('{}\'s activity'.format(member['name']), fontsize=20)
-
-        # Plot 24 hour participation data, accumulated over all time
-        t = [x for x in range(24)]
-        y = [member['day_cycle_avg'][x] for x in t]
-        ax1.plot(t, y)
-        ax1_twin = ax1.twinx()
-        ax1_twin.plot(t, cumsum(y), '--')
-        #y = [member['day_cycle_avg_day'][x] for x in t]
-        #ax1.plot(t, y)
-        #ax1_twin.plot(t, cumsum(y), '--')
-        y = [member['day_cycle_avg_week'][x] for x in t]
-        ax1.plot(t, y)
-        ax1_twin.plot(t, cumsum(y), '--')
-        ax1.set_xlim([0, 24])
-        ax1.grid()
-        ax1.set_title('Daily Activity')
-        ax1.set_xlabel('Hour (UTC)')
-        ax1.set_ylabel('Message Count per Hour')
-        ax1_twin.set_ylabel('Message Count over 1 Day')
-        #ax1.legend(['Average', 'Last Day', 'Last Week'])
-        ax1.legend(['Average', 'Last Week'])
-
-        # Create pie chart of the most active channels
-        top = sorted(member['channels'], key=member['channels'].get, reverse=True)[:5]
-        if len(top) > 0:
-            labels = top
-            sizes = [member['channels'][x] for x in top]
-            explode = [0] * len(top)
-            explode[0] = 0.1
-            ax2.pie(sizes, explode=explode, labels=labels, autopct='%1.1f%%', shadow=True)
-
-        # Create overall activity
-        dates_and_messages = list(zip(*sorted(member['messages_per_day'].items(), key=lambda dv: dv[0])))
-        if len(dates_and_messages) > 0:
-            dates, values = dates_and_messages
-            dates = [datetime.fromtimestamp(float(x)) for x in dates]
-            dates = date2num(dates)
-            if len(values) > 80:
-                ax3.bar(dates, values, width=1)
-            else:
-                ax3.bar(dates, values)
-            ax3.xaxis_date()
-            ax3.set_title('Total Activity')
-            ax3.set_xlim([dates[0], dates[-1]])
-            ax3.set_ylabel('Message Count per Day')
-            ax3.grid()
-            ax3_twin = ax3.twinx()
-            ax3_twin.plot(dates, cumsum(values), 'g--')
-            ax3_twin.set_ylabel('Message Count over all Time')
-            ticks = ticker.FuncFormatter(lambda x, pos: '{0:g}k'.format(x / 1000))
-            ax3_twin.yaxis.set_major_formatter(ticks)
-            spacing = 2
-            for label in ax3.xaxis.get_ticklabels()[::spacing]:
-                label.set_visible(False)
-
+    async def __generate_figure(self, member_id):
+        """
+        Renders the figure of a member (or 'server') in the render pool. Figures are cached until the statistics are
+        updated, and simultaneous requests for the same figure share one render.
+        :return: Returns the file name of the PNG.
+        :raises KeyError: If the member has no statistics.
+        """
+        member = self.store.stats(member_id)
+
+        image_file_name = join(self.figure_dir, '{}-{}.png'.format(member_id, self.store.date))
+        render = self.__renders.get(image_file_name, None)
+        if render is not None:
+            return await asyncio.shield(render)
+        if isfile(image_file_name):
+            return image_file_name
+
+        loudest, ratios = None, None
         if member_id == 'server':
-            # Determine loudest users, if we are server
-            top = sorted(self.cache['authors'].items(), key=lambda kv: kv[1]['messages_last_week'], reverse=True)
-            if len(top) > 0:
-                top = top[:10]
-                ax4.text(0, 0.1, 'Loudest users this week')
-                for i, a in enumerate(top):
-                    ax4.text(0.02, i*0.2+0.3, '{}. {} ({} msgs)'.format(i+1, a[1]['name'], a[1]['messages_last_week']))
-
-            # Determine botspam ratios
-            top = sorted(self.cache['authors'].items(),
-                         key=lambda kv: 0 if kv[1]['messages_last_week'] < 5  # There are people who come on and spam some bot commands, then never return
-                                          else float(kv[1]['commands_last_week'])/kv[1]['messages_last_week'],
-                          reverse=True)
-            if len(top) > 0:
-                top = top[:10]
-                ax5.text(0, 0.1, 'Bot-to-message ratios this week')
-                for i, a in enumerate(top):
-                    if a[1]['messages_last_week'] == 0:
-                        continue
-                    ax5.text(0.02, i*0.2+0.3, '{}. {} ({:.2f}%)'.format(
-                        i+1, a[1]['name'], 100.0 * a[1]['commands_last_week'] / a[1]['messages_last_week']))
-
-        image_file_name = join(self.cache_dir, member['name'] + '.png')
-        fig.savefig(image_file_name)
-        return image_file_name
+            # Determine loudest users and botspam ratios, if we are server
+            loudest = self.store.loudest(10)
+            ratios = self.store.botspam_ratios(10)
+
+        pool = get_render_pool(self.render_processes)
+        render = asyncio.get_event_loop().run_in_executor(
+            pool, render_figure, member, image_file_name, loudest, ratios)
+        self.__renders[image_file_name] = render
+        render.add_done_callback(lambda f: self.__renders.pop(image_file_name, None))
+        return await asyncio.shield(render)
+
+    def __clear_figures(self):
+        for f in listdir(self.figure_dir):
+            if f.endswith('.png'):
+                remove(join(self.figure_dir, f))
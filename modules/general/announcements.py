@@ -1,8 +1,5 @@
 import dateutil.parser
-import json
-import asyncio
-from datetime import datetime, timezone, timedelta
-from os.path import join, isfile
+import time
 from glados import Module, Permissions
 
 
@@ -54,6 +51,8 @@ class AnnounceInfo(object):
             self.message = ' '.join(parts[1:])
         except ValueError:
             raise RuntimeError('Failed to parse date/interval')
+        if self.interval <= 0:
+            raise RuntimeError('The interval must be greater than 0 hours')
 
     def write_to_db(self, data):
         typ = 'date' if self.date else 'interval'
@@ -80,29 +79,35 @@ class Announcements(Module):
     def __init__(self, bot, full_name):
         super(Announcements, self).__init__(bot, full_name)
 
-        self.__running_tasks = dict()
-        self.db_file = join(self.local_data_dir, 'announcements.json')
-        self.db = dict()
-        self.__load_db()
-
-        for ID, announcement in self.db.items():
-            a = self.__load_announcement(ID)
-            self.__start_announce_task(a)
-
-    def __start_announce_task(self, a):
-        self.__running_tasks[a.ID] = asyncio.ensure_future(self.announce_task(a))
-
-    async def announce_task(self, a):
+        self.db = self.store('announcements.json')
+
+        # The bot's scheduler keeps track of when each announcement is due. Schedule announcements that were added
+        # before that (or whose job got lost) and drop jobs of announcements that no longer exist.
+        scheduled = set(job.name for job in self.scheduled_jobs())
+        for ID in list(self.db):
+            if ID not in scheduled:
+                try:
+                    self.__schedule_announcement(self.__load_announcement(ID))
+                except RuntimeError:
+                    pass
+        for ID in scheduled.difference(self.db):
+            self.unschedule(ID)
+
+    def __schedule_announcement(self, a):
         if a.is_interval:
-            while True:
-                await asyncio.sleep(a.interval * 3600)
-                await a.client.send_message(a.channel, a.message)
+            self.schedule(str(a.ID), time.time() + a.interval * 3600, interval=a.interval * 3600)
         else:
-            delta = a.date - datetime.now(timezone.utc)
-            if delta > timedelta(hours=0):
-                await asyncio.sleep(delta.total_seconds())
-            await a.client.send_message(a.channel, a.message)
-            self.__running_tasks.pop(a.ID)
+            date = a.date if not isinstance(a.date, str) else dateutil.parser.parse(a.date)
+            self.schedule(str(a.ID), date)
+
+    async def on_scheduled(self, job):
+        try:
+            a = self.__load_announcement(job.name)
+        except RuntimeError:
+            return
+        await self.client.send_message(a.channel, a.message)
+        if a.is_date:
+            self.db.pop(job.name, None)
 
     @Permissions.admin
     @Module.command('addannouncement', '<hours|date> <message>', 'Causes <message> to be sent either every <hours> '
@@ -112,7 +117,7 @@ class Announcements(Module):
         try:
             a = self.__new_announcement(message, content)
             self.__write_announcement(a)
-            self.__start_announce_task(a)
+            self.__schedule_announcement(a)
         except RuntimeError as e:
             return await self.client.send_message(message.channel, str(e))
 
@@ -130,11 +135,12 @@ class Announcements(Module):
     @Module.command('lsannouncements', '', 'Lists all active announcements and their IDs.')
     async def lsannouncements(self, message, content):
         strings = list()
-        for ID, a_dict in self.db.items():
+        for ID in list(self.db):
             try:
                 a = self.__load_announcement(ID)
             except RuntimeError:
                 self.__rm_announcement(ID)
+                continue
             strings += ['({}) #{}: {}'.format(a.ID, a.channel.name, a.message)]
 
         for msg in self.pack_into_messages(strings):
@@ -162,23 +168,11 @@ class Announcements(Module):
 
     def __write_announcement(self, a):
         a.write_to_db(self.db)
-        self.__save_db()
 
     def __rm_announcement(self, ID):
+        self.unschedule(str(ID))
         try:
             self.db.pop(str(ID))
-            self.__save_db()
-            task = self.__running_tasks.get(ID, None)
-            if task:
-                task.cancel()
             return True
         except KeyError:
             return False
-
-    def __load_db(self):
-        if isfile(self.db_file):
-            self.db = json.loads(open(self.db_file).read())
-
-    def __save_db(self):
-        with open(self.db_file, 'w') as f:
-            f.write(json.dumps(self.db, indent=2, sort_keys=True))
@@ -1,10 +1,11 @@
 import glados
+import asyncio
 import collections
-import json
+import heapq
+import time
 import discord
 import dateutil.parser
 from datetime import datetime, timedelta
-from os.path import join, isfile
 
 BUFFER_LEN = 5
 TIME_THRESHOLD = 2  # If the average time between messages sinks below this (in seconds), the user is muted
@@ -12,13 +13,23 @@ TIME_THRESHOLD = 2  # If the average time between messages sinks below this (in
 
 class AntiSpam(glados.Module):
 
+    UNMUTE_RETRY_DELAY = 60  # seconds until removing the mute role is tried again, if it failed
+
     def __init__(self, bot, full_name):
         super(AntiSpam, self).__init__(bot, full_name)
 
-        self.__times = dict()
-        self.db_file = join(self.local_data_dir, 'antispam.json')
-        self.db = dict()
-        self.__load_db()
+        self.__times = dict()  # member id -> monotonic times of the last BUFFER_LEN messages
+        self.__expiry_heap = list()  # (timestamp, expiry date, member id)
+        self.__unmute_handle = None
+        self.__unmute_scheduled_for = None
+        self.db = self.store('antispam.json')
+        for member_id, expiry in self.db.get('users', {}).items():
+            self.__schedule_expiry(member_id, expiry)
+
+    def shutdown(self):
+        if self.__unmute_handle is not None:
+            self.__unmute_handle.cancel()
+            self.__unmute_handle = None
 
     @glados.Permissions.spamalot
     @glados.Module.rule('^.*$')
@@ -27,7 +38,9 @@ class AntiSpam(glados.Module):
         if 'role' not in self.db:
             return ()
 
-        await self.__unmute_expired_users()
+        # Expired mutes are removed by a timer. It can only be started once the event loop is running, though
+        if self.__unmute_handle is None and len(self.__expiry_heap) > 0:
+            self.__schedule_next_unmute()
         await self.__mute_evaded_users(message)
 
         # moderators and above cannot be muted
@@ -38,18 +51,15 @@ class AntiSpam(glados.Module):
         if message.author.id in self.db['users']:
             return ()
 
-        if message.author.id not in self.__times:
-            self.__times[message.author.id] = collections.deque([datetime.now()], maxlen=BUFFER_LEN)
-            return tuple()
-
-        d = self.__times[message.author.id]
-        d.append(datetime.now())
+        d = self.__times.get(message.author.id, None)
+        if d is None:
+            d = self.__times[message.author.id] = collections.deque(maxlen=BUFFER_LEN)
+        d.append(time.monotonic())
         if len(d) < BUFFER_LEN:
             return tuple()
 
-        diffs = [d[i] - d[i-1] for i in range(1, len(d))]
-        s = sum(x.total_seconds() for x in diffs)
-        if s < TIME_THRESHOLD * BUFFER_LEN:
+        # The differences between consecutive messages add up to the time between the oldest and the newest one
+        if d[-1] - d[0] < TIME_THRESHOLD * BUFFER_LEN:
             try:
                 await self.__mute_user(message.author, self.db['length'])
                 msg = self.db['msg']
@@ -66,7 +76,6 @@ class AntiSpam(glados.Module):
     async def muterole(self, message, content):
         if content == 'none':
             self.db.pop('role', None)
-            self.__save_db()
             await self.client.send_message(message.channel, 'Anti-spam deactivated')
             return
 
@@ -77,17 +86,19 @@ class AntiSpam(glados.Module):
                 db.setdefault('users', {})
                 db.setdefault('msg', '{0} You were muted for spamming until {1}')
 
-                muted_users = [(self.server.get_member(uid), exp) for uid, exp in db['users'].items()]
+                muted_users = [(self.member_index.get(uid), exp) for uid, exp in db['users'].items()]
                 muted_users = list(filter(lambda x: x[0] is not None, muted_users))
 
+                # Move existing mutes over to the new role, keeping their expiry dates
                 if 'role' in db:
                     for user, exp in muted_users:
-                        self.__unmute_user(user)
+                        await self.client.remove_roles(user, *self.__mute_roles())
 
                 db['role'] = role.id
 
                 for user, exp in muted_users:
-                    self.__mute_user(user, exp)
+                    await self.client.add_roles(user, *self.__mute_roles())
+                self.__schedule_next_unmute()
 
                 await self.client.send_message(message.channel,
                     'Role "{}" set up as mute role (mute length is {} hour(s)). Re-muted existing user(s) {}'.format(
@@ -109,7 +120,6 @@ class AntiSpam(glados.Module):
             return
 
         self.db['length'] = hours
-        self.__save_db()
         await self.client.send_message(message.channel, 'Mute length set to {}'.format(
             'forever' if hours == 0 else '{} hours'.format(hours)
         ))
@@ -120,7 +130,6 @@ class AntiSpam(glados.Module):
                            '"Sorry {0}, you were muted until {1}"')
     async def mutemessage(self, message, content):
         self.db['msg'] = content
-        self.__save_db()
         msg = content.replace('{0}', '<user>').replace('{1}', '<expiry>')
         await self.client.send_message(message.channel, 'Message changed to "{}"'.format(msg))
 
@@ -173,18 +182,17 @@ class AntiSpam(glados.Module):
             return ()
 
         muted_members = list()
-        for member in self.server.members:
-
-            expiry_date = muted_dict.get(member.id, None)
-            if expiry_date is None:
-                continue  # This member is not muted
+        for member_id, expiry_date in muted_dict.items():
+            member = self.member_index.get(member_id)
+            if member is None:
+                continue  # Not on this server anymore
 
             if not expiry_date == 'never':
                 expiry_date = dateutil.parser.parse(expiry_date)
                 now = datetime.now()
                 if expiry_date > now:
                     time_to_expiry = expiry_date - now
-                    time_to_expiry = '{0:.1f} hour(s)'.format(time_to_expiry.seconds / 3600.0)
+                    time_to_expiry = '{0:.1f} hour(s)'.format(time_to_expiry.total_seconds() / 3600.0)
                 else:
                     time_to_expiry = '0 hour(s)'
             else:
@@ -203,32 +211,76 @@ class AntiSpam(glados.Module):
     async def __mute_user(self, member, length):
         expiry = 'never' if length == 0 else (datetime.now() + timedelta(hours=length)).isoformat()
         self.db['users'][member.id] = expiry
-        self.__save_db()
+        self.__schedule_expiry(member.id, expiry)
+        self.__schedule_next_unmute()
 
-        role_id = self.db['role']
-        roles = [role for role in self.server.roles if role.id == role_id]
-        await self.client.add_roles(member, *roles)
+        await self.client.add_roles(member, *self.__mute_roles())
 
     async def __unmute_user(self, member):
-        role_id = self.db['role']
-        roles = [role for role in self.server.roles if role.id == role_id]
-        await self.client.remove_roles(member, *roles)
+        await self.client.remove_roles(member, *self.__mute_roles())
 
         self.db['users'].pop(member.id)
-        self.__save_db()
+
+    def __mute_roles(self):
+        role_id = self.db['role']
+        return [role for role in self.server.roles if role.id == role_id]
+
+    def __schedule_expiry(self, member_id, expiry):
+        if expiry == 'never':
+            return
+        timestamp = dateutil.parser.parse(expiry).timestamp()
+        heapq.heappush(self.__expiry_heap, (timestamp, expiry, member_id))
+
+    def __schedule_next_unmute(self):
+        """
+        Makes sure the timer fires when the earliest mute expires. Mutes that were lifted or extended in the meantime
+        stay in the heap and are skipped when they come up.
+        """
+        if len(self.__expiry_heap) == 0:
+            return
+        timestamp = self.__expiry_heap[0][0]
+        if self.__unmute_handle is not None:
+            if self.__unmute_scheduled_for <= timestamp:
+                return
+            self.__unmute_handle.cancel()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.__unmute_handle = None
+            return  # Not running yet, the first message will schedule it
+        self.__unmute_scheduled_for = timestamp
+        self.__unmute_handle = loop.call_later(max(0, timestamp - time.time()), self.__start_unmute)
+
+    def __start_unmute(self):
+        self.__unmute_handle = None
+        asyncio.ensure_future(self.__unmute_expired_users())
 
     async def __unmute_expired_users(self):
-        now = datetime.now().isoformat()
-        muted_users = self.db['users']
-        users_to_unmute = [id for id, expiry in muted_users.items() if not expiry == 'never' and now > expiry]
+        # Without a mute role there is nothing to remove. Setting a role again reschedules the timer.
+        if 'role' not in self.db:
+            return
 
-        for user_id in users_to_unmute:
-            member = self.server.get_member(user_id)
-            if member is not None:
-                await self.__unmute_user(member)
-            else:
-                self.db['users'].pop(user_id)
-                self.__save_db()
+        now = time.time()
+        muted_users = self.db['users']
+        try:
+            while len(self.__expiry_heap) > 0 and self.__expiry_heap[0][0] <= now:
+                timestamp, expiry, user_id = heapq.heappop(self.__expiry_heap)
+                if not muted_users.get(user_id, None) == expiry:
+                    continue  # Unmuted or muted again in the meantime
+
+                member = self.member_index.get(user_id)
+                if member is None:
+                    muted_users.pop(user_id)
+                    continue
+                try:
+                    await self.__unmute_user(member)
+                except Exception as e:
+                    # e.g. missing permissions or rate limits. The user stays muted until it worked.
+                    glados.log('Failed to unmute {}, trying again in {}s: {}'.format(
+                        member.name, self.UNMUTE_RETRY_DELAY, e))
+                    heapq.heappush(self.__expiry_heap, (now + self.UNMUTE_RETRY_DELAY, expiry, user_id))
+        finally:
+            self.__schedule_next_unmute()
 
     async def __mute_evaded_users(self, message):
         # Flagged as muted, but doesn't have the mute role?
@@ -240,11 +292,3 @@ class AntiSpam(glados.Module):
                 await self.client.send_message(message.channel,
                     "{} You were muted for {} hour(s) for trying to evade punishment".format(message.author.mention, length))
             return ()
-
-    def __load_db(self):
-        if isfile(self.db_file):
-            self.db = json.loads(open(self.db_file).read())
-
-    def __save_db(self):
-        with open(self.db_file, 'w') as f:
-            f.write(json.dumps(self.db, indent=2, sort_keys=True))
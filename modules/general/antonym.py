@@ -1,5 +1,4 @@
 from urllib.parse import quote
-from urllib.request import urlopen
 from glados import Module
 from bs4 import BeautifulSoup
 
@@ -11,7 +10,7 @@ class Antonym(Module):
     async def lookup_antonym(self, message, content):
         first_word = content.split(maxsplit=2)[0]
         url = URI + quote(first_word)
-        response = urlopen(url).read().decode("utf-8")
+        response = (await self.http.get(url)).text()
         soup = BeautifulSoup(response, 'lxml')
         results = soup.find("div", {"class": "boxResult"}).find_all("a")
         if results is None:
@@ -12,12 +12,13 @@ burns = [
 
 
 class Burn(glados.Module):
+    scope = glados.Module.PROCESS
 
     def __init__(self, bot, full_name):
         super(Burn, self).__init__(bot, full_name)
 
         self.counter = 0
-        self.burns = dict()
+        self.server_burns = dict()  # server id -> burns of that server
 
     @glados.Module.command('burn', '<user>', 'Burn a user when you feel like he just got pwned')
     async def burn_user(self, message, content):
@@ -29,15 +30,12 @@ class Burn(glados.Module):
         burn = burns[self.counter]
         self.counter = (self.counter + 1) % len(burns)
 
-        if not user_burning in self.burns:
-            self.burns[user_burning] = dict()
-        if not user_being_burned in self.burns[user_burning]:
-            self.burns[user_burning] = {user_being_burned: 0}
-        if not user_being_burned in self.burns:
-            self.burns[user_being_burned] = {user_burning: 0}
-        self.burns[user_burning][user_being_burned] += 1
+        server_burns = self.server_burns.setdefault(self.server.id, dict())
+        server_burns.setdefault(user_burning, dict()).setdefault(user_being_burned, 0)
+        server_burns.setdefault(user_being_burned, dict()).setdefault(user_burning, 0)
+        server_burns[user_burning][user_being_burned] += 1
 
         response = "@{0} {1}\n{2}: {3}\n{4}: {5}".format(user_being_burned, burn,
-                                                         user_burning, self.burns[user_burning][user_being_burned],
-                                                         user_being_burned, self.burns[user_being_burned][user_burning])
+                                                         user_burning, server_burns[user_burning][user_being_burned],
+                                                         user_being_burned, server_burns[user_being_burned][user_burning])
         await self.client.send_message(message.channel, response)
@@ -4,6 +4,8 @@ import dice
 
 
 class Dice(Module):
+    scope = Module.PROCESS
+
     @Module.command('roll', '[number of sides]', 'Rolls a die. Defaults to 6')
     async def roll(self, message, args):
         if not args:
@@ -7,9 +7,10 @@ http://sopel.chat
 """
 from __future__ import unicode_literals, absolute_import, print_function, division
 
+import asyncio
 import re
+import aiohttp
 import glados
-import urllib.request
 import urllib.parse
 
 
@@ -35,7 +36,7 @@ class Etymology(glados.Module):
         html = self.r_whitespace.sub(' ', html)
         return urllib.parse.unquote(html)
 
-    def etymology(self, word):
+    async def etymology(self, word):
         # @@ <nsh> sbp, would it be possible to have a flag for .ety to get 2nd/etc
         # entries? - http://swhack.com/logs/2006-07-19#T15-05-29
 
@@ -44,7 +45,7 @@ class Etymology(glados.Module):
         word = {'axe': 'ax/axe'}.get(word, word)
 
         uri = self.etyuri + urllib.parse.urlencode(dict(term=word))
-        bytes = urllib.request.urlopen(uri).read().decode('utf-8')
+        bytes = (await self.http.get(uri)).text()
         definitions = self.r_definition.findall(bytes)
 
         if not definitions:
@@ -71,8 +72,8 @@ class Etymology(glados.Module):
         """Look up the etymology of a word"""
 
         try:
-            result = self.etymology(word)
-        except IOError:
+            result = await self.etymology(word)
+        except (IOError, aiohttp.ClientError, asyncio.TimeoutError):
             msg = "Can't connect to etymonline.com (%s)" % (self.etyuri % word)
             await self.client.send_message(message.channel, msg)
             return
@@ -1,12 +1,11 @@
 import glados
-import urllib.request
 from bs4 import BeautifulSoup
 
 
 class Fact(glados.Module):
     @glados.Module.command('fact', '', 'Look up a random fact')
     async def fact(self, message, args):
-        response = urllib.request.urlopen('http://randomfactgenerator.net/').read().decode('utf-8')
+        response = (await self.http.get('http://randomfactgenerator.net/')).text()
         soup = BeautifulSoup(response, 'lxml')
         fact_div = soup.find('div', {'id': 'z'})
         if len(fact_div.contents) == 0:
@@ -3,6 +3,8 @@ import urllib.parse
 
 
 class Google(glados.Module):
+    scope = glados.Module.PROCESS
+
     @glados.Module.command('bagel', '<term>', 'Show that you don\'t know how to use google')
     @glados.Module.command('google', '<term>', 'Generate a google link')
     async def google(self, message, term):
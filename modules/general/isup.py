@@ -7,7 +7,6 @@ import glados
 import re
 import socket
 import validators
-import urllib.request
 
 class IsUp(glados.Module):
     
@@ -29,7 +28,7 @@ class IsUp(glados.Module):
             site += ".com"
 
         try:
-            response = urllib.request.urlopen(site, timeout=5).getcode()
+            response = (await self.http.get(site, timeout=5)).status
         except Exception as e:
             return await self.client.send_message(message.channel, site + ' looks down from here. (Exception: {})'.format(str(e)))
 
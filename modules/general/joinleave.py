@@ -11,21 +11,17 @@ class JoinLeave(glados.Module):
         self.db_file = join(self.local_data_dir, 'joinleave.json')
         self.__load_db()
 
-        @self.client.event
-        async def on_member_join(member):
-            for channel in self.client.get_all_channels():
-                if member.server.id == channel.server.id and channel.id in self.db['join messages']:
-                    msg = self.db['join messages'][channel.id].replace('{}', member.mention)
-                    await self.client.send_message(channel, msg)
-            return ()
-
-        @self.client.event
-        async def on_member_remove(member):
-            for channel in self.client.get_all_channels():
-                if member.server.id == channel.server.id and channel.id in self.db['leave messages']:
-                    msg = self.db['leave messages'][channel.id].replace('{}', member.name)
-                    await self.client.send_message(channel, msg)
-            return ()
+    async def on_member_join(self, member):
+        for channel in self.server.channels:
+            if channel.id in self.db['join messages']:
+                msg = self.db['join messages'][channel.id].replace('{}', member.mention)
+                await self.client.send_message(channel, msg)
+
+    async def on_member_remove(self, member):
+        for channel in self.server.channels:
+            if channel.id in self.db['leave messages']:
+                msg = self.db['leave messages'][channel.id].replace('{}', member.name)
+                await self.client.send_message(channel, msg)
 
     @glados.Permissions.admin
     @glados.Module.command('addjoin', '<channel> <msg>', 'Add a message to print when a user joins. You can use '
@@ -1,6 +1,5 @@
 from glados import Module
 from urllib.parse import urlencode, urljoin
-from urllib.request import urlopen
 from bs4 import BeautifulSoup
 
 KYM_URL    = 'http://knowyourmeme.com'
@@ -12,9 +11,9 @@ class KYMException(Exception):
         super(KYMException, self).__init__(message)
 
 
-def get_meme_info(url):
+async def get_meme_info(http, url):
     try:
-        html = urlopen(url).read().decode('utf-8')
+        html = (await http.get(url)).text()
         soup = BeautifulSoup(html, 'lxml')
         about = accumulate_to(soup.find('h2', {'id': 'about'}), ['h2', 'h3', 'h4'])
         origin = accumulate_to(soup.find('h2', {'id': 'origin'}), ['h2', 'h3', 'h4'])
@@ -48,8 +47,8 @@ class KnowYourMeme(Module):
     @Module.command('meme', '', '')
     async def search(self, message, content):
         try:
-            url = self.search_meme(content)
-            about, origin = get_meme_info(url)
+            url = await self.search_meme(content)
+            about, origin = await get_meme_info(self.http, url)
         except KYMException as e:
             return await self.client.send_message(message.channel, 'Error: {}'.format(e))
 
@@ -59,14 +58,13 @@ class KnowYourMeme(Module):
         for msg in self.pack_into_messages('**About**\n{}\n\n**Origin**\n{}'.format(about, origin).split(' '), delimiter=' '):
             await self.client.send_message(message.channel, msg)
 
-    @staticmethod
-    def search_meme(query):
+    async def search_meme(self, query):
         url = KYM_SEARCH + urlencode(dict(
             context='entries',
             sort='relevance',
             q=query
         ))
-        html = urlopen(url).read().decode('utf-8')
+        html = (await self.http.get(url)).text()
         soup = BeautifulSoup(html, 'lxml')
         entries = soup.find('div', {'id': 'entries'})
 
@@ -1,9 +1,16 @@
+import asyncio
+import collections
+import hashlib
 import random
 import os
-import subprocess
+import time
 import glados
 import discord
 
+# The renderer processes are started through the shell, which limits their memory and CPU time before it replaces
+# itself with latex/dvipng. Setting the limits in preexec_fn isn't safe while other threads are running.
+LIMITS = 'ulimit -v {} && ulimit -t {} && exec "$@"'  # KiB of memory, seconds of CPU time
+
 
 LATEX_FRAMEWORK = r"""
 \documentclass[varwidth=true]{standalone}
@@ -93,11 +100,202 @@ __DATA__
 \end{circuitikz}
 """
 
+# Everything LaTeX leaves in the output folder besides the image
+TEMPORARY_EXTENSIONS = ('.tex', '.dvi', '.log', '.aux')
+
+
+class LaTeXRenderer(object):
+    """
+    Renders LaTeX sources to PNG files with latex and dvipng, running as asyncio subprocesses so the event loop isn't
+    blocked. At most "workers" sources are rendered at the same time, each process is killed if it takes longer than
+    "timeout" seconds and is limited to "memory limit" MiB.
+
+    Images are named after the hash of the complete source, so rendering the same formula again just returns the file
+    that's already there, and simultaneous requests for the same source share one render. The images are kept in an
+    LRU cache of at most "cache size" MiB, the least recently used ones are deleted when it gets too big. Images that
+    are being rendered or were returned less than HOLD_TIME seconds ago are never deleted, since the caller may still be
+    about to send them.
+    """
+
+    HOLD_TIME = 30  # seconds
+
+    def __init__(self, out_folder, workers=2, timeout=10, memory_limit=512, cache_size=64,
+                 latex_command='latex', dvipng_command='dvipng'):
+        self.out_folder = out_folder
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.cache_size = cache_size * 1024 * 1024
+        self.latex_command = latex_command
+        self.dvipng_command = dvipng_command
+        self.renders = 0  # number of times latex actually ran
+
+        self.__semaphore = asyncio.Semaphore(workers)
+        self.__pending = dict()  # hash -> future of a render in progress
+        self.__cache = collections.OrderedDict()  # hash -> size of the PNG, least recently used first
+        self.__cache_bytes = 0
+        self.__handed_out = dict()  # hash -> monotonic time the PNG was last returned
+
+        if not os.path.isdir(out_folder):
+            os.makedirs(out_folder)
+        self.__load_cache()
+
+    def __load_cache(self):
+        # Pick up the images of the last run, and get rid of anything a crash may have left behind
+        images = list()
+        for file_name in os.listdir(self.out_folder):
+            path = os.path.join(self.out_folder, file_name)
+            key, ext = os.path.splitext(file_name)
+            if ext == '.png':
+                images.append((os.path.getmtime(path), key, os.path.getsize(path)))
+            elif ext in TEMPORARY_EXTENSIONS:
+                os.remove(path)
+        for mtime, key, size in sorted(images):
+            self.__cache[key] = size
+            self.__cache_bytes += size
+        self.__evict()
+
+    def png_file(self, key):
+        return os.path.join(self.out_folder, key + '.png')
+
+    async def render(self, latex):
+        """
+        :param latex: The complete LaTeX source.
+        :return: Returns a tuple (True, file name of the PNG) or (False, error message).
+        """
+        key = hashlib.sha256(latex.encode('utf-8')).hexdigest()
+        if key in self.__cache and os.path.isfile(self.png_file(key)):
+            self.__cache.move_to_end(key)
+            os.utime(self.png_file(key))  # so the order survives restarts
+            self.__handed_out[key] = time.monotonic()
+            return True, self.png_file(key)
+
+        render = self.__pending.get(key, None)
+        if render is None:
+            render = asyncio.ensure_future(self.__render(key, latex))
+            self.__pending[key] = render
+            render.add_done_callback(lambda f: self.__pending.pop(key, None))
+        result = await asyncio.shield(render)
+        if result[0]:
+            self.__handed_out[key] = time.monotonic()
+        return result
+
+    async def __render(self, key, latex):
+        async with self.__semaphore:
+            self.renders += 1
+            latex_file = os.path.join(self.out_folder, key + '.tex')
+            dvi_file = os.path.join(self.out_folder, key + '.dvi')
+            png_file = self.png_file(key)
+            latex_cmd = [self.latex_command,
+                         '-no-shell-escape',
+                         '-interaction', 'nonstopmode',
+                         '-halt-on-error',
+                         '-file-line-error',
+                         '-output-directory=' + self.out_folder,
+                         latex_file]
+            dvipng_cmd = [self.dvipng_command, '-q*', '-D', '200', '-T', 'tight', '-bg', 'Transparent',
+                          '-o', png_file, dvi_file]
+
+            with open(latex_file, 'w') as tex:
+                tex.write(latex)
+
+            try:
+                glados.log('executing latex: {}'.format(latex_cmd))
+                code, output = await self.__run(latex_cmd)
+                if code is None:
+                    return False, 'Error: Rendering took longer than {} seconds'.format(self.timeout)
+                if not code == 0:
+                    return False, self.__error_message(output, latex)
+
+                code, output = await self.__run(dvipng_cmd)
+                if not code == 0 or not os.path.isfile(png_file):
+                    glados.log('dvipng failed: {}'.format(output))
+                    return False, 'Error: Failed to convert the output of LaTeX to an image'
+            finally:
+                for ext in TEMPORARY_EXTENSIONS:
+                    try:
+                        os.remove(os.path.join(self.out_folder, key + ext))
+                    except OSError:
+                        pass
+
+            size = os.path.getsize(png_file)
+            self.__cache_bytes -= self.__cache.pop(key, 0)
+            self.__cache[key] = size
+            self.__cache_bytes += size
+            self.__evict(keep=key)
+            return True, png_file
+
+    async def __run(self, cmd):
+        """
+        :return: Returns a tuple (exit code, output). The exit code is None if the process timed out.
+        """
+        if os.name == 'posix':  # no memory and CPU limits for the renderer processes on Windows
+            cmd = ['sh', '-c', LIMITS.format(self.memory_limit * 1024, int(self.timeout) + 1), 'sh'] + list(cmd)
+        process = await asyncio.create_subprocess_exec(
+            *cmd, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+        try:
+            output, _ = await asyncio.wait_for(process.communicate(), self.timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return None, ''
+        return process.returncode, output.decode('utf-8', 'replace')
+
+    def __evict(self, keep=None):
+        if self.__cache_bytes <= self.cache_size:
+            return
+        now = time.monotonic()
+        self.__handed_out = {key: t for key, t in self.__handed_out.items() if now - t < self.HOLD_TIME}
+        for key in list(self.__cache):
+            if self.__cache_bytes <= self.cache_size:
+                break
+            # The cache may stay too big for a while, rather than deleting an image someone is about to send
+            if key == keep or key in self.__pending or key in self.__handed_out:
+                continue
+            self.__cache_bytes -= self.__cache.pop(key)
+            try:
+                os.remove(self.png_file(key))
+            except OSError:
+                pass
+
+    @staticmethod
+    def __error_message(output, latex):
+        glados.log(output)
+        errors = [x.strip() for x in output.split('\n') if x.startswith('!') or '.tex:' in x]
+        lines = [int(x) - 2 for error in errors for x in error.split(':') if x.isdigit()]
+        latexlines = [x for n, x in enumerate(latex.split('\n')) if n in lines]
+        errormsg = "Error: {0}\n{1}".format('\n'.join(errors), '\n'.join(latexlines))
+        glados.log('Failed. Latex output: {0}\nGenerated error message: {1}'.format(output, errormsg))
+        return errormsg
+
+
+# The renderer is shared by all servers, so the limits and the image cache apply to the whole bot
+_renderer = None
+
+
+def get_renderer(config):
+    global _renderer
+    if _renderer is None:
+        _renderer = LaTeXRenderer('tex',
+                                  config['workers'],
+                                  config['timeout'],
+                                  config['memory limit'],
+                                  config['cache size'],
+                                  config['latex command'],
+                                  config['dvipng command'])
+    return _renderer
+
+
 class LaTeX(glados.Module):
 
     def __init__(self, bot, full_name):
         super(LaTeX, self).__init__(bot, full_name)
-        self.__out_folder = 'tex'
+        config = self.settings.setdefault('latex', {})
+        config.setdefault('workers', 2)
+        config.setdefault('timeout', 10)
+        config.setdefault('memory limit', 512)  # MiB per latex/dvipng process
+        config.setdefault('cache size', 64)  # MiB of rendered images
+        config.setdefault('latex command', 'latex')
+        config.setdefault('dvipng command', 'dvipng')
         self.__latex_blacklist = ("\\write18",
                                   "\\input",
                                   "\\include",
@@ -115,44 +313,8 @@ class LaTeX(glados.Module):
     def circuit(latex_code):
         return LATEX_FRAMEWORK.replace('__DATA__', CIRCUIT_ENV).replace('__DATA__', latex_code)
 
-    def generate_image(self, latex, gen_func):
-
-        num = str(random.randint(0, 2 ** 31))
-        latex_file = os.path.join(self.__out_folder, num + '.tex')
-        dvi_file   = os.path.join(self.__out_folder, num + '.dvi')
-        png_file   = os.path.join(self.__out_folder, num + '1.png')
-        latex_cmd  = ['latex',
-                      '-no-shell-escape',
-                      '-interaction', 'nonstopmode',
-                      '-halt-on-error',
-                      '-file-line-error',
-                      '-output-directory=' + self.__out_folder,
-                      latex_file]
-        dvipng_cmd = ['dvipng', '-q*', '-D', '200', '-T', 'tight', '-bg', 'Transparent', '-o', png_file, dvi_file]
-
-        with open(latex_file, 'w') as tex:
-            latex = gen_func(latex)
-            tex.write(latex)
-            tex.flush()
-            tex.close()
-
-        try:
-            glados.log('executing latex: {}'.format(latex_cmd))
-            subprocess.check_output(latex_cmd)
-        except subprocess.CalledProcessError as e:
-            latex_cmd_output = '\n'.join(str(e.output).split('\\n'))
-            glados.log(latex_cmd_output)
-            errors = [x.strip() for x in str(e.output).split('\\n') if x.startswith('!') or '.tex:' in x]
-            lines = [int(x) - 2 for error in errors for x in error.split(':') if x.isdigit()]
-            latexlines = [x for n, x in enumerate(latex.split('\n')) if n in lines]
-            errormsg = "Error: {0}\n{1}".format('\n'.join([x.strip() for x in str(e.output).split('\\n') if x.startswith('!') or '.tex:' in x]),
-                                         '\n'.join(latexlines))
-            glados.log('Failed. Latex output: {0}\nGenerated error message: {1}'.format(latex_cmd_output, errormsg))
-            return False, errormsg
-
-        subprocess.call(dvipng_cmd)
-
-        return True, png_file
+    async def generate_image(self, latex, gen_func):
+        return await get_renderer(self.settings['latex']).render(gen_func(latex))
 
     @glados.Module.command('math', '<latex code>', 'Render latex math code. The code you provide is placed between \\begin{align} and \\end{align}.')
     async def math_cmd(self, message, content):
@@ -177,7 +339,7 @@ class LaTeX(glados.Module):
         if message.author.id == '113128686969958400' and random.random() < 0.02:
             content = "\\color{pink} \\text{CulDeVu  loves dongers}"
 
-        fn = self.generate_image(content, self.math)
+        fn = await self.generate_image(content, self.math)
 
         if not fn[0]:
             await self.client.send_message(message.channel, fn[1])
@@ -216,7 +378,7 @@ class LaTeX(glados.Module):
         if message.author.id == '113128686969958400' and random.random() < 0.02:
             content = "\\color{pink} \\text{CulDeVu  loves dongers}"
 
-        fn = self.generate_image(content, self.circuit)
+        fn = await self.generate_image(content, self.circuit)
 
         if not fn[0]:
             await self.client.send_message(message.channel, fn[1])
@@ -1,30 +1,140 @@
 import glados
 import os
+import time
+import asyncio
 from datetime import datetime
 from lzma import LZMAFile
 
 
+class BufferedLogWriter(object):
+    """
+    Collects log lines in memory and appends them to an xz file in batches. Every batch is written as a complete xz
+    stream, so the file on disk is always readable. Until a batch is written, its lines are also kept in a small
+    uncompressed journal next to the .xz file, which is replayed if the bot crashed in the meantime.
+    """
+
+    def __init__(self, file_name, max_buffer_size=256*1024, flush_interval=60):
+        """
+        :param file_name: The .xz file to append to.
+        :param max_buffer_size: Number of bytes to buffer before writing a batch.
+        :param flush_interval: Maximum number of seconds a line stays buffered (checked by flush_if_due()).
+        """
+        self.file_name = file_name
+        self.journal_file_name = self.journal_file_name_for(file_name)
+        self.max_buffer_size = max_buffer_size
+        self.flush_interval = flush_interval
+
+        self.__buffer = list()
+        self.__buffer_size = 0
+        self.__last_flush = time.monotonic()
+
+        self.recover_journal(self.file_name)
+        self.__journal = open(self.journal_file_name, 'ab')
+
+    @staticmethod
+    def journal_file_name_for(file_name):
+        # The journal file starts with a dot so it doesn't get mistaken for a chanlog
+        directory, name = os.path.split(file_name)
+        return os.path.join(directory, '.{}.journal'.format(name))
+
+    @staticmethod
+    def recover_journal(file_name):
+        """
+        Compresses whatever was left in the journal of the specified .xz file into it, then removes the journal.
+        """
+        journal_file_name = BufferedLogWriter.journal_file_name_for(file_name)
+        if not os.path.isfile(journal_file_name):
+            return
+        with open(journal_file_name, 'rb') as f:
+            data = f.read()
+        if data:
+            glados.log('Recovering {} bytes of log data from {}'.format(len(data), journal_file_name))
+            with LZMAFile(file_name, 'a') as f:
+                f.write(data)
+        os.remove(journal_file_name)
+
+    def write(self, data):
+        """
+        :param data: Encoded bytes to append to the log.
+        """
+        self.__journal.write(data)
+        self.__journal.flush()
+        self.__buffer.append(data)
+        self.__buffer_size += len(data)
+        if self.__buffer_size >= self.max_buffer_size:
+            self.flush()
+
+    def flush_if_due(self):
+        if time.monotonic() - self.__last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self.__last_flush = time.monotonic()
+        if len(self.__buffer) == 0:
+            return
+        with LZMAFile(self.file_name, 'a') as f:
+            f.write(b''.join(self.__buffer))
+        self.__buffer = list()
+        self.__buffer_size = 0
+        # Everything in the journal is now safely compressed
+        self.__journal.seek(0)
+        self.__journal.truncate()
+
+    def close(self):
+        self.flush()
+        self.__journal.close()
+        os.remove(self.journal_file_name)
+
+
 class Log(glados.Module):
     def __init__(self, server_instance, full_name):
         super(Log, self).__init__(server_instance, full_name)
 
+        config = self.settings.setdefault('log', {})
+        self.max_buffer_size = config.setdefault('buffer size', 256*1024)
+        self.flush_interval = config.setdefault('flush interval', 60)
+
         self.log_path = os.path.join(self.local_data_dir, 'log')
         if not os.path.exists(self.log_path):
             os.makedirs(self.log_path)
 
+        # Recover data left over from previous days if the bot crashed
+        for f in os.listdir(self.log_path):
+            if f.startswith('.') and f.endswith('.journal'):
+                BufferedLogWriter.recover_journal(os.path.join(self.log_path, f[1:-len('.journal')]))
+
         self.date = datetime.now().strftime('%Y-%m-%d')
-        self.log_file = LZMAFile(os.path.join(self.log_path, 'chanlog-{}.txt.xz'.format(self.date)), 'a')
+        self.log_file = self.__open_log()
+
+        asyncio.ensure_future(self.flush_task())
+
+    def __open_log(self):
+        return BufferedLogWriter(os.path.join(self.log_path, 'chanlog-{}.txt.xz'.format(self.date)),
+                                 self.max_buffer_size, self.flush_interval)
 
     def __open_new_log_if_necessary(self):
         date = datetime.now().strftime('%Y-%m-%d')
         if not self.date == date:
             self.log_file.close()
             self.date = date
-            self.log_file = LZMAFile(os.path.join(self.log_path, 'chanlog-{}.txt.xz'.format(self.date)), 'a')
+            self.log_file = self.__open_log()
+
+    async def flush_task(self):
+        while self.log_file is not None:
+            await asyncio.sleep(self.flush_interval)
+            if self.log_file is not None:
+                self.log_file.flush_if_due()
+
+    def shutdown(self):
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
 
     @glados.Permissions.spamalot
     @glados.Module.rule('^.*$', ignorecommands=False)
     async def on_message(self, message, match):
+        if self.log_file is None:
+            return ()
         server_name = message.server.name if message.server else ''
         server_id = message.server.id if message.server else ''
         self.__open_new_log_if_necessary()
@@ -38,5 +148,4 @@ class Log(glados.Module):
             message.clean_content)
 
         self.log_file.write(info.encode('utf-8'))
-        self.log_file.flush()
         return ()
@@ -1,4 +1,3 @@
-import requests
 import re
 import time
 from glados import Module
@@ -48,11 +47,11 @@ class Man(Module):
         # Do query
         params = {"query": args, "sektion": section}
         response_time = time.time()
-        response = requests.get(URI, params=params, timeout=10)
+        response = await self.http.get(URI, params=params, timeout=10)
         response_time = time.time() - response_time
-        if not response.status_code == 200:
-            return await self.client.send_message(message.channel, "{} returned status {}".format(URI, response.status_code))
-        soup = BeautifulSoup(response.text, "lxml")
+        if not response.status == 200:
+            return await self.client.send_message(message.channel, "{} returned status {}".format(URI, response.status))
+        soup = BeautifulSoup(response.text(), "lxml")
         if soup.body.findAll(text=re.compile("Sorry, no data found for")):
             return await self.client.send_message(message.channel, "Sorry, no data found for `{}`. Make sure syntax is correct, for example: .man printf(3)\nMaybe try searching on the website? https://www.freebsd.org/cgi/man.cgi".format(args))
 
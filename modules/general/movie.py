@@ -6,7 +6,6 @@ Licensed under the Eiffel Forum License 2.
 This module relies on omdbapi.com
 """
 import glados
-import requests
 
 
 class Movie(glados.Module):
@@ -19,9 +18,9 @@ class Movie(glados.Module):
 
         movie = movie.rstrip()
         uri = "http://www.theapache64.com/movie_db/search"
-        data = requests.get(uri, params={'keyword': movie}, timeout=10)
-        if not data.ok:
-            return await self.client.send_message(message.channel, "Error: {} returned {}".format(uri, data.status_code))
+        data = await self.http.get(uri, params={'keyword': movie}, timeout=10)
+        if not data.status == 200:
+            return await self.client.send_message(message.channel, "Error: {} returned {}".format(uri, data.status))
         data = data.json()
         if data['error']:
             response = data['message']
@@ -1,7 +1,6 @@
 import random
 import asyncio
 import pickle
-import json
 from urllib.parse import urlparse, parse_qs, urlencode
 from glados import Module, Permissions
 from os import path, makedirs
@@ -20,12 +19,6 @@ def ensure_path_exists(dir):
     return dir
 
 
-def load_json_if_exists(filename, default):
-    if path.isfile(filename):
-        return json.loads(open(filename, "rb").read().decode("utf-8"))
-    return default
-
-
 class MusicPlayer(Module):
     def __init__(self, server_instance, full_name):
         super(MusicPlayer, self).__init__(server_instance, full_name)
@@ -37,7 +30,7 @@ class MusicPlayer(Module):
 
         self.config_dir = ensure_path_exists(path.join(self.local_data_dir, 'musicplayer'))
         self.cache_dir = ensure_path_exists(path.join(self.config_dir, "cache"))
-        self.config = load_json_if_exists(path.join(self.config_dir, "config.json"), DEFAULT_CONFIG)
+        self.config = self.store(path.join('musicplayer', 'config.json'), DEFAULT_CONFIG)
 
         self.actions = {
             "pause": (self.action_pause, "pause track"),
@@ -53,9 +46,6 @@ class MusicPlayer(Module):
 
         asyncio.ensure_future(self.player_task())
 
-    def save_config(self):
-        open(path.join(self.config_dir, "config.json"), "wb").write(json.dumps(self.config).encode("utf-8"))
-
     async def action_skip(self, message):
         if self.player:
             self.player.stop()
@@ -65,7 +55,6 @@ class MusicPlayer(Module):
         if len(self.config["queue"]) > 1:
             self.config["queue"].insert(1, self.config["queue"][-1])
             self.config["queue"].pop(-1)
-            self.save_config()
             if self.player:
                 self.player.stop()
             await self.client.send_message(message.channel, "cockblocked")
@@ -86,7 +75,6 @@ class MusicPlayer(Module):
             self.ffmpeg_ss = float(message.content.split(" ")[1])*60
             await self.client.send_message(message.channel, "jumping to minute {}".format(self.ffmpeg_ss/60))
             self.config["queue"].insert(0, self.config["queue"][0])
-            self.save_config()
             self.player.stop()
         return ()
 
@@ -95,7 +83,6 @@ class MusicPlayer(Module):
             first, *self.config["queue"] = self.config["queue"]
             random.shuffle(self.config["queue"])
             self.config["queue"].insert(0, first)
-            self.save_config()
             await self.client.send_message(message.channel, "Playlist was shuffled.")
         return ()
 
@@ -120,7 +107,6 @@ class MusicPlayer(Module):
                 await disconnect_vc()
                 self.config["voice channel"] = None
                 self.config["text channel"] = None
-                self.save_config()
                 return await self.client.send_message(message.channel, "Removed bot from music channel")
             voice_channel_id = message.content.split(" ")[2]
         except:
@@ -128,7 +114,6 @@ class MusicPlayer(Module):
 
         self.config["voice channel"] = str(voice_channel_id)
         self.config["text channel"] = str(message.channel.id)
-        self.save_config()
 
         if self.player:
             self.player.stop()
@@ -197,7 +182,6 @@ class MusicPlayer(Module):
                 continue
 
             self.config["queue"].append(url)
-            self.save_config()
             await self.client.send_message(message.channel, "Added to queue (position {})".format(len(self.config["queue"])-1))
 
     async def player_task(self):
@@ -218,7 +202,6 @@ class MusicPlayer(Module):
                     continue
                 if len(self.config["queue"]) > 0:
                     self.config["queue"].pop(0)
-                    self.save_config()
                 if len(self.config["queue"]) == 0:
                     await self.client.send_message(self.client.get_channel(self.config["text channel"]), "No more songs in queue!")
                     self.player = None
@@ -3,8 +3,240 @@ import random
 import re
 import collections
 import enchant
+from array import array
 from lzma import LZMAFile
-from glados import Module, Permissions
+from glados import Module, Permissions, log
+
+
+OFFSET_SIZE = array('Q').itemsize
+
+
+def escape_quote(quote):
+    return quote.replace("\n", "\\n")
+
+
+def unescape_quote(quote):
+    return quote.replace("\\n", "\n")
+
+
+# The dictionaries are the same for every server, so they are only loaded once
+_dictionaries = None
+
+
+def get_dictionaries():
+    global _dictionaries
+    if _dictionaries is None:
+        _dictionaries = (enchant.Dict('en_US'), enchant.Dict('en_GB'))
+    return _dictionaries
+
+
+class QuoteIndex(object):
+    """
+    Word index and statistics of all quotes of one author. Built once from the author's quotes file and then kept up
+    to date as new quotes are recorded.
+    """
+
+    def __init__(self):
+        self.quotes = 0
+        self.total_length = 0
+        self.words = collections.Counter()  # words as counted by .quotestats
+        self.total_word_length = 0
+        self.grep_words = collections.Counter()  # lowercase words with non-word characters removed, for .grep
+        self.grep_total = 0
+        self.postings = collections.defaultdict(list)  # lowercase word -> numbers of the quotes containing it
+
+    def add(self, quote):
+        number = self.quotes
+        self.quotes += 1
+        self.total_length += len(quote)
+
+        for word in quote.split(' '):
+            word = word.strip().strip('?.",;:()[]{}')
+            if word != '':
+                self.words[word] += 1
+                self.total_word_length += len(word)
+
+        quote = quote.lower()
+        for word in quote.split():
+            self.grep_words[re.sub(r'\W+', '', word)] += 1
+            self.grep_total += 1
+        for word in set(re.findall(r'\w+', quote)):
+            self.postings[word].append(number)
+
+    def quotes_containing(self, words):
+        """
+        :param words: Lowercase words as matched by \\w+.
+        :return: Returns the sorted numbers of all quotes containing all of the words.
+        """
+        postings = sorted((self.postings.get(word, []) for word in set(words)), key=len)
+        if len(postings) == 0:
+            return list(range(self.quotes))
+        numbers = set(postings[0])
+        for p in postings[1:]:
+            numbers.intersection_update(p)
+        return sorted(numbers)
+
+
+class QuoteStore(object):
+    """
+    Stores the quotes of every author in a plain text file, one (escaped) quote per line, next to a file holding the
+    byte offset of every line. Any quote can be read without touching the rest of the file. Word indices are built
+    on demand and the most recently used ones are kept in memory.
+    """
+
+    def __init__(self, quotes_dir, max_cached_indices=32):
+        self.quotes_dir = quotes_dir
+        self.max_cached_indices = max_cached_indices
+        self.__indices = collections.OrderedDict()  # author id -> QuoteIndex
+        self.__checked = set()  # authors whose files were checked for consistency
+
+    def text_file_name(self, author_id):
+        return os.path.join(self.quotes_dir, author_id + '.txt')
+
+    def offsets_file_name(self, author_id):
+        return os.path.join(self.quotes_dir, author_id + '.idx')
+
+    def append(self, author_id, quote):
+        self.__check(author_id)
+        text_file_name = self.text_file_name(author_id)
+        offset = os.path.getsize(text_file_name) if os.path.isfile(text_file_name) else 0
+        with open(text_file_name, 'ab') as f:
+            f.write((escape_quote(quote) + '\n').encode('utf-8'))
+        with open(self.offsets_file_name(author_id), 'ab') as f:
+            array('Q', [offset]).tofile(f)
+
+        index = self.__indices.get(author_id, None)
+        if index is not None:
+            index.add(quote)
+
+    def count(self, author_id):
+        self.__check(author_id)
+        offsets_file_name = self.offsets_file_name(author_id)
+        if not os.path.isfile(offsets_file_name):
+            return 0
+        return os.path.getsize(offsets_file_name) // OFFSET_SIZE
+
+    def get(self, author_id, number):
+        """
+        :return: Returns the quote with the specified number, starting at 0.
+        """
+        return self.get_many(author_id, [number])[0]
+
+    def get_many(self, author_id, numbers):
+        """
+        :param numbers: The numbers of the quotes to read, starting at 0.
+        :return: Returns a list of the quotes.
+        """
+        self.__check(author_id)
+        quotes = list()
+        if len(numbers) == 0:
+            return quotes
+        with open(self.offsets_file_name(author_id), 'rb') as offsets, open(self.text_file_name(author_id), 'rb') as f:
+            for number in numbers:
+                offsets.seek(number * OFFSET_SIZE)
+                f.seek(array('Q', offsets.read(OFFSET_SIZE))[0])
+                quotes.append(unescape_quote(f.readline().decode('utf-8').rstrip('\n')))
+        return quotes
+
+    def get_random(self, author_id):
+        """
+        :return: Returns a random quote, or None if the author has no quotes.
+        """
+        count = self.count(author_id)
+        if count == 0:
+            return None
+        return self.get(author_id, random.randrange(count))
+
+    def get_index(self, author_id):
+        """
+        :return: Returns the QuoteIndex of the author, building it if necessary.
+        """
+        index = self.__indices.get(author_id, None)
+        if index is not None:
+            self.__indices.move_to_end(author_id)
+            return index
+
+        self.__check(author_id)
+        index = QuoteIndex()
+        text_file_name = self.text_file_name(author_id)
+        if os.path.isfile(text_file_name):
+            with open(text_file_name, 'rb') as f:
+                for line in f:
+                    index.add(unescape_quote(line.decode('utf-8').rstrip('\n')))
+
+        self.__indices[author_id] = index
+        while len(self.__indices) > self.max_cached_indices:
+            self.__indices.popitem(last=False)
+        return index
+
+    def __check(self, author_id):
+        """
+        Migrates the author's quotes from the old .txt.xz file, and makes sure the offsets match the text file in case
+        the bot crashed while recording a quote. This is only done the first time the author's quotes are accessed.
+        """
+        if author_id in self.__checked:
+            return
+        self.__checked.add(author_id)
+
+        text_file_name = self.text_file_name(author_id)
+        offsets_file_name = self.offsets_file_name(author_id)
+        xz_file_name = text_file_name + '.xz'
+        if not os.path.isfile(text_file_name):
+            if os.path.isfile(xz_file_name):
+                self.migrate(xz_file_name, text_file_name, offsets_file_name)
+            return
+
+        # The last offset has to point to the beginning of the last line
+        count = os.path.getsize(offsets_file_name) // OFFSET_SIZE if os.path.isfile(offsets_file_name) else 0
+        size = os.path.getsize(text_file_name)
+        if count > 0:
+            with open(offsets_file_name, 'rb') as f:
+                f.seek((count - 1) * OFFSET_SIZE)
+                offset = array('Q', f.read(OFFSET_SIZE))[0]
+            with open(text_file_name, 'rb') as f:
+                f.seek(offset)
+                line = f.readline()
+                if line.endswith(b'\n') and f.tell() == size and offset + len(line) == size:
+                    return
+        elif size == 0:
+            return
+
+        log('Quotes file {} is inconsistent with its offsets, rebuilding them'.format(text_file_name))
+        self.rebuild_offsets(text_file_name, offsets_file_name)
+
+    @staticmethod
+    def rebuild_offsets(text_file_name, offsets_file_name):
+        with open(text_file_name, 'rb') as f:
+            data = f.read()
+        if data and not data.endswith(b'\n'):
+            # Complete a line that was only partially written
+            data += b'\n'
+            with open(text_file_name, 'ab') as f:
+                f.write(b'\n')
+        offsets = array('Q')
+        offset = 0
+        for line in data.splitlines(keepends=True):
+            offsets.append(offset)
+            offset += len(line)
+        with open(offsets_file_name, 'wb') as f:
+            offsets.tofile(f)
+
+    @staticmethod
+    def migrate(xz_file_name, text_file_name, offsets_file_name):
+        """
+        Converts a quotes file of the old format (all quotes in one .txt.xz file) into a text file and offsets.
+        """
+        log('Migrating quotes file {}'.format(xz_file_name))
+        with LZMAFile(xz_file_name, 'r') as f:
+            data = f.read()
+        # Every quote was terminated by a newline
+        if data and not data.endswith(b'\n'):
+            data += b'\n'
+        with open(text_file_name + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(text_file_name + '.tmp', text_file_name)
+        QuoteStore.rebuild_offsets(text_file_name, offsets_file_name)
+        os.remove(xz_file_name)
 
 
 class Quotes(Module):
@@ -14,17 +246,16 @@ class Quotes(Module):
         self.quotes_dir = os.path.join(self.local_data_dir, "quotes2")
         if not os.path.exists(self.quotes_dir):
             os.mkdir(self.quotes_dir)
+        self.store = QuoteStore(self.quotes_dir)
 
-        self.dictionaries = [
-            enchant.Dict('en_US'),
-            enchant.Dict('en_GB')
-        ]
+        self.dictionaries = get_dictionaries()
+        self.__vocab_cache = dict()  # author id -> (number of quotes, vocab)
 
     # Intentionally don't match messages that contain newlines.
     @Permissions.spamalot
     @Module.rule('^(.*)$')
     async def record(self, message, match):
-        self.__append_message(message.author, message.clean_content)
+        self.store.append(message.author.id, message.clean_content)
         return ()
 
     @Module.command('quote', '[user]', 'Dig up a quote the user (or yourself) once said in the past.')
@@ -70,19 +301,19 @@ class Quotes(Module):
             else:
                 author = members[0]
 
-        lines = self.__load_all_messages(author)
+        index = self.store.get_index(author.id)
+        if index.quotes == 0 or len(index.words) == 0:
+            return await self.client.send_message(message.channel, "{} hasn't delivered any quotes worth mentioning yet".format(author.name))
 
-        number_of_quotes = len(lines)
-        average_quote_length = float(sum([len(quote) for quote in lines])) / float(number_of_quotes)
+        number_of_quotes = index.quotes
+        average_quote_length = float(index.total_length) / float(number_of_quotes)
 
-        words = [x.strip().strip('?.",;:()[]{}') for x in ' '.join(lines).split(' ')]
-        words = [x for x in words if not x == '']
-        number_of_words = len(words)
-        average_word_length = float(sum([len(quote) for quote in words])) / float(number_of_words)
+        number_of_words = sum(index.words.values())
+        average_word_length = float(index.total_word_length) / float(number_of_words)
 
-        frequencies = collections.Counter(words)
+        frequencies = index.words
         common = "the be to of and a in that have I it for not on with he as you do at this but his by from they we say her she or an will my one all would there their what so up out if about who get which go me when make can like time no just him know take people into year your good some could them see other than then now look only come its over think also back after use two how our work first well way even new want because any these give day most us".split()
-        vocab = len(self.filter_to_english_words(set(words)))
+        vocab = self.__get_vocab(author, index)
         most_common = ', '.join(['"{}" ({})'.format(w.replace('```', ''), i) for w, i in frequencies.most_common() if w not in common][:5])
         least_common = ', '.join(['"{}"'.format(w.replace('```', '')) for w, i in frequencies.most_common() if w.find('http') == -1][-5:])
 
@@ -107,22 +338,16 @@ class Quotes(Module):
         else:
             author = message.author
 
-
-        lines = self.__load_all_messages(author)
-        all_words = ' '.join(lines).lower()
+        index = self.store.get_index(author.id)
+        total_count = index.grep_total
 
         # have to use finditer if it's a phrase
         phrase = ' '.join(content).strip().lower()
         if len(content) > 1:
-            found_count = len([m.start() for m in re.finditer(phrase, all_words)])
-            total_count = len(all_words.split())
+            candidates = self.__find_candidates(index, phrase, whole_words=False)
+            found_count = sum(len(re.findall(phrase, line.lower())) for line in self.store.get_many(author.id, candidates))
         else:
-            found_count = 0
-            total_count = 0
-            for w in all_words.split():
-                total_count += 1
-                if re.sub(r'\W+', '', w.strip()) == re.sub(r'\W+', '', phrase):
-                    found_count += 1
+            found_count = index.grep_words.get(re.sub(r'\W+', '', phrase), 0)
 
         if found_count == 0:
             response = '{} has never said "{}"'.format(author.name, phrase)
@@ -139,8 +364,34 @@ class Quotes(Module):
                     if any(d.check(word) for d in self.dictionaries)
                     and (len(word) > 1 or len(word) == 1 and word in 'aAI')]
 
-    def __quotes_file_name(self, author):
-        return os.path.join(self.quotes_dir, author.id + '.txt.xz')
+    def __get_vocab(self, author, index):
+        # Checking every word against the dictionaries is slow, so only do it again if there are new quotes
+        cached = self.__vocab_cache.get(author.id, None)
+        if cached is not None and cached[0] == index.quotes:
+            return cached[1]
+        vocab = len(self.filter_to_english_words(index.words.keys()))
+        self.__vocab_cache[author.id] = (index.quotes, vocab)
+        return vocab
+
+    @staticmethod
+    def __find_candidates(index, query, whole_words):
+        """
+        Uses the word index to narrow down which quotes can match a search query.
+        :param query: The query, which is used as a regular expression.
+        :param whole_words: True if the query only matches at word boundaries. If False, the first and last word of
+        the query may be part of longer words, so only the words in between can be looked up.
+        :return: Returns the numbers of all quotes that may match.
+        """
+        # Regular expressions with special characters can match anything
+        if re.search(r'[.^$*+?{}\[\]\\|()]', query):
+            return range(index.quotes)
+        words = re.findall(r'\w+', query.lower())
+        if not whole_words:
+            if not re.match(r'\W', query):
+                words = words[1:]
+            if not re.search(r'\W$', query):
+                words = words[:-1]
+        return index.quotes_containing(words)
 
     def __remove_mentions(self, message):
         """
@@ -148,43 +399,23 @@ class Quotes(Module):
         """
         mentioned_ids = [x.strip('<@!>') for x in re.findall('<@!?[0-9]+>', message)]
         for mentioned_id in mentioned_ids:
-            for member in self.server.members:
-                if member.id == mentioned_id:
-                    message = message.replace('<@{}>'.format(id), member.name).replace('<@!{}>'.format(id), member.name)
-                    break
+            member = self.member_index.get(mentioned_id)
+            if member is not None:
+                message = message.replace('<@{}>'.format(mentioned_id), member.name).replace('<@!{}>'.format(mentioned_id), member.name)
         return message.strip('<@!>')
 
-    @staticmethod
-    def __escape_message(message):
-        return message.replace("\n", "\\n")
-
-    @staticmethod
-    def __unescape_message(message):
-        return message.replace("\\n", "\n")
-
-    def __append_message(self, author, message):
-        with LZMAFile(self.__quotes_file_name(author), 'a') as f:
-            message = self.__escape_message(message) + '\n'
-            f.write(message.encode('utf-8'))
-
-    def __load_all_messages(self, author):
-        """
-        Note: If the quotes file doesn't exist (can happen) this will throw.
-        """
-        with LZMAFile(self.__quotes_file_name(author), 'r') as f:
-            lines = f.read().decode('utf-8').split('\n')
-            return [self.__remove_mentions(self.__unescape_message(line)) for line in lines]
-
     def __get_random_message(self, author):
-        try:
-            return random.choice(self.__load_all_messages(author))
-        except:
+        quote = self.store.get_random(author.id)
+        if quote is None:
             return None
+        return self.__remove_mentions(quote)
 
     def __get_random_message_matching(self, author, search_query):
         try:
-            lines = self.__load_all_messages(author)
-            lines = [x for x in lines if re.search(r'\b' + search_query + r'\b', x, re.IGNORECASE)]
+            index = self.store.get_index(author.id)
+            candidates = self.__find_candidates(index, search_query, whole_words=True)
+            lines = self.store.get_many(author.id, candidates)
+            lines = [self.__remove_mentions(x) for x in lines if re.search(r'\b' + search_query + r'\b', x, re.IGNORECASE)]
             return random.choice(lines).replace(search_query, '**{}**'.format(search_query))
         except:
             return None
@@ -1,8 +1,253 @@
+import asyncio
 import glados
 import os
 import hashlib
 import re
-import json
+import time
+import numpy as np
+
+
+class BloomFilter(object):
+    """
+    Answers "definitely not seen" for most digests that were never added, without touching the hash store on disk.
+    """
+
+    def __init__(self, capacity, bits_per_item=10, hash_count=7):
+        self.capacity = capacity
+        self.size = max(capacity * bits_per_item, 64)
+        self.hash_count = hash_count
+        # A bytearray is much faster to index from Python than a numpy array
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def add(self, digest):
+        bits = self.bits
+        h1, h2, size = digest & 0xffffffff, (digest >> 32) | 1, self.size
+        for i in range(self.hash_count):
+            position = (h1 + i * h2) % size
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def add_many(self, digests):
+        """
+        :param digests: A numpy array of digests.
+        """
+        # Digests are uniformly distributed already, so all hash functions are derived from the two halves of the
+        # digest. This has to match add() and __contains__().
+        bits = np.frombuffer(self.bits, dtype=np.uint8)
+        h1 = digests & np.uint64(0xffffffff)
+        h2 = (digests >> np.uint64(32)) | np.uint64(1)
+        for i in range(self.hash_count):
+            positions = (h1 + np.uint64(i) * h2) % np.uint64(self.size)
+            np.bitwise_or.at(bits, positions >> np.uint64(3),
+                             (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)))
+
+    def __contains__(self, digest):
+        bits = self.bits
+        h1, h2, size = digest & 0xffffffff, (digest >> 32) | 1, self.size
+        for i in range(self.hash_count):
+            position = (h1 + i * h2) % size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class HashStore(object):
+    """
+    Set of 64-bit message digests. Most digests live in a sorted file that is memory-mapped and binary searched.
+    New digests are appended to a log file and kept in memory until there are enough of them to merge them into the
+    sorted file. Merging happens in an executor when the event loop is running, lookups keep using the old file until
+    the new one is complete. An optional Bloom filter answers most lookups of digests that were never seen without a
+    search.
+    """
+
+    def __init__(self, path, merge_threshold=65536, bloom_filter=False):
+        """
+        :param path: Directory to store the files in.
+        :param merge_threshold: Number of new digests to collect before merging them into the sorted file.
+        :param bloom_filter: Whether to keep a Bloom filter in memory (about 2.5 bytes per digest). Lookups in the
+        sorted file are faster as long as the OS keeps it cached, so this only pays off for very large stores.
+        """
+        self.sorted_file_name = os.path.join(path, 'hashes.bin')
+        self.log_file_name = os.path.join(path, 'hashes.log')
+        self.merging_log_file_name = os.path.join(path, 'hashes.merging.log')  # digests of a merge in progress
+        self.merge_threshold = merge_threshold
+        self.use_bloom_filter = bloom_filter
+
+        self.__sorted = self.__map_sorted_file()
+        self.__recent = set()
+        self.__merging = None  # set of the digests being merged in the background
+        self.__bloom_filter = None
+        self.__log_file = None
+        log_file_names = [x for x in (self.merging_log_file_name, self.log_file_name) if os.path.isfile(x)]
+        if len(log_file_names) > 0:
+            # Digests that are in the sorted file already were merged right before the bot crashed
+            digests = np.concatenate([np.fromfile(x, dtype=np.uint64) for x in log_file_names])
+            self.__recent = set(int(d) for d in digests[~self.__sorted_contains(digests)])
+        if self.merging_log_file_name in log_file_names:
+            self.__write_log(self.__recent)
+            os.remove(self.merging_log_file_name)
+        self.__log_file = open(self.log_file_name, 'ab')
+
+        legacy_file_name = os.path.join(path, 'hashes.txt')
+        if os.path.isfile(legacy_file_name):
+            self.__migrate(legacy_file_name)
+
+        self.__rebuild_bloom_filter()
+        if len(self.__recent) >= self.merge_threshold:
+            self.merge()
+
+    @staticmethod
+    def digest(phrase):
+        """
+        :return: Returns the first 64 bits of the SHA-256 digest of the phrase as an int.
+        """
+        return int.from_bytes(hashlib.sha256(phrase.encode('utf-8')).digest()[:8], 'big')
+
+    def __len__(self):
+        return len(self.__sorted) + len(self.__recent) + (len(self.__merging) if self.__merging is not None else 0)
+
+    def __contains__(self, digest):
+        if digest in self.__recent or self.__merging is not None and digest in self.__merging:
+            return True
+        if self.__bloom_filter is not None and digest not in self.__bloom_filter:
+            return False
+        digest = np.uint64(digest)
+        i = self.__sorted.searchsorted(digest)
+        return i < len(self.__sorted) and self.__sorted[i] == digest
+
+    @property
+    def is_merging(self):
+        return self.__merging is not None
+
+    def add(self, digest):
+        """
+        :param digest: A digest that is not in the store yet.
+        """
+        self.__recent.add(digest)
+        self.__log_file.write(digest.to_bytes(8, 'little'))
+        if self.__bloom_filter is not None:
+            self.__bloom_filter.add(digest)
+        if len(self.__recent) >= self.merge_threshold and self.__merging is None:
+            self.__merge_in_background()
+
+    def flush(self):
+        self.__log_file.flush()
+
+    def close(self):
+        self.__log_file.close()
+
+    def merge(self):
+        """
+        Merges the new digests into the sorted file and waits until it's done. add() starts a merge in the background
+        instead if the event loop is running.
+        """
+        if self.__merging is not None:
+            raise RuntimeError('A merge is in progress already')
+        self.__write_merged(self.__sorted, self.__begin_merge())
+        self.__end_merge()
+
+    def __merge_in_background(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.merge()
+            return
+        batch = self.__begin_merge()
+        future = loop.run_in_executor(None, self.__write_merged, self.__sorted, batch)
+        future.add_done_callback(self.__merge_done)
+
+    def __begin_merge(self):
+        """
+        Moves the new digests (and their log file) aside, so digests added during the merge go to a new log.
+        :return: Returns the digests to merge as a sorted numpy array.
+        """
+        self.__merging = self.__recent
+        self.__recent = set()
+        self.__log_file.close()
+        os.replace(self.log_file_name, self.merging_log_file_name)
+        self.__log_file = open(self.log_file_name, 'ab')
+        batch = np.fromiter(self.__merging, dtype=np.uint64, count=len(self.__merging))
+        batch.sort()
+        return batch
+
+    def __write_merged(self, sorted_digests, batch):
+        """
+        Writes the sorted file with the batch inserted to a temporary file. Only reads the arrays it's given, so it can
+        run in an executor while lookups continue.
+        """
+        # Both are sorted, so this is one pass over the sorted file instead of sorting everything again
+        merged = np.insert(sorted_digests, np.searchsorted(sorted_digests, batch), batch)
+        with open(self.sorted_file_name + '.tmp', 'wb') as f:
+            merged.tofile(f)
+
+    def __merge_done(self, future):
+        if future.cancelled() or future.exception() is not None:
+            glados.log('Failed to merge {}: {}'.format(self.sorted_file_name, None if future.cancelled() else
+                                                       future.exception()))
+            # The digests are merged with the next batch
+            self.__recent.update(self.__merging)
+            self.__write_log(self.__recent)
+            os.remove(self.merging_log_file_name)
+            self.__merging = None
+            return
+        self.__end_merge()
+        # Enough digests may have been added in the meantime
+        if len(self.__recent) >= self.merge_threshold:
+            self.__merge_in_background()
+
+    def __end_merge(self):
+        self.__sorted = None
+        os.replace(self.sorted_file_name + '.tmp', self.sorted_file_name)
+        self.__sorted = self.__map_sorted_file()
+        self.__merging = None
+        os.remove(self.merging_log_file_name)
+        if self.__bloom_filter is not None and len(self) > self.__bloom_filter.capacity:
+            self.__rebuild_bloom_filter()
+
+    def __write_log(self, digests):
+        """
+        Replaces the log file with one containing the digests.
+        """
+        is_open = self.__log_file is not None
+        if is_open:
+            self.__log_file.close()
+        with open(self.log_file_name + '.tmp', 'wb') as f:
+            np.fromiter(digests, dtype=np.uint64, count=len(digests)).tofile(f)
+        os.replace(self.log_file_name + '.tmp', self.log_file_name)
+        if is_open:
+            self.__log_file = open(self.log_file_name, 'ab')
+
+    def __map_sorted_file(self):
+        if not os.path.isfile(self.sorted_file_name) or os.path.getsize(self.sorted_file_name) == 0:
+            return np.zeros(0, dtype=np.uint64)
+        return np.memmap(self.sorted_file_name, dtype=np.uint64, mode='r')
+
+    def __sorted_contains(self, digests):
+        if len(self.__sorted) == 0:
+            return np.zeros(len(digests), dtype=bool)
+        positions = np.searchsorted(self.__sorted, digests)
+        return self.__sorted[np.minimum(positions, len(self.__sorted) - 1)] == digests
+
+    def __rebuild_bloom_filter(self):
+        if not self.use_bloom_filter:
+            return
+        # Leave room to grow, so the filter doesn't have to be rebuilt after every merge
+        self.__bloom_filter = BloomFilter(max(2 * len(self), 1000000))
+        self.__bloom_filter.add_many(np.asarray(self.__sorted))
+        self.__bloom_filter.add_many(np.fromiter(self.__recent, dtype=np.uint64, count=len(self.__recent)))
+        if self.__merging is not None:
+            self.__bloom_filter.add_many(np.fromiter(self.__merging, dtype=np.uint64, count=len(self.__merging)))
+
+    def __migrate(self, legacy_file_name):
+        """
+        Converts the hex digests of older versions into the sorted file.
+        """
+        glados.log('Migrating {}'.format(legacy_file_name))
+        with open(legacy_file_name) as f:
+            digests = np.unique(np.array([int(line[:16], 16) for line in f if len(line.strip()) == 64],
+                                         dtype=np.uint64))
+        self.__recent.update(int(d) for d in digests[~self.__sorted_contains(digests)])
+        self.merge()
+        os.remove(legacy_file_name)
 
 
 class R9K(glados.Module):
@@ -10,9 +255,11 @@ class R9K(glados.Module):
         super(R9K, self).__init__(server_instance, full_name)
 
         # Copy active channels from settings file into memory
+        config = self.settings.setdefault('r9k', {})
         self.channels = set()
-        for channel_id in self.settings.setdefault('r9k', {}).setdefault('channels', []):
+        for channel_id in config.setdefault('channels', []):
             self.channels.add(channel_id)
+        self.save_interval = config.setdefault('save interval', 60)
 
         # directory where r9k stuff is stored
         self.path = os.path.join(self.local_data_dir, 'r9k')
@@ -20,18 +267,15 @@ class R9K(glados.Module):
             os.makedirs(self.path)
 
         # load score board, if it exists
-        self.score_file = os.path.join(self.path, 'scores.json')
-        if os.path.isfile(self.score_file):
-            self.scores = json.loads(open(self.score_file).read())
-        else:
-            self.scores = dict()
+        self.scores = self.store(os.path.join('r9k', 'scores.json'))
+        self.__last_save = time.monotonic()
 
         # set up hash tables
-        db_file = os.path.join(self.path, 'hashes.txt')
-        self.hashes_file = open(db_file, 'a')
-        self.hashes = set()
-        for line in open(db_file):
-            self.hashes.add(line.strip())
+        self.hashes = HashStore(self.path, bloom_filter=config.setdefault('bloom filter', False))
+
+    def shutdown(self):
+        self.__save()
+        self.hashes.close()
 
     @glados.Module.command('r9k', '', 'ROBOT9000 tells you how many original comments you\'ve made')
     async def send_scores(self, message, users):
@@ -63,7 +307,7 @@ class R9K(glados.Module):
         # Remove anything that is not alphanumeric
         phrase = match.group(1)
         phrase = re.sub('[^A-Za-z0-9]+', '', phrase)
-        h = hashlib.sha256(phrase.encode('utf-8')).hexdigest()
+        h = HashStore.digest(phrase)
 
         # Create score entry if it doesn't exist
         author = message.author.name
@@ -84,12 +328,15 @@ class R9K(glados.Module):
 
             # update scores
             self.scores[author]['score'] += 1
+        else:
+            self.hashes.add(h)
 
-        # lol is this really a good idea?
-        with open(self.score_file, 'w') as f:
-            f.write(json.dumps(self.scores))
-
-        self.hashes.add(h)
-        self.hashes_file.write(h + '\n')
+        # New hashes are pushed to disk every few seconds instead of after every message
+        if time.monotonic() - self.__last_save >= self.save_interval:
+            self.__save()
 
         return tuple()
+
+    def __save(self):
+        self.__last_save = time.monotonic()
+        self.hashes.flush()
@@ -0,0 +1,138 @@
+# coding=utf-8
+"""
+remind.py - Sopel Reminder Module
+Copyright 2011, Sean B. Palmer, inamidst.com
+Licensed under the Eiffel Forum License 2.
+http://sopel.chat
+"""
+import re
+import time
+import calendar
+import collections
+import glados
+from datetime import datetime, timedelta
+
+scaling = collections.OrderedDict([
+    ('years', 365.25 * 24 * 3600),
+    ('year', 365.25 * 24 * 3600),
+    ('yrs', 365.25 * 24 * 3600),
+    ('y', 365.25 * 24 * 3600),
+
+    ('months', 29.53059 * 24 * 3600),
+    ('month', 29.53059 * 24 * 3600),
+    ('mo', 29.53059 * 24 * 3600),
+
+    ('weeks', 7 * 24 * 3600),
+    ('week', 7 * 24 * 3600),
+    ('wks', 7 * 24 * 3600),
+    ('wk', 7 * 24 * 3600),
+    ('w', 7 * 24 * 3600),
+
+    ('days', 24 * 3600),
+    ('day', 24 * 3600),
+    ('d', 24 * 3600),
+
+    ('hours', 3600),
+    ('hour', 3600),
+    ('hrs', 3600),
+    ('hr', 3600),
+    ('h', 3600),
+
+    ('minutes', 60),
+    ('minute', 60),
+    ('mins', 60),
+    ('min', 60),
+    ('m', 60),
+
+    ('seconds', 1),
+    ('second', 1),
+    ('secs', 1),
+    ('sec', 1),
+    ('s', 1),
+])
+
+periods = '|'.join(scaling.keys())
+offset_pattern = re.compile(r'(\d+(?:\.\d+)? ?(?:' + periods + r')) ?', re.IGNORECASE)
+at_pattern = re.compile(r'(\d+):(\d+)(?::(\d+))?(?:\s+(.*))?$', re.DOTALL)
+
+
+def parse_offset(content):
+    """
+    Splits something like "3h45m Go to class" into the number of seconds and the reminder.
+    :return: Returns a tuple (seconds, reminder). Seconds is 0 if no offset was found.
+    """
+    duration = 0
+    reminder = ''
+    stop = False
+    for piece in filter(None, offset_pattern.split(content)[1:]):
+        grp = re.match(r'(\d+(?:\.\d+)?) ?(.*) ?', piece)
+        if grp and not stop:
+            length = float(grp.group(1))
+            factor = scaling.get(grp.group(2).lower(), 60)
+            duration += length * factor
+        else:
+            reminder = reminder + piece
+            stop = True
+    return duration, reminder.strip()
+
+
+class Reminder(glados.Module):
+    """
+    Reminders are jobs of the bot's scheduler, so they survive restarts. Reminders that became due while the bot was
+    offline are sent as soon as it's back.
+    """
+
+    @glados.Module.command('in', '<offset> <reminder>', 'Creates a reminder. Example: ".in 3h45m Go to class"')
+    async def remind(self, message, content):
+        duration, reminder = parse_offset(content)
+        if duration == 0:
+            await self.client.send_message(message.channel, "Sorry, didn't understand the input.")
+            return
+
+        await self.__create_reminder(message, time.time() + duration, reminder)
+
+    @glados.Module.command('at', '<hh:mm[:ss]> <reminder>', 'Creates a reminder. The time is in UTC. Example: '
+                           '".at 13:47 Do your homework!"')
+    async def at(self, message, content):
+        match = at_pattern.match(content.strip())
+        if not match:
+            await self.client.send_message(message.channel, "Sorry, but I didn't understand your input.")
+            return
+        hour, minute, second, reminder = match.groups()
+
+        now = datetime.utcnow()
+        try:
+            at_time = now.replace(hour=int(hour), minute=int(minute), second=int(second or 0), microsecond=0)
+        except ValueError as e:
+            await self.client.send_message(message.channel, 'Error: {}'.format(e))
+            return
+        if at_time <= now:
+            at_time += timedelta(days=1)
+
+        await self.__create_reminder(message, calendar.timegm(at_time.timetuple()), reminder or '')
+
+    async def __create_reminder(self, message, timestamp, reminder):
+        self.schedule('{}-{}'.format(message.author.id, message.id), timestamp, data={
+            'channel': message.channel.id,
+            'author': message.author.id,
+            'message': reminder
+        })
+
+        duration = int(timestamp - time.time())
+        if duration >= 60:
+            remind_at = datetime.utcfromtimestamp(timestamp)
+            await self.client.send_message(message.channel, 'Okay, will remind at {} UTC'.format(
+                remind_at.strftime('%Y-%m-%d %H:%M:%S')))
+        else:
+            await self.client.send_message(message.channel, 'Okay, will remind in {} secs'.format(max(duration, 0)))
+
+    async def on_scheduled(self, job):
+        channel = self.client.get_channel(job.data['channel'])
+        author = self.member_index.get(job.data['author'])
+        if channel is None or author is None:
+            return
+
+        if job.data['message']:
+            await self.client.send_message(channel, '{} {}'.format(author.mention, job.data['message']))
+        else:
+            await self.client.send_message(channel, '{}!'.format(author.mention))
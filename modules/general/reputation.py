@@ -1,6 +1,4 @@
 import glados
-import codecs
-import json
 import os.path
 import random
 
@@ -75,12 +73,6 @@ def limit_activity(func):
         await func(obj, message, content, members)
     return wrapper
 
-def create_json_file(path, name, data):
-    filepath = os.path.join(path, name)
-    if not os.path.exists(filepath):
-        with codecs.open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f)
-
 def reputation_text(name, reputation):
     return '{}\'{} reputation is {}'.format(name, '' if name.endswith('s') else 's', reputation)
 
@@ -89,19 +81,21 @@ class Reputation(glados.Module):
     def __init__(self, server_instance, full_name):
         super(Reputation, self).__init__(server_instance, full_name)
         self.rep_dir = os.path.join(self.local_data_dir, 'reputation')
-        if not os.path.exists(self.rep_dir):
-            os.makedirs(self.rep_dir)
-        create_json_file(self.rep_dir, 'reputation.json', {})
-        create_json_file(self.rep_dir, 'config.json', DEFAULT_CONFIG)
+        self.files = {
+            'reputation': self.local_database.key_value('reputation/reputation'),
+            'config': self.local_database.key_value('reputation/config'),
+        }
+        # Import the JSON files older versions used
+        for key, store in self.files.items():
+            file_name = os.path.join(self.rep_dir, '{}.json'.format(key))
+            if os.path.isfile(file_name):
+                glados.log('Importing {} into {}'.format(file_name, self.local_database.file_name))
+                self.local_database.import_json(file_name, store.namespace)
+                os.replace(file_name, file_name + '.imported')
         self.activity = {}
     
     def _get_file(self, key):
-        with codecs.open(os.path.join(self.rep_dir, '{}.json'.format(key)), 'r', encoding='utf-8') as f:
-            return json.load(f)
-    
-    def _update_file(self, key, data):
-        with codecs.open(os.path.join(self.rep_dir, '{}.json'.format(key)), 'w', encoding='utf-8') as f:
-            json.dump(data, f)
+        return self.files[key]
 
     def _update_activity_limit(self, member, amount=1):
         config = self._get_file('config')
@@ -110,7 +104,7 @@ class Reputation(glados.Module):
         if user_activity['date'] < date.today():
             user_activity['date'] = date.today()
             user_activity['votes'] = 0
-        user_limit = config['override'].get(member.name, config['daily_limit'])
+        user_limit = config.get('override', {}).get(member.name, config.get('daily_limit', DEFAULT_CONFIG['daily_limit']))
         if user_activity['votes'] + amount > user_limit:
             raise Exception('Vote limit exceeded. Your limit is {}.'.format(user_limit))
         user_activity['votes'] = user_activity['votes'] + amount
@@ -130,7 +124,6 @@ class Reputation(glados.Module):
             reputation[message.author.name] = author_reputation
             response.append(reputation_text(member.name, new_reputation))
         response.append(reputation_text(message.author.name, reputation[message.author.name]))
-        self._update_file('reputation', reputation)
         await self.client.send_message(message.channel, ', '.join(response))
 
     @glados.Module.command('downvote', '<user>', 'Remove reputation from a user')
@@ -150,7 +143,6 @@ class Reputation(glados.Module):
             reputation[message.author.name] = author_reputation
             response.append(reputation_text(member.name, new_reputation))
         response.append(reputation_text(message.author.name, reputation[message.author.name]))
-        self._update_file('reputation', reputation)
         await self.client.send_message(message.channel, ', '.join(response))
 
     @glados.Module.command('reputation', '<user>', 'See a user\'s reputation')
@@ -164,7 +156,7 @@ class Reputation(glados.Module):
     @glados.Module.command('toprep', '', 'See the five users with most reputation')
     async def toprep(self, message, content):
         reputation = self._get_file('reputation')
-        top = sorted(list(reputation.items()), key=lambda x: x[1], reverse=True)[:5]
+        top = sorted(await reputation.items(), key=lambda x: x[1], reverse=True)[:5]
         response = []
         for member in top:
             response.append('{}: {}'.format(*member))
@@ -173,7 +165,7 @@ class Reputation(glados.Module):
     @glados.Module.command('bottomrep', '', 'See the five users with least reputation')
     async def bottomrep(self, message, content):
         reputation = self._get_file('reputation')
-        bottom = sorted(list(reputation.items()), key=lambda x: x[1])[:5]
+        bottom = sorted(await reputation.items(), key=lambda x: x[1])[:5]
         response = []
         for member in bottom:
             response.append('{}: {}'.format(*member))
@@ -196,6 +188,7 @@ class Reputation(glados.Module):
             return
         config = self._get_file('config')
         name = members.pop().name
-        config['override'][name] = amount
-        self._update_file('config', config)
+        override = config.get('override', {})
+        override[name] = amount
+        config['override'] = override
         await self.client.send_message(message.channel, '{} daily votes set to {}.'.format(name, amount))
@@ -1,6 +1,4 @@
 import glados
-import os
-import json
 from datetime import datetime
 from datetime import timedelta
 
@@ -41,22 +39,12 @@ class Seen(glados.Module):
     def __init__(self, server_instance, full_name):
         super(Seen, self).__init__(server_instance, full_name)
 
-        self.db = dict()
-        self.db_file = os.path.join(self.local_data_dir, 'seen.json')
-        self.__load_dict()
-
-    def __load_dict(self):
-        if os.path.isfile(self.db_file):
-            self.db = json.loads(open(self.db_file).read())
+        self.db = self.store('seen.json')
         # make sure all keys exists
         for k, v in self.db.items():
             if not 'author' in v: v['author'] = k
             if not 'channel' in v: v['channel'] = 'unknown_channel'
 
-    def __save_dict(self):
-        with open(self.db_file, 'w') as f:
-            f.write(json.dumps(self.db))
-
     @glados.Permissions.spamalot
     @glados.Module.rule('^.*$', ignorecommands=False)
     async def on_message(self, message, match):
@@ -69,7 +57,6 @@ class Seen(glados.Module):
                                     'message': str(msg),
                                     'channel': str(channel),
                                     'timestamp': str(ts)}
-        self.__save_dict()
         return ()
 
     @glados.Module.command('seen', '[user]', 'Find the last message a user wrote, where he wrote it, and what it said')
@@ -10,8 +10,22 @@ This module relies on pyenchant, on Fedora and Red Hat based system, it can be f
 import enchant
 import glados
 
+# Loading a dictionary takes a while and they never change, so all servers share them
+_dictionaries = None
+
+
+def get_dictionaries():
+    """
+    :return: Returns a tuple of the en_US and the en_GB enchant.Dict.
+    """
+    global _dictionaries
+    if _dictionaries is None:
+        _dictionaries = (enchant.Dict("en_US"), enchant.Dict("en_GB"))
+    return _dictionaries
+
 
 class SpellCheck(glados.Module):
+    scope = glados.Module.PROCESS
 
     @glados.Module.command('spell', '<word>', 'Says whether the given word is spelled correctly, and gives suggestions '
                            'if it\'s not')
@@ -25,8 +39,7 @@ class SpellCheck(glados.Module):
             return
 
         word = word.split(' ', 1)[0]
-        dictionary = enchant.Dict("en_US")
-        dictionary_uk = enchant.Dict("en_GB")
+        dictionary, dictionary_uk = get_dictionaries()
 
         # I don't want to make anyone angry, so I check both American and British English.
         if dictionary_uk.check(word):
@@ -56,6 +69,9 @@ class SpellCheck(glados.Module):
 
 
 class AutoCorrect(glados.Module):
-    @glados.Module.rule('^.*(?i)((sh|c|w)ould|might)\\s+of\\b.*$')
+    scope = glados.Module.PROCESS
+
+    # Rules are case insensitive anyway. An inline (?i) that isn't at the start is an error since Python 3.11.
+    @glados.Module.rule('^.*((sh|c|w)ould|might)\\s+of\\b.*$')
     async def shouldof(self, message, match):
         await self.client.send_message(message.channel, '{} have*'.format(match.group(1)))
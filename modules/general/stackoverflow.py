@@ -1,7 +1,4 @@
-import gzip
-import json
 from urllib.parse import urlencode
-import urllib.request
 
 import glados
 
@@ -19,14 +16,9 @@ class StackOverflow(glados.Module):
             'pagesize': 1,
             'q': content
         })
-        result = get_json_response(STACK_EXCHANGE_API + query_string)
+        # The API always compresses its responses, the HTTP client decompresses them
+        result = (await self.http.get(STACK_EXCHANGE_API + query_string)).json()
         if (not result['items']):
             await self.client.send_message(message.channel, 'No questions found :(')
         else:
             await self.client.send_message(message.channel, result['items'][0]['link'])
-
-
-def get_json_response(url):
-    with urllib.request.urlopen(url) as response:
-        result = gzip.decompress(response.read())
-        return json.loads(result.decode('utf-8'))
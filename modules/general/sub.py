@@ -1,67 +1,212 @@
 import glados
 import discord
-import json
-import os
-import errno
-import signal
+import asyncio
+import multiprocessing
+import threading
 import re
 from datetime import datetime, timedelta
-from functools import wraps
-
+from glados.rules import required_literals, fold_case
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+# Opcodes that can only ever look at a bounded number of characters from each starting position, so searching with
+# them takes linear time no matter what the message is
+_PLAIN_OPCODES = (sre_parse.LITERAL, sre_parse.NOT_LITERAL, sre_parse.ANY, sre_parse.IN, sre_parse.AT)
+
+
+def is_plain(pattern):
+    """
+    :return: Returns True if the pattern has no repeats and no back references, e.g. "\\b(trash can|trashcan)\\b".
+    Only these are safe to run on the event loop, anything else could backtrack for a long time (e.g. ".*.*.*.*.*x")
+    and has to run in the RegexSandbox.
+    """
+    try:
+        return _is_plain(sre_parse.parse(pattern, re.IGNORECASE))
+    except (re.error, RecursionError):
+        return False
+
+
+def _is_plain(parsed):
+    for op, av in parsed:
+        if op == sre_parse.SUBPATTERN:
+            if not _is_plain(av[-1]):
+                return False
+        elif op == sre_parse.BRANCH:
+            if not all(_is_plain(x) for x in av[1]):
+                return False
+        elif op not in _PLAIN_OPCODES:
+            return False
+    return True
+
+
+def trie_regex(words):
+    """
+    Builds a regex matching any of the words, structured like a trie so it only has to look at each character once.
+    At a given position, it matches the longest of the words that starts there.
+    """
+    trie = dict()
+    for word in words:
+        node = trie
+        for c in word:
+            node = node.setdefault(c, {})
+        node[''] = None
+
+    def build(node):
+        branches = [re.escape(c) + build(child) for c, child in sorted(node.items(), key=lambda x: x[0]) if c]
+        if len(branches) == 0:
+            return ''
+        regex = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return '(?:' + regex + ')?' if '' in node else regex
+    return build(trie)
+
+
+class SubscriptionMatcher(object):
+    """
+    Finds the subscriptions matching a message in one pass. The literals every subscription requires (see
+    glados.rules.required_literals()) are combined into a single regex, so only the subscriptions whose literals occur
+    in the message (and the few from which no literal could be extracted) have to be run.
+    """
+
+    def __init__(self, subscriptions):
+        """
+        :param subscriptions: A list of (compiled regex, author ID) tuples.
+        """
+        self.subscriptions = subscriptions
+        self.__always = list()  # indices of subscriptions that have to be checked for every message
+        self.__by_literal = dict()  # literal -> list of indices
+        for i, (regex, author_id) in enumerate(subscriptions):
+            literals = required_literals(regex)
+            if literals is None:
+                self.__always.append(i)
+                continue
+            for literal in literals:
+                self.__by_literal.setdefault(literal, list()).append(i)
+
+        # The longest literal found at a position implies all of its prefixes were found as well
+        self.__prefixes = {literal: [literal[:i] for i in range(1, len(literal) + 1) if literal[:i] in self.__by_literal]
+                           for literal in self.__by_literal}
+        self.__scanner = None
+        if len(self.__by_literal) > 0:
+            self.__scanner = re.compile('(?=({}))'.format(trie_regex(self.__by_literal)))
+
+    def candidates(self, text):
+        """
+        :return: Returns the (compiled regex, author ID) tuples that could match the text, in order of subscription.
+        """
+        indices = set(self.__always)
+        if self.__scanner is not None:
+            found = set(m.group(1) for m in self.__scanner.finditer(fold_case(text)))
+            for literal in found:
+                for prefix in self.__prefixes.get(literal, ()):
+                    indices.update(self.__by_literal[prefix])
+        return [self.subscriptions[i] for i in sorted(indices)]
+
+
+def _sandbox_worker(connection):
+    compiled = dict()
+    connection.send(None)  # ready
+    while True:
+        try:
+            patterns, text = connection.recv()
+        except (EOFError, KeyboardInterrupt):
+            return  # The bot exited
+        for pattern in patterns:
+            regex = compiled.get(pattern, None)
+            if regex is None:
+                regex = compiled[pattern] = re.compile(pattern, re.IGNORECASE)
+            connection.send(regex.search(text) is not None)
+
+
+class RegexSandbox(object):
+    """
+    Runs regexes in a separate process, so one that takes forever can be stopped by killing the process. This works
+    from any thread and even if the regex engine is stuck in C code, which a signal based timeout can't handle.
+    """
+
+    def __init__(self, timeout=0.5):
+        """
+        :param timeout: Number of seconds a single regex may take.
+        """
+        self.timeout = timeout
+        self.__lock = threading.Lock()
+        self.__process = None
+        self.__connection = None
+
+    def search(self, patterns, text):
+        """
+        Blocks until done, run it in an executor.
+        :param patterns: A list of pattern strings, they are compiled case insensitive.
+        :return: Returns a list with an entry for each pattern: True if it matched, False if it didn't, or None if it
+        timed out.
+        """
+        results = list()
+        with self.__lock:
+            while len(results) < len(patterns):
+                if self.__process is None:
+                    self.__start()
+                remaining = patterns[len(results):]
+                self.__connection.send((remaining, text))
+                for _ in remaining:
+                    if not self.__connection.poll(self.timeout):
+                        # Skip the culprit and go on with a new process
+                        self.__stop()
+                        results.append(None)
+                        break
+                    results.append(self.__connection.recv())
+        return results
 
-class TimeoutError(Exception):
-    pass
+    def __start(self):
+        context = multiprocessing.get_context('spawn')
+        self.__connection, child_connection = context.Pipe()
+        self.__process = context.Process(target=_sandbox_worker, args=(child_connection,), daemon=True)
+        self.__process.start()
+        child_connection.close()
+        # Starting up takes longer than the timeout
+        self.__connection.recv()
 
+    def __stop(self):
+        self.__process.kill()
+        self.__process.join()
+        self.__connection.close()
+        self.__process = None
+        self.__connection = None
 
-def timeout(seconds=10, error_message=os.strerror(errno.ETIME)):
-    def decorator(func):
-        def _handle_timeout(signum, frame):
-            raise TimeoutError(error_message)
 
-        def wrapper(*args, **kwargs):
-            signal.signal(signal.SIGALRM, _handle_timeout)
-            signal.setitimer(signal.ITIMER_REAL,seconds) #used timer instead of alarm
-            try:
-                result = func(*args, **kwargs)
-            finally:
-                signal.alarm(0)
-            return result
-        return wraps(func)(wrapper)
-    return decorator
+_sandbox = None
 
 
-@timeout(0.5)
-def timeout_match(regex, message):
-    return regex.search(message)
+def get_sandbox():
+    global _sandbox
+    if _sandbox is None:
+        _sandbox = RegexSandbox()
+    return _sandbox
 
 
 class Sub(glados.Module):
     def __init__(self, server_instance, full_name):
         super(Sub, self).__init__(server_instance, full_name)
 
-        self.subs_file = os.path.join(self.local_data_dir, 'subs.json')
-        self.subs = dict()
+        self.subs = self.store('subs.json')
         self.items = dict()
 
-        if os.path.isfile(self.subs_file):
-            glados.log('Loading subscriptions from {}'.format(self.subs_file))
-            self.subs = json.loads(open(self.subs_file).read())
-
         self.__recompile_regex()
 
     def __recompile_regex(self):
         self.regex = list()
+        self.sandboxed = set()  # patterns that have to run in the sandbox
         for author_id, regexes in self.subs.items():
             for regex in regexes:
                 try:
                     compiled_regex = re.compile(regex, flags=re.IGNORECASE)
                     self.regex.append((compiled_regex, author_id))
-                except re.error:
+                    if not is_plain(regex):
+                        self.sandboxed.add(regex)
+                except (re.error, RecursionError):
                     pass
-
-    def __save_subs(self):
-        with open(self.subs_file, 'w') as f:
-            f.write(json.dumps(self.subs))
+        self.matcher = SubscriptionMatcher(self.regex)
 
     @glados.Module.command('sub', '<regex>', 'Get notified when a message matches the regex. The regex is **case '
                            'insensitive** and does not have to match the entire message, it searches for substrings '
@@ -92,8 +237,7 @@ class Sub(glados.Module):
             return
 
         self.subs[message.author.id].append(regex)
-        self.regex.append((compiled_regex, message.author))
-        self.__save_subs()
+        self.__recompile_regex()
 
         await self.client.send_message(message.channel, '{} added subscription #{} (``{}``)'.format(message.author.name, len(self.subs[message.author.id]), regex))
 
@@ -120,7 +264,6 @@ class Sub(glados.Module):
         if len(self.subs[message.author.id]) == 0:
             del self.subs[message.author.id]
         self.__recompile_regex()
-        self.__save_subs()
 
         await self.client.send_message(message.channel, '{} unsubscribed from {}'.format(message.author.name, ', '.join(str(x) for x in indices)))
 
@@ -134,11 +277,8 @@ class Sub(glados.Module):
                 member = message.mentions[0]
             else:
                 user_name = user.strip('@').split('#')[0]
-                member = None
-                for m in self.server.members:
-                    if m.name == user_name:
-                        member = m
-                        break
+                members = self.member_index.find(user_name) or self.member_index.find(user_name, ignore_case=True)
+                member = members[0] if len(members) > 0 else None
                 if member is None:
                     await self.client.send_message(message.channel, 'User "{}" not found'.format(user_name))
                     return
@@ -164,28 +304,33 @@ class Sub(glados.Module):
 
         members_to_remove = list()
 
-        for i, tup in enumerate(self.regex):
-            regex, subscribed_author = tup[0], tup[1]
-
-            # may need to retrieve the author (this doesn't happen when first loading from JSON)
-            if isinstance(subscribed_author, str):
-                for member in self.server.members:
-                    if member.id == subscribed_author:
-                        subscribed_author = member
-                        self.regex[i] = (regex, member)
-                if isinstance(subscribed_author, str):
-                    # failed at getting member, remove all settings (fuck you!)
-                    members_to_remove.append(subscribed_author)
-                    continue
-
-            # Do match, with timeout
-            try:
-                match = timeout_match(regex, message.content)
-            except TimeoutError:
-                members_to_remove.append(subscribed_author.id)
-                await self.client.send_message(message.channel, 'Shit regex detected, removing sublist of {}'.format(subscribed_author.name))
+        # Patterns that could take forever run in a separate process which can be killed, all of them in one go
+        candidates = self.matcher.candidates(message.content)
+        sandboxed = [x for x in candidates if x[0].pattern in self.sandboxed]
+        if len(sandboxed) > 0:
+            results = await asyncio.get_event_loop().run_in_executor(
+                None, get_sandbox().search, [x[0].pattern for x in sandboxed], message.content)
+            results = dict(zip(sandboxed, results))
+        else:
+            results = dict()
+
+        for regex, author_id in candidates:
+            # Make sure the member is even still part of the server (thanks Helper...)
+            subscribed_author = self.member_index.get(author_id)
+            if subscribed_author is None:
+                # failed at getting member, remove all settings (fuck you!)
+                members_to_remove.append(author_id)
                 continue
-            if match is None:
+
+            if (regex, author_id) in results:
+                match = results[(regex, author_id)]
+                if match is None:
+                    members_to_remove.append(subscribed_author.id)
+                    await self.client.send_message(message.channel, 'Shit regex detected, removing sublist of {}'.format(subscribed_author.name))
+                    continue
+            else:
+                match = regex.search(message.content)
+            if not match:
                 continue
 
             # Only perform the mention if enough time has passed
@@ -193,22 +338,17 @@ class Sub(glados.Module):
             if subscribed_author.id in self.items:
                 dt = datetime.now() - self.items[subscribed_author.id]
             if dt > timedelta(minutes=1):
-                # Make sure the member is even still part of the server (thanks Helper...)
-                if any(member.id == subscribed_author.id for member in self.server.members):
-                    pattern = regex.pattern
-                    if len(pattern) > 30:
-                        pattern = pattern[:30] + '...'
-                    # Thanks GTE (blocked the bot, which causes this to throw an exception)
-                    try:
-                        await self.client.send_message(subscribed_author, '[sub][{}][{}] (``{}``) ```{}: {}``` {}'.format(
-                                message.server.name, message.channel.name, pattern, message.author.name, message.content,
-                                'https://discordapp.com/channels/{}/{}/{}'.format(message.server.id, message.channel.id, message.id)))
-                        self.items[subscribed_author.id] = datetime.now()
-                    except discord.Forbidden as e:
-                        await self.client.send_message(message.channel, '{} I am removing all of your subscriptions, because you blocked me :('.format(subscribed_author.mention))
-                        members_to_remove.append(subscribed_author.id)
-                else:
-                    # Remove all settings entirely (fuck you!)
+                pattern = regex.pattern
+                if len(pattern) > 30:
+                    pattern = pattern[:30] + '...'
+                # Thanks GTE (blocked the bot, which causes this to throw an exception)
+                try:
+                    await self.client.send_message(subscribed_author, '[sub][{}][{}] (``{}``) ```{}: {}``` {}'.format(
+                            message.server.name, message.channel.name, pattern, message.author.name, message.content,
+                            'https://discordapp.com/channels/{}/{}/{}'.format(message.server.id, message.channel.id, message.id)))
+                    self.items[subscribed_author.id] = datetime.now()
+                except discord.Forbidden as e:
+                    await self.client.send_message(message.channel, '{} I am removing all of your subscriptions, because you blocked me :('.format(subscribed_author.mention))
                     members_to_remove.append(subscribed_author.id)
 
         for member_id in members_to_remove:
@@ -217,7 +357,6 @@ class Sub(glados.Module):
             except KeyError:
                 pass
         if len(members_to_remove) > 0:
-            self.__save_subs()
             self.__recompile_regex()
 
         return tuple()
@@ -1,11 +1,10 @@
 import glados
 import json
 import sys
-import requests
 import urllib.parse
 
 
-def translate(text, in_lang='auto', out_lang='en', verify_ssl=True):
+async def translate(http, text, in_lang='auto', out_lang='en', verify_ssl=True):
     raw = False
     if out_lang.endswith('-raw'):
         out_lang = out_lang[:-4]
@@ -25,8 +24,7 @@ def translate(text, in_lang='auto', out_lang='en', verify_ssl=True):
         "q": text,
     }
     url = "http://translate.googleapis.com/translate_a/single"
-    result = requests.get(url, params=query, timeout=40, headers=headers,
-                          verify=verify_ssl).text
+    result = (await http.get(url, params=query, timeout=40, headers=headers, verify_ssl=verify_ssl)).text()
 
     if result == '[,,""]':
         return None, in_lang
@@ -81,7 +79,7 @@ class Translate(glados.Module):
 
         src, dest = args
         if src != dest:
-            msg, src = translate(phrase, src, dest)
+            msg, src = await translate(self.http, phrase, src, dest)
             if msg:
                 msg = urllib.parse.unquote(msg)
                 msg = '"%s" (%s to %s, translate.google.com)' % (msg, src, dest)
@@ -30,6 +30,8 @@ def k_to_c(temp):
 
 
 class Units(glados.Module):
+    scope = glados.Module.PROCESS
+
     @glados.Module.command('temp', '<100F/C/K>', 'Converts between all 3 units of temperature')
     async def temperature(self, message, arg):
         """
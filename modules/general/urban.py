@@ -1,6 +1,4 @@
-import json
 import glados
-import urllib.request
 import urllib.parse
 import random
 
@@ -8,10 +6,9 @@ UD_URL = 'http://api.urbandictionary.com/v0/define?term='
 
 
 class Urban(glados.Module):
-    @staticmethod
-    def get_def(word):
+    async def get_def(self, word):
         url = UD_URL + urllib.parse.quote(word)
-        resp = json.loads(urllib.request.urlopen(url).read().decode("utf-8"))
+        resp = (await self.http.get(url, cache=600)).json()
         if len(resp['list']) == 0:
             definition = 'Definition {} not found!'.format(word)
         else:
@@ -35,5 +32,5 @@ class Urban(glados.Module):
     async def urban(self, message, content):
         if message.author.id == '156788287820791808' and random.random() < 0.333:   # newt
             return await self.client.send_message(message.channel, "Shut the hell up, newt")
-        definition = self.get_def(content)
+        definition = await self.get_def(content)
         await self.client.send_message(message.channel, definition)
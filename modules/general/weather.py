@@ -5,13 +5,12 @@
 import glados
 import os
 import json
-import urllib.request
 import urllib.parse
 import xmltodict
 import random
 
 
-def woeid_search(query):
+async def woeid_search(http, query):
     """
     Find the first Where On Earth ID for the given query. Result is the etree
     node for the result, so that location data can still be retrieved. Returns
@@ -21,7 +20,7 @@ def woeid_search(query):
     query = urllib.parse.quote('select * from geo.places where text="{}"'.format(query))
     query = 'http://query.yahooapis.com/v1/public/yql?q=' + query
     glados.log('Request: {}'.format(query))
-    body = urllib.request.urlopen(query).read()
+    body = (await http.get(query, cache=3600)).body
     parsed = xmltodict.parse(body).get('query')
     results = parsed.get('results')
     if results is None or results.get('place') is None:
@@ -168,7 +167,7 @@ class Weather(glados.Module):
             try:
                 woeid = self.woeid_db[location.lower()]  # assume location is a user first
             except KeyError:
-                first_result = woeid_search(location)
+                first_result = await woeid_search(self.http, location)
                 if first_result is not None:
                     woeid = first_result.get('woeid')
 
@@ -180,7 +179,7 @@ class Weather(glados.Module):
         query = 'http://query.yahooapis.com/v1/public/yql?q=' + query
         glados.log('Request: {}'.format(query))
 
-        body = urllib.request.urlopen(query).read()
+        body = (await self.http.get(query, cache=600)).body
         parsed = xmltodict.parse(body).get('query')
         results = parsed.get('results')
         if results is None:
@@ -201,7 +200,7 @@ class Weather(glados.Module):
             await self.provide_help('setlocation', message)
             return
 
-        first_result = woeid_search(location)
+        first_result = await woeid_search(self.http, location)
         if first_result is None:
             await self.client.send_message(message.channel, "I don't know where that is.")
             return
@@ -240,7 +239,7 @@ class Weather(glados.Module):
             query = 'http://query.yahooapis.com/v1/public/yql?q=' + query
             glados.log('Request: {}'.format(query))
 
-            body = urllib.request.urlopen(query).read()
+            body = (await self.http.get(query, cache=600)).body
             parsed = xmltodict.parse(body).get('query')
             results = parsed.get('results')
 
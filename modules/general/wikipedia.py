@@ -3,9 +3,7 @@
 # Licensed under the Eiffel Forum License 2.
 
 import glados
-import json
 import re
-from urllib.request import urlopen
 from urllib.parse import urlencode
 
 REDIRECT = re.compile(r'^REDIRECT (.*)')
@@ -30,16 +28,16 @@ class Wikipedia(glados.Module):
             return
 
         server = self.__lang + '.wikipedia.org'
-        query = mw_search(server, query, 1)
+        query = await mw_search(self.http, server, query, 1)
         if not query:
             await self.client.send_message(message.channel, 'I can\'t find any results for that.')
             return
         else:
             query = query[0]
-        await say_snippet(self.client, message, server, query)
+        await say_snippet(self.http, self.client, message, server, query)
 
 
-def mw_search(server, query, num):
+async def mw_search(http, server, query, num):
     """
     Searches the specified MediaWiki server for the given query, and returns
     the specified number of results.
@@ -53,7 +51,7 @@ def mw_search(server, query, num):
         srwhat='text',
         srsearch=query
     ))
-    query = json.loads(urlopen(search_url).read().decode("utf-8"))
+    query = (await http.get(search_url, cache=3600)).json()
     if 'query' in query:
         query = query['query']['search']
         return [r['title'] for r in query]
@@ -61,7 +59,7 @@ def mw_search(server, query, num):
         return None
 
 
-def mw_snippet(server, query):
+async def mw_snippet(http, server, query):
     """
     Retrives a snippet of the specified length from the given page on the given
     server.
@@ -73,7 +71,7 @@ def mw_snippet(server, query):
         exchars=300,
         titles=query
     ))
-    snippet = json.loads(urlopen(snippet_url).read().decode("utf-8"))
+    snippet = (await http.get(snippet_url, cache=3600)).json()
     snippet = snippet['query']['pages']
 
     # For some reason, the API gives the page *number* as the key, so we just
@@ -83,10 +81,10 @@ def mw_snippet(server, query):
     return snippet['extract']
 
 
-async def say_snippet(client, message, server, query, show_url=True):
+async def say_snippet(http, client, message, server, query, show_url=True):
     page_name = query.replace('_', ' ')
     query = query.replace(' ', '_')
-    snippet = mw_snippet(server, query)
+    snippet = await mw_snippet(http, server, query)
     msg = '[WIKIPEDIA] {} | "{}"'.format(page_name, snippet)
     if show_url:
         msg = msg + ' | https://{}/wiki/{}'.format(server, query)
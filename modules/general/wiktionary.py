@@ -7,7 +7,6 @@ http://sopel.chat
 """
 import glados
 import re
-import urllib.request
 import urllib.parse
 
 uri = 'http://en.wiktionary.org/w/index.php?title={}&printable=yes'
@@ -24,8 +23,8 @@ def text(html):
     return text
 
 
-def wikt(word):
-    bytes = urllib.request.urlopen(uri.format(urllib.parse.quote(word))).read().decode('utf-8')
+async def wikt(http, word):
+    bytes = (await http.get(uri.format(urllib.parse.quote(word)))).text()
     bytes = r_ul.sub('', bytes)
 
     mode = None
@@ -83,7 +82,7 @@ class Wiktionary(glados.Module):
         word = words[0]
 
         """Look up a word on Wiktionary."""
-        _etymology, definitions = wikt(word)
+        _etymology, definitions = await wikt(self.http, word)
         if not definitions:
             await self.client.send_message(message.channel, 'Couldn\'t get any definitions for {}.'.format(word))
             return
@@ -1,5 +1,5 @@
 import glados
-import requests
+import asyncio
 import wolframalpha
 import os.path
 import random
@@ -25,14 +25,20 @@ CANNOT_UNDERSTAND = [
 
 
 class WolframAlpha(glados.Module):
+    scope = glados.Module.PROCESS
+
     def __init__(self, server_instance, full_name):
         super(WolframAlpha, self).__init__(server_instance, full_name)
 
         key = self.settings.setdefault('wolfram alpha', {}).setdefault('key', '<please enter WA key>')
         self.__wolfram_client = wolframalpha.Client(key)
-        self.cache_dir = os.path.join(self.local_data_dir, 'wolfram')
-        if not os.path.exists(self.cache_dir):
-            os.makedirs(self.cache_dir)
+
+    @property
+    def cache_dir(self):
+        cache_dir = os.path.join(self.local_data_dir, 'wolfram')
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        return cache_dir
 
     @staticmethod
     def __format_info(spellcheck, delimiters, reinterpret):
@@ -89,7 +95,9 @@ class WolframAlpha(glados.Module):
             return
 
         try:
-            data, info_msg = self.__do_wa_query(query)
+            # The wolframalpha client uses blocking I/O
+            loop = asyncio.get_event_loop()
+            data, info_msg = await loop.run_in_executor(None, self.__do_wa_query, query)
         except:
             await self.client.send_message(message.channel, 'Oh oh. Wolfram Alpha has experienced... an accident')
             return
@@ -101,12 +109,8 @@ class WolframAlpha(glados.Module):
             for pod in data['pod']:
                 if pod['@id'] == 'Result':
                     subpod = pod['subpod'][0] if isinstance(pod['subpod'], list) else pod['subpod']
-                    img = requests.get(subpod['img']['@src'], stream=True)
-                    img.raw.decode_content = True
-
                     image_file_name = os.path.join(self.cache_dir, message.author.name + '.gif')
-                    with open(image_file_name, 'w+b') as f:
-                        f.write(img.raw.read())
+                    await self.http.download(subpod['img']['@src'], image_file_name)
                     await self.client.send_file(message.channel, image_file_name,
                                                      content='{0}: {1}'.format(message.author.mention, info_msg))
                     return
@@ -114,12 +118,8 @@ class WolframAlpha(glados.Module):
             for pod in data['pod']:
                 if pod['@scanner'] != 'Identity':
                     subpod = pod['subpod'][0] if isinstance(pod['subpod'], list) else pod['subpod']
-                    img = requests.get(subpod['img']['@src'], stream=True)
-                    img.raw.decode_content = True
-
                     image_file_name = os.path.join(self.cache_dir, message.author.name + '.gif')
-                    with open(image_file_name, 'w+b') as f:
-                        f.write(img.raw.read())
+                    await self.http.download(subpod['img']['@src'], image_file_name)
                     await self.client.send_file(message.channel, image_file_name,
                                                      content='{0}: {1}'.format(message.author.mention, info_msg))
                     return
@@ -5,10 +5,9 @@
 # Licensed under the Eiffel Forum License 2.
 import glados
 import discord
-import urllib.request
+import urllib.parse
 import random
 import re
-import requests
 import os
 
 
@@ -27,23 +26,24 @@ ignored_sites = [
 sites_query = ' site:xkcd.com'
 
 
-def get_info(number=None):
+async def get_info(http, number=None):
     if number:
         url = 'http://xkcd.com/{}/info.0.json'.format(number)
+        data = (await http.get(url, cache=86400)).json()
     else:
         url = 'http://xkcd.com/info.0.json'
-    data = requests.get(url).json()
+        data = (await http.get(url, cache=600)).json()
     data['url'] = 'http://xkcd.com/' + str(data['num'])
     return data
 
 
 
-def duck_search(query):
+async def duck_search(http, query):
     query = query.replace('!', '')
     uri = 'http://duckduckgo.com/html/?q=%s&kl=uk-en' % query
     bytes = ""
     try:
-        bytes = urllib.request.urlopen(uri).read().decode('utf-8')
+        bytes = (await http.get(uri)).text()
     except Exception as e:
         print(e)
         return None
@@ -61,8 +61,8 @@ def duck_search(query):
     return None
 
 
-def google(query):
-    return duck_search(query + sites_query)
+async def google(http, query):
+    return await duck_search(http, query + sites_query)
 
 
 class XKCD(glados.Module):
@@ -83,13 +83,13 @@ class XKCD(glados.Module):
         If non-numeric input is provided it will return the first google result for those keywords on the xkcd.com site
         """
         # get latest comic for rand function and numeric input
-        latest = get_info()
+        latest = await get_info(self.http)
         max_int = latest['num']
 
         # if no input is given (pre - lior's edits code)
         if query == '':  # get rand comic
             random.seed()
-            requested = get_info(random.randint(1, max_int + 1))
+            requested = await get_info(self.http, random.randint(1, max_int + 1))
         else:
             query = query.strip()
 
@@ -112,25 +112,25 @@ class XKCD(glados.Module):
                     await self.client.send_message(message.channel, "404 - Not Found")  # don't error on that one
                     return
                 elif query > 0:
-                    requested = get_info(query)
+                    requested = await get_info(self.http, query)
                 else:
                     # Negative: go back that many from current
-                    requested = get_info(max_int + query)
+                    requested = await get_info(self.http, max_int + query)
             else:
                 # Non-number: google.
                 if query.lower() == "latest" or query.lower() == "newest":
                     requested = latest
                 else:
-                    number = google(query)
+                    number = await google(self.http, query)
                     if not number:
                         await self.client.send_message(message.channel, 'Could not find any comics for that query.')
                         return
-                    requested = get_info(number)
+                    requested = await get_info(self.http, number)
 
         img_file = requested['img'].split('/')[-1]
         img_file = os.path.join(self.__tmp_dir, img_file)
         if not os.path.isfile(img_file):
-            urllib.request.urlretrieve(requested['img'], img_file)
+            await self.http.download(requested['img'], img_file)
 
         response = '<{}> [{}]'.format(requested['url'], requested['title'])
         try:
@@ -1,6 +1,5 @@
 import glados
 import re
-import urllib.request
 import urllib.parse
 from bs4 import BeautifulSoup
 
@@ -16,16 +15,15 @@ class Youtube(glados.Module):
             return
 
         if content == 'comment':
-            await self.client.send_message(message.channel, self.get_random_comment())
+            await self.client.send_message(message.channel, await self.get_random_comment())
             return
         if content == 'video':
-            await self.client.send_message(message.channel, self.get_random_video())
+            await self.client.send_message(message.channel, await self.get_random_video())
             return
-        await self.client.send_message(message.channel, self.search_for_video(content))
+        await self.client.send_message(message.channel, await self.search_for_video(content))
 
-    @staticmethod
-    def get_random_comment():
-        page = urllib.request.urlopen('http://www.randomyoutubecomment.com/').read().decode('utf-8')
+    async def get_random_comment(self):
+        page = (await self.http.get('http://www.randomyoutubecomment.com/')).text()
         re_mark = re.compile('text-decoration: none; color: black;">(.*)</span>')
         comment = re_mark.findall(page)
         re_mark = re.compile('<p style="font-style:italic; font-size: 24pt;">(.*)</p>')
@@ -36,9 +34,8 @@ class Youtube(glados.Module):
         else:
             return 'Error: No results :('
 
-    @staticmethod
-    def get_random_video():
-        page = urllib.request.urlopen('http://randomyoutube.net/watch').read().decode('utf-8')
+    async def get_random_video(self):
+        page = (await self.http.get('http://randomyoutube.net/watch')).text()
         re_mark = re.compile('<a href="http://www\.youtube\.com/watch\?v=(.*)" target="_blank">.*</p>')
         results = re_mark.findall(page)
         if results:
@@ -46,11 +43,10 @@ class Youtube(glados.Module):
         else:
             return 'Error: No results :('
 
-    @staticmethod
-    def search_for_video(text_to_search):
+    async def search_for_video(self, text_to_search):
         query = urllib.parse.quote(text_to_search)
         url = 'https://www.youtube.com/results?search_query={}'.format(query)
-        html = urllib.request.urlopen(url).read().decode('utf-8')
+        html = (await self.http.get(url)).text()
         soup = BeautifulSoup(html, 'lxml')
         for vid in soup.findAll(attrs={'class': 'yt-uix-tile-link'}):
             # See issue #5 - remove advertisement links
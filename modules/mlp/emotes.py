@@ -3,15 +3,30 @@ import os
 from os import listdir
 from os.path import dirname, realpath, isfile, join
 import json
-import difflib
 import asyncio
+import collections
+import difflib
+import heapq
+import pickle
+import random
 import APNGLib
 import time
-import urllib.request
+from array import array
 from PIL import Image
 
+THIS_DIR = dirname(realpath(__file__))
+INFODB_PATH = join(THIS_DIR, 'emote_info_db')
+TAGDB_PATH = join(THIS_DIR, 'emote_tag_db')
+
+
+def sanitize_name(name):
+    # we use replace to strip any symbols that'd allow file naviagation.
+    return name.replace('/', '').replace('\\', '').replace('.', '')
+
 
 class Eemote:
+    __slots__ = ('name', 'image_path', 'x_offset', 'y_offset', 'x_size', 'y_size', 'flip', 'is_nsfw')
+
     def __init__(self, name, image_path, x_offset, y_offset, x_size, y_size, flip, is_nsfw):
         self.name = name
         self.image_path = image_path
@@ -22,31 +37,278 @@ class Eemote:
         self.flip = flip
         self.is_nsfw = is_nsfw
 
+    def as_tuple(self):
+        return (self.name, self.image_path, self.x_offset, self.y_offset, self.x_size, self.y_size, self.flip,
+                self.is_nsfw)
+
+
+def trigrams(string):
+    string = '$$' + string.casefold() + '$'
+    return set(string[i:i+3] for i in range(len(string) - 2))
+
+
+class FuzzyIndex(object):
+    """
+    Finds the strings that are most similar to a (misspelled) query through the trigrams they have in common, instead
+    of comparing the query with every single string like difflib.get_close_matches() does. The strings with the highest
+    Dice coefficient of the two sets of trigrams are then ranked by difflib, so the suggestions are the ones difflib
+    would make as long as they share enough trigrams with the query.
+    """
+
+    CANDIDATES = 64  # strings with the highest Dice coefficient, only these are compared by difflib
+
+    def __init__(self, strings=()):
+        self.strings = list()
+        self.sizes = array('I')  # number of trigrams of each string
+        self.postings = dict()  # trigram -> array of indices into strings
+        for string in strings:
+            self.add(string)
+
+    def add(self, string):
+        i = len(self.strings)
+        self.strings.append(string)
+        grams = trigrams(string)
+        self.sizes.append(len(grams))
+        for gram in grams:
+            posting = self.postings.get(gram, None)
+            if posting is None:
+                posting = self.postings[gram] = array('I')
+            posting.append(i)
+
+    def suggest(self, query, n=1, cutoff=0.2):
+        """
+        :param cutoff: Minimum similarity (see difflib.SequenceMatcher.ratio()) of the suggestions.
+        :return: Returns a list of at most n strings similar to the query, best match first.
+        """
+        grams = trigrams(query)
+        counts = collections.Counter()
+        for gram in grams:
+            posting = self.postings.get(gram, None)
+            if posting is not None:
+                counts.update(posting)
+        sizes = self.sizes
+        scored = heapq.nsmallest(self.CANDIDATES, ((-2.0 * shared / (len(grams) + sizes[i]), i)
+                                                   for i, shared in counts.items()))
+        return difflib.get_close_matches(query, [self.strings[i] for score, i in scored], n, cutoff)
+
+    def state(self):
+        # Plain data for the cache file, so it doesn't depend on the module path this class was imported from
+        return self.sizes, self.postings
+
+    @classmethod
+    def from_state(cls, strings, state):
+        index = cls()
+        index.strings = list(strings)
+        index.sizes, index.postings = state
+        return index
+
+
+class EmoteIndex(object):
+    """
+    All emotes and tags known to the bot, built from the JSON files in emote_info_db and emote_tag_db. There is only
+    one index per process (see get_emote_index()), servers only keep their own blacklist and NSFW setting. Parsing the
+    JSON files takes a while, so the index is saved to a cache file and loaded from there as long as none of the JSON
+    files changed.
+    """
+
+    CACHE_VERSION = 2
+
+    def __init__(self):
+        self.emotes = dict()  # name -> Eemote
+        self.names = list()  # emote names in the order they were found
+        self.tags = dict()  # subreddit or tag -> tuple of emote names
+        self.fuzzy_names = FuzzyIndex()
+        self.fuzzy_tags = FuzzyIndex()
+        self.__tag_sets = dict()  # tag -> frozenset of emote names, created when a tag is first queried
+
+    @classmethod
+    def load(cls, infodb_path, tagdb_path, cache_file):
+        """
+        :return: Returns the index from the cache file, or builds it (and writes the cache file) if the cache file
+        doesn't exist or is out of date.
+        """
+        sources = cls.__sources(infodb_path, tagdb_path)
+        index = cls.__load_cache(cache_file, sources)
+        if index is None:
+            index = cls.build(infodb_path, tagdb_path)
+            index.__save_cache(cache_file, sources)
+        return index
+
+    @classmethod
+    def build(cls, infodb_path, tagdb_path):
+        index = cls()
+        tags = dict()  # tag -> {name: None}, keeps the order and drops duplicates
+        for f in sorted(listdir(infodb_path)):
+            if not isfile(join(infodb_path, f)):
+                continue
+            subreddit = os.path.splitext(f)[0]
+            with open(join(infodb_path, f)) as jinfo_file:
+                jinfodata = json.loads(jinfo_file.read())
+            with open(join(tagdb_path, f)) as jtag_file:
+                jtagdata = json.loads(jtag_file.read())
+            tags[subreddit] = {}
+            for key, items in jinfodata.items():
+                name = sanitize_name(key[1:])
+                emote = items.get("Emotes")
+                if not emote: continue
+                emote = emote.get("")
+                if not emote: continue
+                image_path = emote.get("Image")
+                offset = emote.get("Offset")
+                size = emote.get("Size")
+                is_nsfw = False
+                flip = False
+                x_offset = 0
+                y_offset = 0
+                x_size = 0
+                y_size = 0
+                css_transform = None
+                if (emote.get("CSS")): css_transform = emote["CSS"].get("transform")
+                if not image_path:
+                    continue
+                if offset:
+                    x_offset = - offset[0]
+                    y_offset = - offset[1]
+                if size:
+                    x_size = size[0]
+                    y_size = size[1]
+                if css_transform:
+                    flip = True  # this is real dumb right now, but later i hope to actually parse and see if there is any interesting transform affects on emotes, but for now xScale seems to be the most common.
+                tags[subreddit][name] = None
+                for tag in jtagdata.get(key) or ():
+                    tags.setdefault(tag, {})[name] = None
+                    if tag == "+nsfw":
+                        is_nsfw = True
+                if name not in index.emotes:
+                    index.emotes[name] = Eemote(name, "https://" + image_path.split('//')[1], x_offset, y_offset,
+                                                x_size, y_size, flip, is_nsfw)
+                    index.names.append(name)
+        index.tags = {tag: tuple(names) for tag, names in tags.items()}
+        index.fuzzy_names = FuzzyIndex(index.names)
+        index.fuzzy_tags = FuzzyIndex(index.tags)
+        return index
+
+    def add(self, emote, tags):
+        """
+        Adds an emote that was created with ponyadd. The JSON files have been changed too, so the cache file will be
+        rebuilt the next time the bot starts.
+        """
+        self.emotes[emote.name] = emote
+        self.names.append(emote.name)
+        self.fuzzy_names.add(emote.name)
+        for tag in tags:
+            if tag not in self.tags:
+                self.fuzzy_tags.add(tag)
+            if emote.name not in self.tags.get(tag, ()):
+                self.tags[tag] = self.tags.get(tag, ()) + (emote.name,)
+                self.__tag_sets.pop(tag, None)
+
+    def with_tags(self, tags):
+        """
+        :param tags: A list of tags (or subreddits).
+        :return: Returns a list of the names of all emotes that have all of the tags.
+        """
+        sets = list()
+        for tag in tags:
+            names = self.__tag_sets.get(tag, None)
+            if names is None:
+                names = self.__tag_sets[tag] = frozenset(self.tags.get(tag, ()))
+            sets.append(names)
+        if len(sets) == 0:
+            return list()
+        sets.sort(key=len)
+        return list(sets[0].intersection(*sets[1:]))
+
+    @staticmethod
+    def __sources(infodb_path, tagdb_path):
+        # The cache is valid as long as none of these changed
+        sources = list()
+        for path in (infodb_path, tagdb_path):
+            for f in sorted(listdir(path)):
+                stat = os.stat(join(path, f))
+                sources.append((join(path, f), stat.st_mtime_ns, stat.st_size))
+        return sources
+
+    @classmethod
+    def __load_cache(cls, cache_file, sources):
+        try:
+            with open(cache_file, 'rb') as f:
+                version, cached_sources, emotes, tags, fuzzy_names, fuzzy_tags = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError):
+            return None
+        if not version == cls.CACHE_VERSION or not cached_sources == sources:
+            return None
+        index = cls()
+        index.emotes = {x[0]: Eemote(*x) for x in emotes}
+        index.names = [x[0] for x in emotes]
+        index.tags = tags
+        index.fuzzy_names = FuzzyIndex.from_state(index.names, fuzzy_names)
+        index.fuzzy_tags = FuzzyIndex.from_state(tags, fuzzy_tags)
+        return index
+
+    def __save_cache(self, cache_file, sources):
+        # The emote names in tags are the same objects as in emotes, pickle only stores them once
+        data = (self.CACHE_VERSION, sources, [self.emotes[name].as_tuple() for name in self.names], self.tags,
+                self.fuzzy_names.state(), self.fuzzy_tags.state())
+        if not os.path.isdir(dirname(cache_file)):
+            os.makedirs(dirname(cache_file))
+        with open(cache_file + '.tmp', 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(cache_file + '.tmp', cache_file)
+
+
+# The index is shared by all servers. It is loaded in a worker thread the first time an emote is requested.
+_emote_index = None
+_emote_index_future = None
+
+
+async def get_emote_index(cache_file):
+    global _emote_index, _emote_index_future
+    if _emote_index is not None:
+        return _emote_index
+    if _emote_index_future is None:
+        _emote_index_future = asyncio.get_event_loop().run_in_executor(
+            None, EmoteIndex.load, INFODB_PATH, TAGDB_PATH, cache_file)
+    try:
+        _emote_index = await asyncio.shield(_emote_index_future)
+    except:
+        _emote_index_future = None
+        raise
+    return _emote_index
+
 
 class Emotes(glados.Module):
+    scope = glados.Module.PROCESS
+
     def __init__(self, server_instance, full_name):
         super(Emotes, self).__init__(server_instance, full_name)
 
-        this_dir = dirname(realpath(__file__))
-        self.emotes_path = join(this_dir, 'emotesdb')
-        self.infodb_path = join(this_dir, 'emote_info_db')
-        self.tagdb_path = join(this_dir, 'emote_tag_db')
+        self.emotes_path = join(THIS_DIR, 'emotesdb')
+        self.infodb_path = INFODB_PATH
+        self.tagdb_path = TAGDB_PATH
         self.custom_emote_filename = 'ponybot.json'
-        self.tag_list = {}
-        self.emote_list = {}
-        self.raw_emote_list = []
-        self.is_running = True
+        self.index_cache_file = join(self.global_data_dir, 'emotes', 'index.pickle')
         self.build_dir(join(self.emotes_path, "tmp"))
-        self.blacklist = {}
-        self.allow_nsfw = False
-        self.config_path = join(self.local_data_dir, "emotes.json")
-        self.load_blacklist()
-
-        asyncio.ensure_future(self.build_emote_db())
 
-    def load_blacklist(self):
-        if isfile(self.config_path):
-            self.blacklist = json.loads(open(self.config_path).read())
+    @property
+    def db(self):
+        # The emotes themselves are shared by all servers, only these settings are per server
+        db = self.store('emotes.json')
+        if 'blacklist' not in db:
+            # Used to be the blacklist only
+            blacklist = dict(db)
+            db.clear()
+            db['blacklist'] = blacklist
+        if 'allow nsfw' not in db:
+            db['allow nsfw'] = False
+        return db
+
+    @property
+    def blacklist(self):
+        return self.db['blacklist']
+
+    async def emote_index(self):
+        return await get_emote_index(self.index_cache_file)
 
     @staticmethod
     def build_dir(path):
@@ -58,13 +320,6 @@ class Emotes(glados.Module):
                 return False
         return True
 
-    def save_blacklist(self):
-        if not self.build_dir(self.config_path):
-            return
-        f = open(self.config_path, "w")
-        if f:
-            f.write(json.dumps(self.blacklist))
-
     def save_target_image(self, source, name, x_offset, y_offset, x_size, y_size, flip, convert):
         m_img = Image.open(source)
         if x_size!=0 and y_size!=0:
@@ -81,13 +336,26 @@ class Emotes(glados.Module):
         else:
             m_img.save(join(self.emotes_path, name) + ".png", optimize=True)
 
-    def sanitize_name(self, name):
-        # we use replace to strip any symbols that'd allow file naviagation.
-        return name.replace('/', '').replace('\\', '').replace('.', '')
+    @staticmethod
+    def sanitize_name(name):
+        return sanitize_name(name)
 
-    def build_emote(self, name, image_path, x_offset, y_offset, x_size, y_size, flip, convert):
+    async def build_emote(self, name, image_path, x_offset, y_offset, x_size, y_size, flip, convert):
         # print("Emote: '" + name + "' Img: " + ImagePath + " o: " + str(xOffset) + " " + str(yOffset) + " s: " + str(xSize) + " " + str(ySize))
         name_base = name + ".tmp"
+        try:
+            await self.http.download(image_path, name_base)
+        except Exception as e:
+            print("Error downloading emote: " + name)
+            print(e)
+            return False
+
+        # Image conversion is CPU bound, don't do it on the event loop
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.convert_emote, name, name_base, image_path, x_offset, y_offset,
+                                          x_size, y_size, flip, convert)
+
+    def convert_emote(self, name, name_base, image_path, x_offset, y_offset, x_size, y_size, flip, convert):
         frame_cnt = 1
         transform = APNGLib.TransformNoGif1Frame
         if x_size != 0 and y_size != 0:
@@ -95,7 +363,6 @@ class Emotes(glados.Module):
         if flip is True:
             transform |= APNGLib.TransformFlipHorizontal
         try:
-            urllib.request.urlretrieve(image_path, name_base)
             if os.path.splitext(image_path)[1]==".png":
                 frame_cnt = APNGLib.MakeGIF(name_base, join(self.emotes_path, name) + ".gif", transform, x_offset, y_offset,
                                         x_size, y_size)
@@ -127,70 +394,50 @@ class Emotes(glados.Module):
                 time.sleep(1)
         return True
 
-    async def build_emote_db(self):
-        self.tag_list = {}
-        self.emote_list = {}
-        self.raw_emote_list = []
-        files = [f for f in listdir(self.infodb_path) if isfile(join(self.infodb_path,f))]
-        for f in files:
-            subreddit = os.path.splitext(f)[0]
-            jinfo_file = open(join(self.infodb_path,f))
-            jtag_file = open(join(self.tagdb_path,f))
-            jinfodata = json.loads(jinfo_file.read())
-            jtagdata = json.loads(jtag_file.read())
-            jinfo_file.close()
-            jtag_file.close()
-            self.tag_list[subreddit] = {}
-            for key, items in jinfodata.items():
-                name = self.sanitize_name(key[1:])
-                emote = items.get("Emotes")
-                if not emote: continue
-                emote = emote.get("")
-                if not emote: continue
-                image_path = emote.get("Image")
-                offset = emote.get("Offset")
-                size = emote.get("Size")
-                is_nsfw = False
-                flip = False
-                x_offset = 0
-                y_offset = 0
-                x_size = 0
-                y_size = 0
-                css_transform = None
-                if (emote.get("CSS")): css_transform = emote["CSS"].get("transform")
-                if not image_path:
-                    continue
-                if offset:
-                    x_offset = - offset[0]
-                    y_offset = - offset[1]
-                if size:
-                    x_size = size[0]
-                    y_size = size[1]
-                if css_transform:
-                    flip = True  # this is real dumb right now, but later i hope to actually parse and see if there is any interesting transform affects on emotes, but for now xScale seems to be the most common.
-                self.tag_list[subreddit][name] = ""
-                tags = jtagdata.get(key)
-                if tags:
-                    for tag in tags:
-                        if not self.tag_list.get(tag):
-                            self.tag_list[tag] = {}
-                        self.tag_list[tag][name] = ""
-                        if tag == "+nsfw":
-                            is_nsfw = True
-                if not self.emote_list.get(name):
-                    self.emote_list[name] = Eemote(name, "https://" + image_path.split('//')[1], x_offset, y_offset,
-                                                   x_size, y_size, flip, is_nsfw)
-                    self.raw_emote_list.append(name)
-                await asyncio.sleep(0)
-        self.is_running = False
-        print("Finished building emote db.")
-
-    def spellcheck_emote_name(self, emote):
-        r = difflib.get_close_matches(emote, self.raw_emote_list, 1, 0.2)
+    @staticmethod
+    def spellcheck_emote_name(index, emote):
+        r = index.fuzzy_names.suggest(emote, 1, 0.2)
         if len(r) > 0:
             return r[0]
         return ""
 
+    async def __find_emote(self, message, content):
+        """
+        :return: Returns the Eemote with the specified name, or None if there is no such emote (in which case the user
+        has been told so).
+        """
+        index = await self.emote_index()
+        emote = index.emotes.get(content)
+        if not emote:
+            name = self.spellcheck_emote_name(index, content)
+            if name:
+                await self.client.send_message(message.channel, 'Unknown emoticon (did you mean: ' + name + "?)")
+            else:
+                await self.client.send_message(message.channel, 'Unknown emoticon.')
+        return emote
+
+    async def __random_emote_with_tags(self, message, tags):
+        """
+        :return: Returns a random Eemote that has all of the tags and may be shown on this server, or None (in which
+        case the user has been told why).
+        """
+        index = await self.emote_index()
+        for tag in tags:
+            if tag not in index.tags:
+                r = index.fuzzy_tags.suggest(tag, 1, 0.2)
+                if r:
+                    await self.client.send_message(message.channel, 'Unknown tag (did you mean: ' + r[0] + "?)")
+                else:
+                    await self.client.send_message(message.channel, 'Unknown tag.')
+                return None
+
+        names = [name for name in index.with_tags(tags) if not self.blacklist.get(name) and
+                 (self.db['allow nsfw'] or not index.emotes[name].is_nsfw)]
+        if len(names) == 0:
+            await self.client.send_message(message.channel, 'No emote has all of these tags.')
+            return None
+        return index.emotes[random.choice(names)]
+
     def find_emote_path(self, emotename):
         path = join(self.emotes_path, self.sanitize_name(emotename))
         if isfile(path + ".png"):
@@ -199,34 +446,32 @@ class Emotes(glados.Module):
             return path + ".gif"
         return ""
 
-    @glados.Module.command('pony', '<emote>', 'Shows a pony with the specified emotion. Search '
-                           'https://ponymotes.net/view/ to find an emote or use ponylist command (note: not all emotes '
-                           'are supported)')
+    @glados.Module.command('pony', '<emote|+tag [+tag...]>', 'Shows a pony with the specified emotion, or a random '
+                           'one with all of the specified tags (e.g. +twilight). Search https://ponymotes.net/view/ to '
+                           'find an emote or use ponylist command (note: not all emotes are supported)')
     async def request_pony_emote(self, message, content):
 
         if not content:
             await self.provide_help('pony', message)
             return
 
-        emote = self.emote_list.get(content)
+        if content.startswith('+'):
+            emote = await self.__random_emote_with_tags(message, content.split())
+        else:
+            emote = await self.__find_emote(message, content)
         if not emote:
-            name = self.spellcheck_emote_name(content)
-            if name:
-                await self.client.send_message(message.channel, 'Unknown emoticon (did you mean: ' + name + "?)")
-            else:
-                await self.client.send_message(message.channel, 'Unknown emoticon.')
             return
 
         if self.blacklist.get(emote.name):
             await self.client.send_message(message.channel, 'Emote is blacklisted on this server.')
             return
-        if not self.allow_nsfw and emote.is_nsfw:
+        if not self.db['allow nsfw'] and emote.is_nsfw:
             await self.client.send_message(message.channel, 'Emote is tagged as nsfw.')
             return
 
         path = self.find_emote_path(emote.name)
         if not path:
-            if not self.build_emote(emote.name, emote.image_path, emote.x_offset, emote.y_offset, emote.x_size, emote.y_size,
+            if not await self.build_emote(emote.name, emote.image_path, emote.x_offset, emote.y_offset, emote.x_size, emote.y_size,
                              emote.flip, True):
                 await self.client.send_message(message.channel, "Emote doesn't work")
                 return
@@ -237,35 +482,22 @@ class Emotes(glados.Module):
     @glados.Module.command('ponydel', '<emote>', 'blacklists the specified pony emote from the database for that '
                            'server, only a mod or admin can run this command.')
     async def delete_pony_emote(self, message, content):
-        emote = self.emote_list.get(content)
+        emote = await self.__find_emote(message, content)
         if not emote:
-            name = self.spellcheck_emote_name(content)
-            if name:
-                await self.client.send_message(message.channel, 'Unknown emoticon (did you mean: ' + name + "?)")
-            else:
-                await self.client.send_message(message.channel, 'Unknown emoticon.')
             return
 
         self.blacklist[emote.name] = 1
-
-        self.save_blacklist()
         await self.client.send_message(message.channel, 'blacklisted emote.')
 
     @glados.Permissions.admin
     @glados.Module.command('ponyundel', '<emote>', 'unblacklists the specified pony emote from the database for that '
                            'server, only a mod or admin can run this command.')
     async def undelete_pony_emote(self, message, content):
-        emote = self.emote_list.get(content)
+        emote = await self.__find_emote(message, content)
         if not emote:
-            name = self.spellcheck_emote_name(content)
-            if name:
-                await self.client.send_message(message.channel, 'Unknown emoticon (did you mean: ' + name + "?)")
-            else:
-                await self.client.send_message(message.channel, 'Unknown emoticon.')
             return
 
         self.blacklist.pop(emote.name, None)
-        self.save_blacklist()
         await self.client.send_message(message.channel, 'removed emote from blacklist.')
 
     @glados.Permissions.admin
@@ -276,8 +508,7 @@ class Emotes(glados.Module):
             await self.provide_help('ponynsfw', message)
             return
         enable = content == "enable"
-        self.allow_nsfw = enable
-        self.save_blacklist()
+        self.db['allow nsfw'] = enable
         if enable:
             await self.client.send_message(message.channel, 'nsfw emotes have been enabled.')
         else:
@@ -293,12 +524,13 @@ class Emotes(glados.Module):
             return await self.provide_help('ponyadd', message)
 
         name = self.sanitize_name(csplit[0])
-        emote = self.emote_list.get(csplit[0])
+        index = await self.emote_index()
+        emote = index.emotes.get(csplit[0])
         is_nsfw = False
         if emote:
             return await self.client.send_message(message.channel, 'emote name is already in use.')
 
-        if not self.build_emote(name, csplit[1], 0, 0, 0, 0, False, False):
+        if not await self.build_emote(name, csplit[1], 0, 0, 0, 0, False, False):
             return await self.client.send_message(message.channel, 'Failed to create emote.')
 
         #append new emote into our bot's json file.
@@ -318,9 +550,6 @@ class Emotes(glados.Module):
                 continue
             if tag[0]!='+':
                 tag = '+' + tag
-            if not self.tag_list.get(tag):
-                self.tag_list[tag] = {}
-            self.tag_list[tag][name] = ""
             if tag == "+nsfw":
                 is_nsfw = True
             jtagdata['/'+name].append(tag)
@@ -331,8 +560,8 @@ class Emotes(glados.Module):
         jinfo_file.close()
         jtag_file.close()
         #add emote to existing db.
-        self.emote_list[name] = Eemote(name, csplit[1], 0, 0, 0, 0, False, is_nsfw)
-        self.raw_emote_list.append(name)
+        subreddit = os.path.splitext(self.custom_emote_filename)[0]
+        index.add(Eemote(name, csplit[1], 0, 0, 0, 0, False, is_nsfw), [subreddit] + jtagdata['/'+name])
         return await self.client.send_message(message.channel, 'Added '+name+' to emote list.')
 
     @glados.Module.command('ponylist', '[subreddit | tags]', "pm's you a list of emotes in the specefied subreddits, "
@@ -342,9 +571,10 @@ class Emotes(glados.Module):
         temp = ""
         per_line = 25
         i = 0
+        index = await self.emote_index()
         if not content:
             response.append("List of available tags to search through:")
-            for key, items in self.tag_list.items():
+            for key in index.tags:
                 if i == 0:
                     temp = key
                 else:
@@ -359,10 +589,10 @@ class Emotes(glados.Module):
             tags = content.split()
             response.append("List of emotes which have any of the tags: " + content + "")
             for t in tags:
-                tag_list = self.tag_list.get(t)
+                tag_list = index.tags.get(t)
                 if not tag_list:
                     continue
-                for key, items in tag_list.items():
+                for key in tag_list:
                     if i == 0:
                         temp = key
                     else:
@@ -1,13 +1,16 @@
 import glados
 import os
 from os import listdir
-from os.path import isfile, dirname, realpath, join
+from os.path import isfile, isdir, join
 import asyncio
+import concurrent.futures
+import hashlib
 import json
-import urllib.request
+import shutil
+from urllib.parse import urlsplit, unquote
 from PIL import Image
 import APNGLib
-import time
+from modules.mlp.emotes import THIS_DIR, INFODB_PATH, sanitize_name
 
 
 class Eemote:
@@ -20,170 +23,288 @@ class Eemote:
         self.y_size = y_size
         self.flip = flip
 
+    def params(self):
+        # Everything that changes the resulting image, apart from the source sheet itself
+        return [self.x_offset, self.y_offset, self.x_size, self.y_size, self.flip]
 
-class BuildEmotes(glados.Module):
-    def __init__(self, server_instance, full_name):
-        super(BuildEmotes, self).__init__(server_instance, full_name)
 
-        this_dir = dirname(realpath(__file__))
-        self.emotedb_path = join(this_dir, 'emotesdb')
-        self.configdb_path = join(this_dir, 'emote_info_db')
-        self.worker_threads = 16
-        self.building_db = ""
-        self.is_running = False
-        self.build_dir(join(self.emotedb_path, 'tmp'))
+def read_emote_db(path):
+    """
+    :param path: One of the JSON files in emote_info_db.
+    :return: Returns a list of the Eemotes in the file.
+    """
+    with open(path) as json_file:
+        jdata = json.loads(json_file.read())
+    emotes = list()
+    for key, items in jdata.items():
+        name = sanitize_name(key[1:])
+        emote = items.get("Emotes")
+        if not emote: continue
+        emote = emote.get("")
+        if not emote: continue
+        image_path = emote.get("Image")
+        offset = emote.get("Offset")
+        size = emote.get("Size")
+        css_transform = None
+        if (emote.get("CSS")): css_transform = emote["CSS"].get("transform")
+        flip = False
+        x_offset = 0
+        y_offset = 0
+        x_size = 0
+        y_size = 0
+        if not image_path:
+            continue
+        if offset:
+            x_offset = - offset[0]
+            y_offset = - offset[1]
+        if size:
+            x_size = size[0]
+            y_size = size[1]
+        if css_transform:
+            flip = True  # this is real dumb right now, but later i hope to actually parse and see if there is any interesting transform affects on emotes, but for now xScale seems to be the most common.
+        emotes.append(Eemote(name, "https://" + image_path.split('//')[1], x_offset, y_offset, x_size, y_size, flip))
+    return emotes
+
+
+def save_target_image(source, target, x_offset, y_offset, x_size, y_size, flip, convert):
+    m_img = Image.open(source)
+    if x_size!=0 and y_size!=0:
+        m_img = m_img.crop((x_offset, y_offset, x_offset + x_size, y_offset + y_size))
+    if flip is True:
+        m_img = m_img.transpose(Image.FLIP_LEFT_RIGHT)
+    if convert is True:
+        m_img.load()
+        alpha = m_img.split()[- 1]
+        m_img = m_img.convert('RGB').convert('P', palette=Image.ADAPTIVE, colors=255)
+        mask = Image.eval(alpha, lambda a: 255 if a <= 128 else 0)
+        m_img.paste(255, mask)
+        m_img.save(target + ".png", transparency=255, optimize=True)
+    else:
+        m_img.save(target + ".png", optimize=True)
+
+
+def convert_emote(source, target, x_offset, y_offset, x_size, y_size, flip):
+    """
+    Cuts an emote out of a sprite sheet. Runs in a worker process of the EmoteBuilder, so it has to be a plain function.
+    :param source: The downloaded sprite sheet.
+    :param target: Path of the emote without extension.
+    :return: Returns the file name of the emote, which is the target with .gif (if the emote is animated) or .png.
+    """
+    transform = APNGLib.TransformNoGif1Frame
+    if x_size !=0 and y_size !=0:
+        transform |= APNGLib.TransformCrop
+    if flip is True:
+        transform |= APNGLib.TransformFlipHorizontal
+    try:
+        frame_cnt = APNGLib.MakeGIF(source, target + ".gif", transform, x_offset, y_offset, x_size, y_size)
+        if frame_cnt != 1:
+            return target + ".gif"
+        # we tell the function the  not to save if there is only 1 frame, so we can save it as a png instead.
+        save_target_image(source, target, x_offset, y_offset, x_size, y_size, flip, True)
+    except Exception as e:
+        if str(e) != "bad transparency mask":
+            raise
+        # save as regular file instead.
+        save_target_image(source, target, x_offset, y_offset, x_size, y_size, flip, False)
+    return target + ".png"
+
+
+class EmoteBuilder(object):
+    """
+    Builds the images of emotes from their sprite sheets. Many emotes share the same sheet, so every sheet is only
+    downloaded once, into a cache folder where it's named after the hash of its URL. Downloads run concurrently, the
+    images are cut out in a pool of worker processes. Every emote that was built is written to a manifest, and emotes
+    whose entry is still up to date are skipped, so an interrupted build picks up where it left off.
+    """
+
+    MANIFEST_SAVE_INTERVAL = 100  # number of built emotes after which the manifest is written
 
-    def build_dir(self, path):
+    def __init__(self, http, out_path, sheets_path, downloads=8, workers=None):
+        """
+        :param http: The bot's HTTPClient.
+        :param out_path: Folder the emote images are saved to. The manifest is kept there too.
+        :param sheets_path: Folder the downloaded sprite sheets are kept in.
+        :param downloads: Maximum number of simultaneous downloads.
+        :param workers: Number of worker processes. Defaults to the number of CPUs.
+        """
+        self.http = http
+        self.out_path = out_path
+        self.sheets_path = sheets_path
+        self.workers = workers
+        self.manifest_file = join(out_path, 'manifest.json')
+        self.downloaded = 0
+        self.built = 0
+        self.skipped = 0
+        self.failed = 0
+        self.__download_semaphore = asyncio.Semaphore(downloads)
+        self.__sheets = dict()  # URL -> future of the file name of the downloaded sheet
+        self.__manifest = self.__load_manifest()
+        self.__unsaved = 0
+
+    @staticmethod
+    def url_hash(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    async def build(self, emotes):
+        """
+        Builds all of the emotes that aren't up to date yet.
+        :param emotes: A list of Eemotes.
+        """
+        for path in (self.out_path, self.sheets_path):
+            if not isdir(path):
+                os.makedirs(path)
+
+        todo = [e for e in emotes if not self.is_up_to_date(e)]
+        self.skipped += len(emotes) - len(todo)
+        if len(todo) == 0:
+            return
+
+        pool = concurrent.futures.ProcessPoolExecutor(self.workers)
         try:
-            os.makedirs(os.path.dirname(path))
-        except Exception as E:
-            if "File exists" not in str(E):
-                print(E)
-                return False
-        return True
-
-    def save_target_image(self, source, name, x_offset, y_offset, x_size, y_size, flip, convert):
-        m_img = Image.open(source)
-        if x_size!=0 and y_size!=0:
-            m_img = m_img.crop((x_offset, y_offset, x_offset + x_size, y_offset + y_size))
-        if flip is True:
-            m_img = m_img.transpose(Image.FLIP_LEFT_RIGHT)
-        if convert is True:
-            m_img.load()
-            alpha = m_img.split()[- 1]
-            m_img = m_img.convert('RGB').convert('P', palette=Image.ADAPTIVE, colors=255)
-            mask = Image.eval(alpha, lambda a: 255 if a <= 128 else 0)
-            m_img.paste(255, mask)
-            m_img.save(join(self.emotedb_path, name) + ".png", transparency=255, optimize=True)
-        else:
-            m_img.save(join(self.emotedb_path, name) + ".png", optimize=True)
-
-    def build_emote(self, name, image_path, x_offset, y_offset, x_size, y_size, flip):
-        #print("Emote: '" + name + "' Img: " + ImagePath + " o: " + str(xOffset) + " " + str(yOffset) + " s: " + str(xSize) + " " + str(ySize))
-        name_base = name + ".tmp"
-        frame_cnt = 1
-        transform = APNGLib.TransformNoGif1Frame
-        if x_size !=0 and y_size !=0:
-            transform |= APNGLib.TransformCrop
-        if flip is True:
-            transform |= APNGLib.TransformFlipHorizontal
+            await asyncio.gather(*(self.__build_emote(pool, e) for e in todo))
+        finally:
+            pool.shutdown(wait=False)
+            self.__save_manifest()
+
+    def is_up_to_date(self, emote):
+        entry = self.__manifest.get(emote.name, None)
+        return entry is not None and entry['source'] == self.url_hash(emote.image_path) and \
+            entry['params'] == emote.params() and isfile(join(self.out_path, entry['file']))
+
+    async def __build_emote(self, pool, emote):
         try:
-            urllib.request.urlretrieve(image_path, name_base)
-            frame_cnt = APNGLib.MakeGIF(name_base, join(self.emotedb_path,name) + ".gif", transform, x_offset, y_offset,
-                                        x_size, y_size)
-            if (frame_cnt == 1):
-                # we tell the function the  not to save if there is only 1 frame, so we can save it as a png instead.
-                self.save_target_image(name_base, name, x_offset, y_offset, x_size, y_size, flip, True)
+            sheet = await self.__fetch_sheet(emote.image_path)
+        except Exception as e:
+            self.failed += 1
+            print("Error downloading emote: " + emote.name)
+            print(e)
+            return
 
+        loop = asyncio.get_event_loop()
+        try:
+            file_name = await loop.run_in_executor(pool, convert_emote, sheet, join(self.out_path, emote.name),
+                                                   emote.x_offset, emote.y_offset, emote.x_size, emote.y_size,
+                                                   emote.flip)
         except Exception as e:
-            if (str(e) == "bad transparency mask"):
-                try:
-                    # save as regular file instead.
-                    self.save_target_image(name_base, name, x_offset, y_offset, x_size, y_size, flip, False)
-                except Exception as e2:
-                    print("Error2 processing emote: " + name)
-                    print(e2)
+            self.failed += 1
+            print("Error processing emote: " + emote.name)
+            print(e)
+            return
+
+        self.built += 1
+        self.__manifest[emote.name] = {
+            'source': self.url_hash(emote.image_path),
+            'params': emote.params(),
+            'file': os.path.basename(file_name)
+        }
+        self.__unsaved += 1
+        if self.__unsaved >= self.MANIFEST_SAVE_INTERVAL:
+            self.__save_manifest()
+
+    async def __fetch_sheet(self, url):
+        # All emotes waiting for the same sheet share one download
+        future = self.__sheets.get(url, None)
+        if future is None:
+            future = self.__sheets[url] = asyncio.ensure_future(self.__download_sheet(url))
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            if self.__sheets.get(url, None) is future:
+                del self.__sheets[url]
+            raise
 
+    async def __download_sheet(self, url):
+        file_name = join(self.sheets_path, self.url_hash(url) + os.path.splitext(urlsplit(url).path)[1])
+        if isfile(file_name):
+            return file_name
+
+        # Download into a temporary file, so an interrupted download never ends up in the cache
+        async with self.__download_semaphore:
+            parts = urlsplit(url)
+            if parts.scheme == 'file':
+                await asyncio.get_event_loop().run_in_executor(None, shutil.copyfile, unquote(parts.path),
+                                                               file_name + '.tmp')
             else:
-                print("Error processing emote: " + name)
-                print(e)
+                await self.http.download(url, file_name + '.tmp')
+        os.replace(file_name + '.tmp', file_name)
+        self.downloaded += 1
+        return file_name
+
+    def __load_manifest(self):
+        try:
+            with open(self.manifest_file) as f:
+                return json.loads(f.read())
+        except (OSError, ValueError):
+            return dict()
+
+    def __save_manifest(self):
+        self.__unsaved = 0
+        if not isdir(self.out_path):
+            return
+        with open(self.manifest_file + '.tmp', 'w') as f:
+            f.write(json.dumps(self.__manifest))
+        os.replace(self.manifest_file + '.tmp', self.manifest_file)
 
-        for i in range(0, 3):  # retry a few times in case failure is due to the os hasn't given up a handle right away.
-            try:
-                os.remove(name_base)
-                break
-            except:
-                time.sleep(1)
 
-    def build_emote_db(self, data_set):
-        for e in data_set:
-            self.build_emote(e.name, e.image_path, e.x_offset, e.y_offset, e.x_size, e.y_size, e.flip)
+# The emotes are shared by all servers, so only one build may run at a time
+_building_db = None
 
-    async def build_db(self, db_name):
-        data_set = []
-        for i in range(0, self.worker_threads):
-            data_set.append([])
 
+class BuildEmotes(glados.Module):
+    def __init__(self, server_instance, full_name):
+        super(BuildEmotes, self).__init__(server_instance, full_name)
+
+        self.emotedb_path = join(THIS_DIR, 'emotesdb')
+        self.configdb_path = INFODB_PATH
+        self.sheets_path = join(self.global_data_dir, 'emotes', 'sheets')
+        config = self.settings.setdefault('emotes builder', {})
+        config.setdefault('downloads', 8)
+        config.setdefault('workers', os.cpu_count() or 1)
+
+    async def build_db(self, builder, db_name):
+        global _building_db
         path = join(self.configdb_path, db_name) + ".json"
         if not isfile(path):
             print("Unknown db: " + db_name)
             return
-        self.building_db = db_name
+        _building_db = db_name
         print("Building db: " + db_name)
-        json_file = open(path)
-        jdata = json.loads(json_file.read())
-        json_file.close()
-        i = 0
-        for key, items in jdata.items():
-            # strip out any symbols from the name that'd allow file pathing.
-            name = key[1:].replace('/', '').replace('\\', '').replace('.', '')
-            emote = items.get("Emotes")
-            if not emote: continue
-            emote = emote.get("")
-            if not emote: continue
-            image_path = emote.get("Image")
-            offset = emote.get("Offset")
-            size = emote.get("Size")
-            css_transform = None
-            if (emote.get("CSS")): css_transform = emote["CSS"].get("transform")
-            flip = False
-            x_offset = 0
-            y_offset = 0
-            x_size = 0
-            y_size = 0
-            if not image_path:
-                continue
-            if offset:
-                x_offset = - offset[0]
-                y_offset = - offset[1]
-            if size:
-                x_size = size[0]
-                y_size = size[1]
-            if css_transform:
-                flip = True  # this is real dumb right now, but later i hope to actually parse and see if there is any interesting transform affects on emotes, but for now xScale seems to be the most common.
-            data_set[i].append(
-                Eemote(name, "https://" + image_path.split('//')[1], x_offset, y_offset, x_size, y_size, flip))
-            i = (i + 1) % self.worker_threads
-            await asyncio.sleep(0)
-        loop = asyncio.get_event_loop()
-        tasks = []
-        for d in data_set:
-            tasks.append(loop.run_in_executor(None, self.build_emote_db, d))
-        for t in tasks:
-            await t
+        emotes = await asyncio.get_event_loop().run_in_executor(None, read_emote_db, path)
+        await builder.build(emotes)
         print("Finished building: " + db_name)
-        return
 
     async def run_thread(self, content):
-        self.is_running = True
+        global _building_db
+        config = self.settings['emotes builder']
+        builder = EmoteBuilder(self.http, self.emotedb_path, self.sheets_path, config['downloads'], config['workers'])
         try:
             if not content:
-                files = [f for f in listdir(self.configdb_path) if isfile(join(self.configdb_path, f))]
-                for f in files:
-                    await self.build_db(os.path.splitext(f)[0])
-                self.is_running = False
-                print("Finished thread!")
-                return
-            databases = content.split(' ')
+                databases = [os.path.splitext(f)[0] for f in sorted(listdir(self.configdb_path))
+                             if isfile(join(self.configdb_path, f))]
+            else:
+                databases = content.split(' ')
             for db in databases:
-                await self.build_db(db)
+                await self.build_db(builder, db)
         except Exception as e:
             print("Exception during thread: ")
             print(e)
-        self.is_running = False
-        print("Finished thread!")
-        return
+        finally:
+            _building_db = None
+        print("Finished thread! Built {}, skipped {} up to date, {} failed, downloaded {} sheets".format(
+            builder.built, builder.skipped, builder.failed, builder.downloaded))
 
     @glados.Permissions.admin
     @glados.Module.command('ponybuild', '[db] [db...]', 'Admin only usable, use to rebuild the '
                            'entire pony emote cache db, or only a partial db specefied by Opetiondb(i.e: mylittlepony only '
                            'builds for the mylittlepony.json db)')
     async def build_ponydb(self, message, content):
-        # since this is a long process, we will spawn a thread to do the work in to not tie of the bot.
-        if self.is_running is True:
-            await self.client.send_message(message.channel, "Database is currently building: " + self.building_db)
+        # since this is a long process, we run it in the background to not tie up the bot.
+        global _building_db
+        if _building_db is not None:
+            await self.client.send_message(message.channel, "Database is currently building: " + _building_db)
             return
         await self.client.send_message(message.channel, 'Building pony database...this may take awhile.')
 
+        _building_db = ''
         asyncio.ensure_future(self.run_thread(content))
         return
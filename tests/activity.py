@@ -0,0 +1,71 @@
+# Crude load test, intended to be run from CLI at repository root
+# Fires batches of concurrent requests at the /activity/getimg endpoint of the Activity module with a year of made up
+# chat logs.
+# Every round uses a new cache date, so all figures have to be rendered again, followed by a round that should be
+# served from the figure cache. Prints the latency of each round and the resident memory of the bot process and the
+# render processes, which should stay flat from round to round.
+import asyncio
+import os
+import random
+import tempfile
+import time
+from lzma import LZMAFile
+from types import SimpleNamespace
+
+from quart import Quart
+
+from modules.general.activity import Activity, get_render_pool
+
+AUTHORS = 16
+ROUNDS = 5
+DAYS = 365
+
+
+def rss_mb(pid='self'):
+    with open('/proc/{}/statm'.format(pid)) as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+
+
+def write_log(log_dir, day):
+    stamp = time.localtime(1483228800 + day * 86400)
+    file_name = os.path.join(log_dir, time.strftime('chanlog-%Y-%m-%d.txt.xz', stamp))
+    with LZMAFile(file_name, 'w') as f:
+        for i in range(200):
+            author = random.randrange(AUTHORS)
+            f.write('[{} {:02d}:00:00] Server(1234): #channel{}: user{}({}): {}\n'.format(
+                time.strftime('%Y-%m-%d', stamp), random.randint(0, 23), random.randrange(8), author, author,
+                random.choice(['hello', '.activity'])).encode('utf-8'))
+    return file_name, stamp
+
+
+async def main(tmp):
+    server_instance = SimpleNamespace(settings=dict(), server=SimpleNamespace(id='1234'), webapp=Quart(__name__),
+                                      http=None, local_data_dir=tmp, global_data_dir=tmp)
+    activity = Activity(server_instance, 'general.activity.Activity')
+    for day in range(DAYS):
+        activity.store.fold_log_file(*write_log(tmp, day))
+    activity.store.commit()
+    client = server_instance.webapp.test_client()
+    user_ids = [str(i) for i in range(AUTHORS)] + ['server']
+
+    async def get(user_id):
+        start = time.monotonic()
+        response = await client.get('/1234/activity/getimg', query_string={'userId': user_id})
+        assert response.status_code == 200
+        return time.monotonic() - start
+
+    for r in range(ROUNDS):
+        activity.store.date = '2018-01-{:02d}'.format(r + 1)
+        for name in ('rendered', 'cached'):
+            start = time.monotonic()
+            latencies = await asyncio.gather(*(get(user_id) for user_id in user_ids))
+            elapsed = time.monotonic() - start
+            workers = get_render_pool(activity.render_processes)._processes
+            print('round {} {:>8}: {} requests in {:.2f}s, max latency {:.2f}s, '
+                  'bot {:.0f} MB, render processes {:.0f} MB'.format(
+                      r + 1, name, len(user_ids), elapsed, max(latencies),
+                      rss_mb(), sum(rss_mb(pid) for pid in workers)))
+
+
+with tempfile.TemporaryDirectory() as tmp:
+    asyncio.get_event_loop().run_until_complete(main(tmp))
@@ -0,0 +1,185 @@
+# Crude benchmark file, intended to be run from CLI at repository root
+# Generates a year of made up chat logs, folds them into an ActivityStore and compares loading the store from disk
+# against loading the equivalent nested dict JSON cache (activity_cache.json.xz) older versions of the Activity module
+# kept, computed the way those versions did. Prints file sizes, load times and memory used, and the time it takes to
+# get the statistics of every author, and checks the store returns the same statistics as the old JSON cache.
+# Checks that folding one more day into a saved store gives the same statistics as folding every day at once.
+import math
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+from lzma import LZMAFile
+
+from glados.tools.json import load_json_compressed, save_json_compressed
+from modules.general.activity import ActivityStore, Message, get_commands_from_message, new_author_dict
+
+DAYS = 365
+MESSAGES_PER_DAY = 2000
+AUTHORS = 500
+CHANNELS = ['general', 'offtopic', 'art', 'music', 'games', 'bot']
+
+
+def write_logs(log_dir, first_day, days):
+    file_names = list()
+    for day in range(first_day, first_day + days):
+        stamp = time.localtime(1483228800 + day * 86400)
+        file_name = os.path.join(log_dir, time.strftime('chanlog-%Y-%m-%d.txt.xz', stamp))
+        with LZMAFile(file_name, 'w') as f:
+            for i in range(MESSAGES_PER_DAY):
+                # Favour some authors, so there are a few loud ones and lots of quiet ones
+                author = int(random.paretovariate(1.2)) % AUTHORS
+                f.write('[{} {:02d}:00:00] Server(1234): #{}: user{}({}): {}\n'.format(
+                    time.strftime('%Y-%m-%d', stamp), random.randint(0, 23), random.choice(CHANNELS), author,
+                    1000 + author, random.choice(['hello', '.activity', 'look at `.help`'])).encode('utf-8'))
+        file_names.append((file_name, stamp))
+    return file_names
+
+
+def old_cache(file_names):
+    """
+    The statistics the Activity module computed before there was an ActivityStore, copied from its reprocess_cache()
+    (minus the coroutine bits), so the store can be checked against it.
+    """
+    authors = dict()
+    total_days = dict()
+    for f, log_stamp in file_names:
+        for author in total_days:
+            total_days[author] += 1
+        for k, v in authors.items():
+            v['day_cycle_acc_day'].appendleft([0]*24)
+            v['day_cycle_acc_week'].appendleft([0]*24)
+            v['commands_acc'].appendleft(0)
+        try:
+            for line in LZMAFile(f, 'r'):
+                m = Message(line.decode('utf-8'))
+                if m.author_id not in authors:
+                    authors[m.author_id] = new_author_dict(m.author)
+                    authors[m.author_id]['userId'] = m.author_id
+                    authors[m.author_id]['day_cycle_acc'] = [0]*24
+                    authors[m.author_id]['day_cycle_acc_day'] = deque([[0]*24], maxlen=1)
+                    authors[m.author_id]['day_cycle_acc_week'] = deque([[0]*24], maxlen=7)
+                    authors[m.author_id]['commands_acc'] = deque([0], maxlen=7)
+                    total_days[m.author_id] = 1
+                a = authors[m.author_id]
+                a['messages_total'] += 1
+                command_count = len(get_commands_from_message(m.message))
+                a['commands_total'] += command_count
+                a['commands_acc'][0] += command_count
+                a['day_cycle_acc'][int(m.stamp.tm_hour)] += 1
+                a['day_cycle_acc_day'][0][int(m.stamp.tm_hour)] += 1
+                a['day_cycle_acc_week'][0][int(m.stamp.tm_hour)] += 1
+                a['channels'][m.channel] = a['channels'].get(m.channel, 0) + 1
+                key = time.mktime(log_stamp)
+                a['messages_per_day'][key] = a['messages_per_day'].get(key, 0) + 1
+        except:
+            continue
+
+    server_stats = new_author_dict('Server')
+
+    def sum_lists(a, b):
+        return [float(sum(x)) for x in zip(*[a, b])]
+    def add_dicts(a, b):
+        return {x: a.get(x, 0) + b.get(x, 0) for x in set(a).union(b)}
+
+    for author, a in authors.items():
+        for i, v in enumerate(a['day_cycle_acc']):
+            a['day_cycle_avg'][i] = float(v / total_days[author])
+        a['day_cycle_avg_week'] = [float(sum(x)/7.0) for x in zip(*a['day_cycle_acc_week'])]
+        a['day_cycle_avg_day'] = [float(x) for x in a['day_cycle_acc_day'][0]]
+        a['messages_last_week'] = int(sum(sum(x) for x in zip(*a['day_cycle_acc_week'])))
+        a['commands_last_week'] = int(sum(a['commands_acc']))
+        server_stats['messages_total'] += a['messages_total']
+        server_stats['messages_last_week'] += a['messages_last_week']
+        server_stats['commands_total'] += a['commands_total']
+        server_stats['day_cycle_avg'] = sum_lists(server_stats['day_cycle_avg'], a['day_cycle_avg'])
+        server_stats['day_cycle_avg_week'] = sum_lists(server_stats['day_cycle_avg_week'], a['day_cycle_avg_week'])
+        server_stats['day_cycle_avg_day'] = sum_lists(server_stats['day_cycle_avg_day'], a['day_cycle_avg_day'])
+        server_stats['channels'] = add_dicts(server_stats['channels'], a['channels'])
+        server_stats['messages_per_day'] = add_dicts(server_stats['messages_per_day'], a['messages_per_day'])
+        del a['day_cycle_acc']
+        del a['day_cycle_acc_day']
+        del a['day_cycle_acc_week']
+        del a['commands_acc']
+    return {'server': server_stats, 'authors': authors}
+
+
+def same_stats(a, b):
+    # The sums of the averages may be added up in a different order, so floats only have to be close
+    if isinstance(a, dict):
+        return isinstance(b, dict) and a.keys() == b.keys() and all(same_stats(a[k], b[k]) for k in a)
+    if isinstance(a, list):
+        return isinstance(b, list) and len(a) == len(b) and all(same_stats(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) or isinstance(b, float):
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+    return type(a) == type(b) and a == b
+
+
+def measure(name, func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('{:>24}: {:8.3f}s, {:6.1f} MB retained, {:6.1f} MB peak'.format(
+        name, elapsed, current / 1024 / 1024, peak / 1024 / 1024))
+    return result
+
+
+with tempfile.TemporaryDirectory() as tmp:
+    print('Generating {} days of logs with {} messages each...'.format(DAYS, MESSAGES_PER_DAY))
+    logs = write_logs(tmp, 0, DAYS)
+    store = ActivityStore()
+    start = time.perf_counter()
+    for file_name, stamp in logs:
+        store.fold_log_file(file_name, stamp)
+    store.commit()
+    store.date = '2018-01-01'
+    print('Folded logs in {:.2f}s'.format(time.perf_counter() - start))
+
+    store_file = os.path.join(tmp, 'activity.npz')
+    store.save(store_file)
+    author_ids = store.author_ids.tolist()
+    cache_file = os.path.join(tmp, 'activity_cache.json.xz')
+    start = time.perf_counter()
+    cache = old_cache(logs)
+    print('Computed old statistics in {:.2f}s'.format(time.perf_counter() - start))
+    cache['date'] = store.date
+    save_json_compressed(cache_file, cache)
+    print('{:>24}: {:8d} bytes'.format('activity_cache.json.xz', os.path.getsize(cache_file)))
+    print('{:>24}: {:8d} bytes'.format('activity.npz', os.path.getsize(store_file)))
+
+    cache = measure('load json cache', lambda: load_json_compressed(cache_file))
+    loaded = measure('load store', lambda: ActivityStore.load(store_file))
+    # getstats has to keep returning what it returned before, apart from the order of keys
+    assert same_stats(loaded.stats('server'), cache['server'])
+    assert sorted(author_ids) == sorted(cache['authors'])
+    for author_id in author_ids:
+        assert same_stats(loaded.stats(author_id), cache['authors'][author_id]), author_id
+    measure('stats of every author', lambda: [loaded.stats(author_id) for author_id in author_ids])
+    next_day = write_logs(tmp, DAYS, 1)[0]
+    measure('fold one more day', lambda: (loaded.fold_log_file(*next_day), loaded.commit()))
+
+    # Folding one more day into a store that was saved and loaded again, like the Activity module does every day, has
+    # to give the same statistics as folding all of the days in one go
+    check_logs = logs[:30]
+    incremental = ActivityStore()
+    for file_name, stamp in check_logs[:-1]:
+        incremental.fold_log_file(file_name, stamp)
+    incremental.commit()
+    check_file = os.path.join(tmp, 'incremental.npz')
+    incremental.save(check_file)
+    incremental = ActivityStore.load(check_file)
+    incremental.fold_log_file(*check_logs[-1])
+    incremental.commit()
+    full = ActivityStore()
+    for file_name, stamp in check_logs:
+        full.fold_log_file(file_name, stamp)
+    full.commit()
+    assert incremental.author_ids.tolist() == full.author_ids.tolist()
+    for author_id in ['server'] + full.author_ids.tolist():
+        assert incremental.stats(author_id) == full.stats(author_id), author_id
+    print('Incremental fold OK')
@@ -0,0 +1,91 @@
+# Crude benchmark file, intended to be run from CLI at repository root
+# Updates the score of random users in a table of USERS users, once by rewriting a JSON file after every update like
+# Reputation used to do, and once through a key-value store of glados.Database. Prints updates/sec for a few table sizes,
+# then checks that read() keeps answering while writes are being committed.
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from glados.database import Database
+
+UPDATES = 2000
+
+
+def json_file(tmp, users):
+    file_name = os.path.join(tmp, 'reputation.json')
+    with open(file_name, 'w') as f:
+        json.dump({'user{}'.format(i): 0 for i in range(users)}, f)
+    start = time.perf_counter()
+    for _ in range(UPDATES):
+        with open(file_name, 'r') as f:
+            scores = json.load(f)
+        name = 'user{}'.format(random.randrange(users))
+        scores[name] = scores.get(name, 0) + 1
+        with open(file_name, 'w') as f:
+            json.dump(scores, f)
+    return time.perf_counter() - start
+
+
+def key_value(tmp, users):
+    database = Database(os.path.join(tmp, Database.FILE_NAME))
+    scores = database.key_value('reputation')
+    for i in range(users):
+        scores['user{}'.format(i)] = 0
+    database.flush()
+
+    async def update():
+        start = time.perf_counter()
+        for i in range(UPDATES):
+            name = 'user{}'.format(random.randrange(users))
+            scores[name] = scores.get(name, 0) + 1
+            if i % 100 == 0:
+                await asyncio.sleep(0)
+        await database.flush_async()
+        return time.perf_counter() - start
+
+    elapsed = asyncio.new_event_loop().run_until_complete(update())
+    database.close()
+    return elapsed
+
+
+async def concurrent_reads(tmp):
+    database = Database(os.path.join(tmp, Database.FILE_NAME), flush_interval=0.01)
+    table = database.table('scores', 'name TEXT PRIMARY KEY, score INTEGER NOT NULL')
+    done = False
+
+    async def writer():
+        for i in range(50000):
+            table.insert({'name': 'user{}'.format(i % 5000), 'score': i}, replace=True)
+            if i % 500 == 0:
+                await asyncio.sleep(0.001)
+        await database.flush_async()
+
+    async def reader():
+        count = 0
+        while not done:
+            await database.read('SELECT count(*), max(score) FROM scores')
+            count += 1
+        return count
+
+    readers = [asyncio.ensure_future(reader()) for _ in range(4)]
+    start = time.perf_counter()
+    await writer()
+    elapsed = time.perf_counter() - start
+    done = True
+    reads = sum(await asyncio.gather(*readers))
+    assert (await table.select('name = ?', ('user4999',)))[0]['score'] == 49999
+    database.close()
+    print('50000 inserts committed in {:.2f}s while 4 readers answered {} queries'.format(elapsed, reads))
+
+
+for users in (100, 1000, 10000):
+    for name, func in (('json file', json_file), ('key-value store', key_value)):
+        with tempfile.TemporaryDirectory() as tmp:
+            elapsed = func(tmp, users)
+            print('{:>6} users, {:>16}: {:8.0f} updates/sec'.format(users, name, UPDATES / elapsed))
+
+with tempfile.TemporaryDirectory() as tmp:
+    asyncio.new_event_loop().run_until_complete(concurrent_reads(tmp))
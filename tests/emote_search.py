@@ -0,0 +1,53 @@
+# Crude benchmark file, intended to be run from CLI at repository root
+# Misspells random emote names and looks them up, once with difflib.get_close_matches() like
+# Emotes.spellcheck_emote_name used to and once through the trigram index of the EmoteIndex. Prints the time per
+# lookup and how often each suggested the name that was misspelled, then times random emotes by tag.
+import random
+import difflib
+import time
+
+from modules.mlp.emotes import EmoteIndex, INFODB_PATH, TAGDB_PATH
+
+LOOKUPS = 100
+
+
+def misspell(name):
+    i = random.randrange(len(name))
+    kind = random.randrange(3)
+    if kind == 0:
+        return name[:i] + name[i+1:]
+    if kind == 1:
+        return name[:i] + random.choice('abcdefghijklmnopqrstuvwxyz') + name[i+1:]
+    return name[:i] + name[i:i+2][::-1] + name[i+2:]
+
+
+index = EmoteIndex.build(INFODB_PATH, TAGDB_PATH)
+originals = random.sample(index.names, LOOKUPS)
+queries = [misspell(x) for x in originals]
+originals, queries = zip(*[(x, q) for x, q in zip(originals, queries) if q not in index.emotes])
+
+start = time.perf_counter()
+expected = [difflib.get_close_matches(q, index.names, 1, 0.2) for q in queries]
+print('{:>8}: {:8.3f} ms/lookup'.format('difflib', 1000 * (time.perf_counter() - start) / len(queries)))
+
+start = time.perf_counter()
+results = [index.fuzzy_names.suggest(q, 1, 0.2) for q in queries]
+print('{:>8}: {:8.3f} ms/lookup'.format('trigrams', 1000 * (time.perf_counter() - start) / len(queries)))
+found_difflib = sum([x] == r for x, r in zip(originals, expected))
+found_trigrams = sum([x] == r for x, r in zip(originals, results))
+print('Misspelled name found for {} (difflib) and {} (trigrams) of {} lookups'.format(
+    found_difflib, found_trigrams, len(queries)))
+assert found_trigrams >= found_difflib
+
+start = time.perf_counter()
+tags = ['+twilightsparkle', '+rarity', '+pinkiepie', '+fluttershy', '+happy']
+for _ in range(LOOKUPS):
+    names = index.with_tags(random.sample(tags, 2))
+    random.choice(names) if names else None
+print('{:>8}: {:8.3f} ms/lookup'.format('tags', 1000 * (time.perf_counter() - start) / LOOKUPS))
+
+assert index.fuzzy_names.suggest('twilightsmile') == ['twilightsmile']
+assert index.fuzzy_tags.suggest('+twilight')[0] == '+twilightsparkle'
+both = index.with_tags(['+twilightsparkle', '+rarity'])
+assert all(x in index.tags['+twilightsparkle'] and x in index.tags['+rarity'] for x in both)
+print('Tags OK')
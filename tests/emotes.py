@@ -0,0 +1,97 @@
+# Crude benchmark file, intended to be run from CLI at repository root
+# Loads the emotes of mlp.emotes for a number of servers, once like every Emotes module used to (each server parsing
+# all of emote_info_db and emote_tag_db into its own lists) and once through the shared EmoteIndex, both from the JSON
+# files and from the prebuilt cache file. Prints the time it took and how much memory stays allocated.
+import asyncio
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from os import listdir
+from os.path import isfile, join
+from types import SimpleNamespace
+
+import glados
+import modules.mlp.emotes as emotes
+from modules.mlp.emotes import Emotes, EmoteIndex, INFODB_PATH, TAGDB_PATH
+
+SERVERS = 10
+
+
+class OldEemote:
+    def __init__(self, name, image_path, x_offset, y_offset, x_size, y_size, flip, is_nsfw):
+        self.name = name
+        self.image_path = image_path
+        self.x_offset = x_offset
+        self.y_offset = y_offset
+        self.x_size = x_size
+        self.y_size = y_size
+        self.flip = flip
+        self.is_nsfw = is_nsfw
+
+
+def old_build_emote_db():
+    tag_list = {}
+    emote_list = {}
+    raw_emote_list = []
+    # Sorted, so the result can be compared. When two subreddits have an emote with the same name, the first one wins.
+    for f in sorted(f for f in listdir(INFODB_PATH) if isfile(join(INFODB_PATH, f))):
+        subreddit = os.path.splitext(f)[0]
+        jinfodata = json.loads(open(join(INFODB_PATH, f)).read())
+        jtagdata = json.loads(open(join(TAGDB_PATH, f)).read())
+        tag_list[subreddit] = {}
+        for key, items in jinfodata.items():
+            name = key[1:].replace('/', '').replace('\\', '').replace('.', '')
+            emote = (items.get("Emotes") or {}).get("")
+            if not emote or not emote.get("Image"):
+                continue
+            offset = emote.get("Offset") or (0, 0)
+            size = emote.get("Size") or (0, 0)
+            is_nsfw = False
+            tag_list[subreddit][name] = ""
+            for tag in jtagdata.get(key) or ():
+                tag_list.setdefault(tag, {})[name] = ""
+                is_nsfw = is_nsfw or tag == "+nsfw"
+            if not emote_list.get(name):
+                emote_list[name] = OldEemote(name, "https://" + emote["Image"].split('//')[1], -offset[0], -offset[1],
+                                             size[0], size[1], bool((emote.get("CSS") or {}).get("transform")), is_nsfw)
+                raw_emote_list.append(name)
+    return tag_list, emote_list, raw_emote_list
+
+
+async def main():
+    tracemalloc.start()
+    start = time.perf_counter()
+    old = [old_build_emote_db() for _ in range(SERVERS)]
+    print('{:>13}: {:7.3f}s, {:6.1f} MiB for {} servers'.format(
+        'per server', time.perf_counter() - start, tracemalloc.get_traced_memory()[0] / 2**20, SERVERS))
+    del old
+
+    with tempfile.TemporaryDirectory() as tmp:
+        persistence = glados.JSONStore()
+        for name in ('JSON files', 'cache file'):
+            emotes._emote_index = emotes._emote_index_future = None
+            tracemalloc.clear_traces()
+            start = time.perf_counter()
+            modules = list()
+            for i in range(SERVERS):
+                local_data_dir = join(tmp, str(i))
+                server_instance = SimpleNamespace(settings={}, local_data_dir=local_data_dir, global_data_dir=tmp,
+                                                  persistence=persistence)
+                modules.append(Emotes(server_instance, 'mlp.emotes.Emotes'))
+            indices = [await module.emote_index() for module in modules]
+            print('{:>13}: {:7.3f}s, {:6.1f} MiB for {} servers'.format(
+                name, time.perf_counter() - start, tracemalloc.get_traced_memory()[0] / 2**20, SERVERS))
+            assert all(x is indices[0] for x in indices)
+
+        index = indices[0]
+        tag_list, emote_list, raw_emote_list = old_build_emote_db()
+        assert index.names == raw_emote_list and set(index.tags) == set(tag_list)
+        assert all(index.tags[tag] == tuple(names) for tag, names in tag_list.items())
+        assert all(vars(emote_list[name]) == {k: getattr(index.emotes[name], k) for k in vars(emote_list[name])}
+                   for name in raw_emote_list)
+        print('Index matches the old lists ({} emotes, {} tags)'.format(len(index.names), len(index.tags)))
+
+
+asyncio.run(main())
@@ -0,0 +1,97 @@
+# Crude benchmark file, intended to be run from CLI at repository root
+# Generates sprite sheets and a set of emotes cut from them (file:// URLs, so no network is needed), then builds the
+# emotes once like BuildEmotes used to (downloading the sheet for every emote and converting one emote after the other)
+# and once with the EmoteBuilder. Prints emotes/sec and the number of downloads, checks both produce the same images
+# and that a build resumes from its manifest.
+import asyncio
+import os
+import random
+import tempfile
+import time
+import urllib.request
+from os.path import join
+
+from PIL import Image
+
+from modules.mlp.emotes_builder import Eemote, EmoteBuilder, convert_emote
+
+SHEETS = 16
+EMOTES_PER_SHEET = 36  # 6x6 emotes of 70x70 pixels
+SIZE = 70
+
+
+def make_sheets(folder):
+    random.seed(1)
+    urls = list()
+    for i in range(SHEETS):
+        sheet = Image.new('RGBA', (6 * SIZE, 6 * SIZE))
+        pixels = [(random.randrange(256), random.randrange(256), random.randrange(256), random.choice((0, 255)))
+                  for _ in range(sheet.size[0] * sheet.size[1])]
+        sheet.putdata(pixels)
+        path = join(folder, 'sheet{}.png'.format(i))
+        sheet.save(path)
+        urls.append('file://' + path)
+    emotes = list()
+    for i, url in enumerate(urls):
+        for j in range(EMOTES_PER_SHEET):
+            emotes.append(Eemote('emote{}_{}'.format(i, j), url, SIZE * (j % 6), SIZE * (j // 6), SIZE, SIZE,
+                                 j % 5 == 0))
+    return emotes
+
+
+def old_build_emote(out_path, e):
+    name_base = e.name + ".tmp"
+    urllib.request.urlretrieve(e.image_path, name_base)
+    convert_emote(name_base, join(out_path, e.name), e.x_offset, e.y_offset, e.x_size, e.y_size, e.flip)
+    os.remove(name_base)
+
+
+def read_all(folder):
+    result = dict()
+    for f in os.listdir(folder):
+        if f.endswith('.png'):
+            with open(join(folder, f), 'rb') as image:
+                result[f] = image.read()
+    return result
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        emotes = make_sheets(tmp)
+
+        old_path = join(tmp, 'old')
+        os.mkdir(old_path)
+        start = time.perf_counter()
+        for e in emotes:
+            old_build_emote(old_path, e)
+        print('{:>8}: {:6.1f} emotes/sec, {} downloads'.format(
+            'old', len(emotes) / (time.perf_counter() - start), len(emotes)))
+
+        out_path = join(tmp, 'emotesdb')
+        sheets_path = join(tmp, 'sheets')
+        builder = EmoteBuilder(None, out_path, sheets_path, downloads=4)
+        start = time.perf_counter()
+        await builder.build(emotes)
+        print('{:>8}: {:6.1f} emotes/sec, {} downloads, {} worker processes'.format(
+            'builder', len(emotes) / (time.perf_counter() - start), builder.downloaded, os.cpu_count()))
+        assert builder.built == len(emotes) and builder.downloaded == SHEETS and builder.failed == 0
+        assert read_all(old_path) == read_all(out_path)
+
+        # A build that was interrupted resumes where it stopped, changed emotes are rebuilt
+        os.remove(join(out_path, emotes[0].name + '.png'))
+        builder = EmoteBuilder(None, out_path, sheets_path)
+        half = len(emotes) // 2
+        emotes[half].flip = not emotes[half].flip
+        await builder.build(emotes[:half + 1])
+        assert builder.built == 2 and builder.skipped == half - 1 and builder.downloaded == 0
+        builder = EmoteBuilder(None, out_path, sheets_path)
+        await builder.build(emotes)
+        assert builder.built == 0 and builder.skipped == len(emotes)
+
+        missing = Eemote('missing', 'file://' + join(tmp, 'missing.png'), 0, 0, 0, 0, False)
+        await builder.build([missing])
+        assert builder.failed == 1
+        print('Resume and dedupe OK')
+
+
+asyncio.run(main())
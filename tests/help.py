@@ -0,0 +1,155 @@
+# Crude benchmark file, intended to be run from CLI at repository root
+# Starts the bot with every module of the default module folders enabled and compares .help, .help <search>, .adminhelp
+# and provide_help() the way they used to work (asking every active module for its help strings through
+# inspect.getmembers()) against the help index. Checks that both send the same strings, that 200 servers share one
+# index and that the index follows prefix changes and blacklisting.
+import asyncio
+import inspect
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+FOLDERS = ('bot', 'general', 'mlp', 'gdnet', 'cdfs', 'dffu')
+SERVERS = 200
+SEARCHES = ['', 'emote', 'quote role', 'xp', 'ban mute kick', 'pony']
+class_pattern = re.compile(r'^class (\w+)\((?:glados\.)?Module\)', re.MULTILINE)
+
+
+def module_names(modules_path):
+    names = ['bot.modulemanager.ModuleManager']
+    for folder in FOLDERS:
+        for f in sorted(os.listdir(os.path.join(modules_path, folder))):
+            if f.endswith('.py') and f != '__init__.py':
+                with open(os.path.join(modules_path, folder, f)) as source:
+                    for class_name in class_pattern.findall(source.read()):
+                        names.append('{}.{}.{}'.format(folder, f[:-3], class_name))
+    return names
+
+
+def old_help_strings(obj, member):
+    for command, argument_list_str, description in member.commands[::-1]:
+        if not description:
+            continue
+        if argument_list_str:
+            yield '{}{} **{}** -- *{}*'.format(obj.command_prefix, command, argument_list_str, description)
+        else:
+            yield '{}{} -- *{}*'.format(obj.command_prefix, command, description)
+
+
+def old_casual(obj):
+    for name, member in inspect.getmembers(obj, predicate=inspect.ismethod):
+        if not hasattr(member, 'commands') or any(hasattr(member, x) for x in ('moderator', 'admin', 'owner')):
+            continue
+        yield from old_help_strings(obj, member)
+
+
+def old_privileged(obj, level):
+    for name, member in inspect.getmembers(obj, predicate=inspect.ismethod):
+        if not hasattr(member, 'commands') or not hasattr(member, level):
+            continue
+        yield from old_help_strings(obj, member)
+
+
+def old_search(s, level, content):
+    if level is None:
+        help_strings = (string for module in s.active_modules for string in old_casual(module))
+    else:
+        help_strings = (string for module in s.active_modules for string in old_privileged(module, level))
+    if len(content) > 0:
+        help_strings = filter(lambda hlp: any(True for search in content.split() if search in hlp), help_strings)
+    return sorted(help_strings)
+
+
+def old_provide_help(obj, command):
+    command_list = list()
+    for name, member in inspect.getmembers(obj, predicate=inspect.ismethod):
+        if not hasattr(member, 'commands') or not any(x[0] == command for x in member.commands):
+            continue
+        command_list += list(old_help_strings(obj, member))
+    return command_list
+
+
+def bench(name, func, n):
+    start = time.perf_counter()
+    for i in range(n):
+        func()
+    print('{:>40}: {:9.3f}ms'.format(name, 1000 * (time.perf_counter() - start) / n))
+
+
+def main():
+    modules_path = os.path.abspath('modules')
+    sys.path.insert(0, os.getcwd())
+    tmp = tempfile.TemporaryDirectory()
+    os.chdir(tmp.name)
+    with open('settings.json', 'w') as f:
+        f.write(json.dumps({'modules': {'names': module_names(modules_path), 'paths': [modules_path]},
+                            'permissions': {'bot owner': '0'}}))
+    import glados
+    bot = glados.Bot()
+
+    def join(i):
+        server = SimpleNamespace(id=str(i), name='server {}'.format(i), members=[], roles=[])
+        s = glados.bot.ServerInstance(bot.client, bot.settings, server, bot.webapp, bot.http, bot.persistence,
+                                      bot.databases, bot.scheduler)
+        s.instantiate_modules(bot.class_list, bot.whitelist)
+        return s
+
+    s = join(0)
+    commands = [(obj, c.commands[-1][0]) for obj, c in s.callbacks if hasattr(c, 'commands')]
+    print('{} modules, {} commands, {} casual help strings'.format(
+        len(s.active_modules), len(commands), len(s.help_index.search())))
+
+    for level in (None, 'admin'):
+        for content in SEARCHES:
+            assert old_search(s, level, content) == s.help_index.search(level, content.split()), (level, content)
+    for obj, command in commands:
+        assert old_provide_help(obj, command) == obj.help_index.command_help(type(obj), command), command
+
+    bench('.help (old)', lambda: old_search(s, None, ''), 20)
+    bench('.help (index)', lambda: s.help_index.search(), 2000)
+    bench('.help quote role (old)', lambda: old_search(s, None, 'quote role'), 20)
+    bench('.help quote role (index)', lambda: s.help_index.search(None, ['quote', 'role']), 2000)
+    bench('.adminhelp (old)', lambda: old_search(s, 'admin', ''), 20)
+    bench('.adminhelp (index)', lambda: s.help_index.search('admin'), 2000)
+    bench('provide_help, every command (old)', lambda: [old_provide_help(o, c) for o, c in commands], 2)
+    bench('provide_help, every command (index)',
+          lambda: [o.help_index.command_help(type(o), c) for o, c in commands], 200)
+
+    # Servers with the same prefix and modules share one index
+    tracemalloc.start()
+    start = time.perf_counter()
+    servers = [join(i) for i in range(1, SERVERS + 1)]
+    elapsed = time.perf_counter() - start
+    print('{} servers joined in {:.0f}ms, {} distinct help indices, {:.1f} MiB traced'.format(
+        SERVERS, 1000 * elapsed, len(set(id(x.help_index) for x in servers)),
+        tracemalloc.get_traced_memory()[0] / 2**20))
+    tracemalloc.stop()
+    assert all(x.help_index is s.help_index for x in servers)
+
+    # Changing the prefix or blacklisting a module changes the help of that server only
+    bot.settings['command prefix']['1'] = '!'
+    assert servers[0].help_index.search(None, ['help'])[0].startswith('!') and \
+        servers[1].help_index is s.help_index and servers[0].help_index.prefix == '!'
+    async def send_message(destination, text):
+        pass
+
+    bot.client.send_message = send_message
+    asyncio.run(servers[1].module_manager.moduleblack(SimpleNamespace(channel=None), 'general.quotes2.Quotes'))
+    assert old_search(servers[1], None, 'quote') == servers[1].help_index.search(None, ['quote']) and \
+        len(servers[1].help_index.search(None, ['quote'])) < len(s.help_index.search(None, ['quote']))
+    quotes = next(obj for obj in servers[1].modules if obj.full_name == 'general.quotes2.Quotes')
+    assert servers[1].help_index.command_help(type(quotes), 'quote') == old_provide_help(quotes, 'quote')
+    print('Invalidation OK')
+
+    bot.scheduler.shutdown()
+    bot.databases.close()
+    os.chdir('/')
+    tmp.cleanup()
+
+
+main()
@@ -0,0 +1,74 @@
+# Crude testing file, intended to be run from CLI at repository root
+# Starts a local stub HTTP server that takes one second to answer each request, then fires several requests through
+# glados.HTTPClient at once. If the requests overlap, the whole batch takes about one second instead of one second per
+# request. The second batch is served from the response cache and should be instant.
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from glados.http_client import HTTPClient
+
+DELAY = 1.0
+REQUESTS = 8
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(DELAY)
+        body = '{{"path": "{}"}}'.format(self.path).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    request_queue_size = 64
+
+
+server = StubServer(('127.0.0.1', 0), SlowHandler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+url = 'http://127.0.0.1:{}/'.format(server.server_address[1])
+
+
+async def main():
+    http = HTTPClient(max_connections_per_host=REQUESTS)
+
+    start = time.monotonic()
+    responses = await asyncio.gather(*(http.get(url + str(i), cache=60) for i in range(REQUESTS)))
+    elapsed = time.monotonic() - start
+    print('{} concurrent requests took {:.2f}s ({:.2f}s if serial)'.format(REQUESTS, elapsed, REQUESTS * DELAY))
+    assert [r.json()['path'] for r in responses] == ['/' + str(i) for i in range(REQUESTS)]
+    assert elapsed < REQUESTS * DELAY / 2
+
+    start = time.monotonic()
+    await asyncio.gather(*(http.get(url + str(i), cache=60) for i in range(REQUESTS)))
+    elapsed = time.monotonic() - start
+    print('{} cached requests took {:.2f}s'.format(REQUESTS, elapsed))
+    assert elapsed < DELAY
+
+    # A per-host limit of 2 forces the requests into 4 rounds
+    http_limited = HTTPClient(max_connections_per_host=2)
+    start = time.monotonic()
+    await asyncio.gather(*(http_limited.get(url + str(i)) for i in range(REQUESTS)))
+    elapsed = time.monotonic() - start
+    print('{} requests limited to 2 per host took {:.2f}s'.format(REQUESTS, elapsed))
+    assert elapsed >= REQUESTS / 2 * DELAY
+
+    try:
+        await http.get(url + 'timeout', timeout=DELAY / 4)
+        assert False, 'Request should have timed out'
+    except asyncio.TimeoutError:
+        print('Request timed out as expected')
+
+    await http.close()
+    await http_limited.close()
+
+
+asyncio.get_event_loop().run_until_complete(main())
+server.shutdown()
@@ -0,0 +1,124 @@
+# Crude benchmark file, intended to be run from CLI at repository root
+# Renders .math requests with stand-ins for latex and dvipng that take a moment to run (so the benchmark doesn't need
+# a TeX installation), once like LaTeX.generate_image used to (blocking subprocess calls, one after the other) and once
+# through the LaTeXRenderer. Prints requests/sec for unique and for repeated formulas, then checks the cache, the
+# timeout, the memory and CPU limits of the renderer processes and that images aren't deleted right after they were
+# returned.
+import asyncio
+import os
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+
+from modules.general.latex import LaTeX, LaTeXRenderer
+
+REQUESTS = 40
+LATEX_TIME = 0.2  # seconds the fake latex takes
+
+FAKE_LATEX = """
+import os, resource, sys, time
+tex = sys.argv[-1]
+out = [x.split('=', 1)[1] for x in sys.argv if x.startswith('-output-directory=')][0]
+base = os.path.join(out, os.path.splitext(os.path.basename(tex))[0])
+source = open(tex).read()
+time.sleep(float(os.environ.get('LATEX_TIME', '0')) * (100 if 'slow' in source else 1))
+for ext in ('.dvi', '.log', '.aux'):
+    open(base + ext, 'w').write(source)
+if 'limits' in source:
+    print('! Limits', resource.getrlimit(resource.RLIMIT_AS), resource.getrlimit(resource.RLIMIT_CPU))
+    sys.exit(1)
+if 'broken' in source:
+    print('./' + base + '.tex:80: Undefined control sequence.')
+    print('! Emergency stop.')
+    sys.exit(1)
+"""
+
+FAKE_DVIPNG = """
+import sys
+png = sys.argv[sys.argv.index('-o') + 1]
+open(png, 'wb').write(open(sys.argv[-1], 'rb').read() * 100)
+"""
+
+
+def write_script(folder, name, code):
+    path = os.path.join(folder, name)
+    with open(path, 'w') as f:
+        f.write('#!{}\n{}'.format(sys.executable, code))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return path
+
+
+def old_generate_image(out_folder, latex_command, dvipng_command, latex, num):
+    latex_file = os.path.join(out_folder, num + '.tex')
+    dvi_file = os.path.join(out_folder, num + '.dvi')
+    png_file = os.path.join(out_folder, num + '1.png')
+    with open(latex_file, 'w') as tex:
+        tex.write(latex)
+    subprocess.check_output([latex_command, '-no-shell-escape', '-interaction', 'nonstopmode', '-halt-on-error',
+                             '-file-line-error', '-output-directory=' + out_folder, latex_file])
+    subprocess.call([dvipng_command, '-q*', '-D', '200', '-T', 'tight', '-bg', 'Transparent', '-o', png_file, dvi_file])
+    return png_file
+
+
+async def main():
+    os.environ['LATEX_TIME'] = str(LATEX_TIME)
+    with tempfile.TemporaryDirectory() as tmp:
+        latex_command = write_script(tmp, 'latex', FAKE_LATEX)
+        dvipng_command = write_script(tmp, 'dvipng', FAKE_DVIPNG)
+        unique = [LaTeX.math('x^{} + y^{} = z^{}'.format(i, i, i)) for i in range(REQUESTS)]
+        repeated = [LaTeX.math('e^{i \\pi} + 1 = 0')] * REQUESTS
+
+        old_folder = os.path.join(tmp, 'old')
+        os.mkdir(old_folder)
+        for name, sources in (('unique', unique), ('repeated', repeated)):
+            start = time.perf_counter()
+            for i, source in enumerate(sources):
+                old_generate_image(old_folder, latex_command, dvipng_command, source, name + str(i))
+            print('{:>8} {:>8}: {:6.1f} requests/sec, {} files left behind'.format(
+                'old', name, REQUESTS / (time.perf_counter() - start), len(os.listdir(old_folder))))
+
+        out_folder = os.path.join(tmp, 'tex')
+        renderer = LaTeXRenderer(out_folder, workers=4, timeout=2, cache_size=1,
+                                 latex_command=latex_command, dvipng_command=dvipng_command)
+        for name, sources in (('unique', unique), ('repeated', repeated)):
+            renders = renderer.renders
+            start = time.perf_counter()
+            results = await asyncio.gather(*(renderer.render(source) for source in sources))
+            print('{:>8} {:>8}: {:6.1f} requests/sec, {} renders, {} files left behind'.format(
+                'renderer', name, REQUESTS / (time.perf_counter() - start), renderer.renders - renders,
+                len(os.listdir(out_folder))))
+            assert all(success for success, png in results)
+
+        # Cached images are reused across restarts, leftovers are cleaned up and the cache stays within its size
+        renders = renderer.renders
+        assert (await renderer.render(repeated[0]))[0] and renderer.renders == renders
+        renderer = LaTeXRenderer(out_folder, workers=4, timeout=2, cache_size=0.3,
+                                 latex_command=latex_command, dvipng_command=dvipng_command)
+        assert (await renderer.render(repeated[0]))[0] and renderer.renders == 0
+        assert sum(os.path.getsize(os.path.join(out_folder, x)) for x in os.listdir(out_folder)) <= 0.3 * 1024 * 1024
+        assert all(x.endswith('.png') for x in os.listdir(out_folder))
+
+        success, error = await renderer.render(LaTeX.math('\\broken'))
+        assert not success and 'Emergency stop' in error
+        start = time.perf_counter()
+        success, error = await renderer.render(LaTeX.math('\\slow'))
+        assert not success and 'longer than' in error and time.perf_counter() - start < 3
+        assert all(x.endswith('.png') for x in os.listdir(out_folder))
+        success, error = await renderer.render(LaTeX.math('\\limits'))
+        assert not success and '(536870912, 536870912) (3, 3)' in error, error
+
+        # Images that were just returned aren't deleted to make room for new ones until they've had time to be sent
+        renderer = LaTeXRenderer(os.path.join(tmp, 'small'), workers=4, timeout=2, cache_size=0.0001,
+                                 latex_command=latex_command, dvipng_command=dvipng_command)
+        renderer.HOLD_TIME = 0.5
+        success, first = await renderer.render(unique[0])
+        assert success and (await renderer.render(unique[1]))[0] and os.path.isfile(first)
+        await asyncio.sleep(0.5)
+        success, last = await renderer.render(unique[2])
+        assert success and not os.path.isfile(first) and os.path.isfile(last)
+        print('Cache, errors, timeout and eviction of images in use OK')
+
+
+asyncio.run(main())
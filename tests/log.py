@@ -0,0 +1,54 @@
+# Crude benchmark file, intended to be run from CLI at repository root
+# Compares writing chat log lines to an xz file with a flush after every message against the BufferedLogWriter used
+# by the Log module. Prints messages/sec and the size of the resulting file.
+# Note that LZMAFile.flush() doesn't push anything to disk, so "flush per message" loses everything since the file was
+# opened if the bot crashes. "Stream per message" is what it costs to actually get every message onto the disk.
+import os
+import random
+import tempfile
+import time
+from lzma import LZMAFile
+
+from modules.general.log import BufferedLogWriter
+
+MESSAGES = 20000
+
+words = ['the', 'a', 'bot', 'glados', 'pony', 'lol', 'what', 'is', 'this', 'code', 'compile', 'error', 'game']
+lines = ['[2017-01-01 12:00:{:02d}] Server(1234): #general: user{}(5678{}): {}\n'.format(
+    i % 60, i % 20, i % 20, ' '.join(random.choice(words) for _ in range(random.randint(2, 20)))).encode('utf-8')
+    for i in range(MESSAGES)]
+
+
+def per_message_flush(file_name):
+    f = LZMAFile(file_name, 'a')
+    for line in lines:
+        f.write(line)
+        f.flush()
+    f.close()
+
+
+def stream_per_message(file_name):
+    for line in lines:
+        with LZMAFile(file_name, 'a') as f:
+            f.write(line)
+
+
+def buffered(file_name, max_buffer_size):
+    writer = BufferedLogWriter(file_name, max_buffer_size)
+    for line in lines:
+        writer.write(line)
+    writer.close()
+
+
+with tempfile.TemporaryDirectory() as tmp:
+    for name, func in (('flush per message', per_message_flush),
+                       ('stream per message', stream_per_message),
+                       ('buffered 64k', lambda f: buffered(f, 64*1024)),
+                       ('buffered 256k', lambda f: buffered(f, 256*1024))):
+        file_name = os.path.join(tmp, name.replace(' ', '_') + '.txt.xz')
+        start = time.perf_counter()
+        func(file_name)
+        elapsed = time.perf_counter() - start
+        assert LZMAFile(file_name, 'r').read() == b''.join(lines)
+        print('{:>20}: {:10.0f} messages/sec, {:8d} bytes on disk'.format(
+            name, MESSAGES / elapsed, os.path.getsize(file_name)))
@@ -0,0 +1,76 @@
+# Crude benchmark file, intended to be run from CLI at repository root
+# Looks up members by name on a made up server with 50k members, once by going through all members like
+# Module.parse_members_roles used to do, and once through the MemberIndex. Prints lookups/sec, then checks that the
+# index follows joins, leaves, nickname changes and role changes.
+import random
+import time
+from types import SimpleNamespace
+
+import glados
+
+MEMBERS = 50000
+ROLES = 100
+LOOKUPS = 200
+
+
+class Member(SimpleNamespace):
+    # discord.py objects are hashable by their ID
+    __hash__ = object.__hash__
+
+
+roles = [Member(id='r{}'.format(i), name='role{}'.format(i)) for i in range(ROLES)]
+members = [Member(id=str(100000 + i), name='member{}'.format(i), nick='nick{}'.format(i) if i % 3 else None,
+                  roles=random.sample(roles, 2)) for i in range(MEMBERS)]
+server = SimpleNamespace(id='1234', members=list(members), roles=roles)
+server_instance = SimpleNamespace(server=server, member_index=glados.MemberIndex(server))
+module = glados.Module(server_instance, 'test.Test')
+message = SimpleNamespace(mentions=[], role_mentions=[])
+
+
+def old_parse_members_roles(content):
+    members = set()
+    roles = set()
+    for name in content.split():
+        for member in server.members:
+            if member.nick == name or member.name == name:
+                members.add(member)
+        for role in server.roles:
+            if role.name == name:
+                roles.add(role)
+    return members, roles
+
+
+queries = [' '.join(random.choice([m.name, m.nick or m.name, random.choice(roles).name])
+                    for m in random.sample(members, 3)) for _ in range(LOOKUPS)]
+
+start = time.perf_counter()
+expected = [old_parse_members_roles(q) for q in queries]
+print('{:>10}: {:8.0f} lookups/sec'.format('linear', LOOKUPS / (time.perf_counter() - start)))
+
+start = time.perf_counter()
+module.member_index.rebuild()
+print('{:>10}: built in {:.3f}s'.format('index', time.perf_counter() - start))
+
+start = time.perf_counter()
+results = [module.parse_members_roles(message, q) for q in queries]
+print('{:>10}: {:8.0f} lookups/sec'.format('index', LOOKUPS / (time.perf_counter() - start)))
+for (members_found, roles_found, error), (old_members, old_roles) in zip(results, expected):
+    assert error or (set(members_found), set(roles_found)) == (old_members, old_roles)
+
+# Keep up with events
+index = module.member_index
+joined = Member(id='1', name='Newbie', nick=None, roles=[roles[0]])
+server.members.append(joined)
+index.add(joined)
+assert index.find('newbie', ignore_case=True) == [joined] and joined in index.with_role(roles[0])
+
+before = Member(**vars(joined))
+joined.nick, joined.roles = 'Oldie', [roles[1]]
+index.update(before, joined)
+assert index.find('Oldie') == [joined] and index.find('Newbie') == [joined]
+assert joined not in index.with_role(roles[0]) and joined in index.with_role(roles[1])
+
+server.members.remove(joined)
+index.remove(joined)
+assert index.get('1') is None and index.find('Oldie') == []
+print('Join, update and leave OK')
@@ -0,0 +1,154 @@
+# Crude benchmark file, intended to be run from CLI at repository root
+# Lets a bot join 500 servers with a handful of modules that don't keep per server state, once with every module
+# instantiated for every server (like ServerInstance.instantiate_modules used to) and once with the modules that declare
+# scope = Module.PROCESS shared by all servers, each in a fresh process. Prints the memory the server instances hold and
+# how long joining a server takes, then checks that shared modules see the server of the message they're handling.
+import asyncio
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+SERVERS = 500
+MODULES = [
+    'bot.modulemanager.ModuleManager',
+    'bot.ping.Ping',
+    'gdnet.conversions.Conversions',
+    'general.burn.Burn',
+    'general.google.Google',
+    'general.quotes2.Quotes',
+    'general.spellcheck.AutoCorrect',
+    'general.spellcheck.SpellCheck',
+    'general.units.Units',
+    'mlp.emotes.Emotes',
+]
+
+
+def rss():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def make_bot(tmp):
+    import glados
+    from glados.database import Databases
+    client = SimpleNamespace()
+    settings = {'modules': {'data': os.path.join(tmp, 'data')}, 'command prefix': {'default': '.'},
+                'permissions': {'bot owner': '0'}}
+    os.mkdir(settings['modules']['data'])
+    databases = Databases()
+    bot = SimpleNamespace(client=client, settings=settings, persistence=glados.JSONStore(), databases=databases,
+                          scheduler=glados.Scheduler(databases.open(settings['modules']['data'])))
+    bot.class_list = [(name, glados.ModuleSpec(name, lazy=False)) for name in MODULES]
+    return bot
+
+
+def join_server(bot, i):
+    import glados
+    server = SimpleNamespace(id=str(i), name='server {}'.format(i), members=[], roles=[])
+    s = glados.bot.ServerInstance(bot.client, bot.settings, server, None, None, bot.persistence, bot.databases,
+                                  bot.scheduler)
+    s.instantiate_modules(bot.class_list, {})
+    return s
+
+
+def child(mode, tmp):
+    sys.path.insert(0, os.path.abspath('modules'))
+    import glados
+    import general.quotes2 as quotes2
+    bot = make_bot(tmp)
+    if mode == 'per server':
+        for name, spec in bot.class_list:
+            spec.load_class().scope = glados.Module.SERVER
+        quotes2.get_dictionaries = lambda: (quotes2.enchant.Dict('en_US'), quotes2.enchant.Dict('en_GB'))
+
+    join_server(bot, 0)  # imports, caches and the like
+    gc.collect()
+    tracemalloc.start()
+    rss_before = rss()
+    latencies = list()
+    instances = list()
+    for i in range(1, SERVERS + 1):
+        start = time.perf_counter()
+        instances.append(join_server(bot, i))
+        latencies.append(time.perf_counter() - start)
+    gc.collect()
+    latencies.sort()
+    print(json.dumps({
+        'traced': tracemalloc.get_traced_memory()[0],
+        'rss': rss() - rss_before,
+        'median': latencies[len(latencies) // 2],
+        'worst': latencies[-1],
+        'modules': len(set(id(obj) for s in instances for obj in s.modules))
+    }))
+    bot.scheduler.shutdown()
+    bot.databases.close()
+
+
+async def check_context(tmp):
+    import glados
+    bot = make_bot(tmp)
+    sent = list()
+
+    async def send_message(destination, text):
+        await asyncio.sleep(0.01)  # let the messages of the other server interleave
+        sent.append((destination, text))
+
+    bot.client.send_message = send_message
+    servers = [join_server(bot, i) for i in range(2)]
+    burn = next(obj for obj in servers[0].modules if obj.full_name == 'general.burn.Burn')
+    assert burn.scope == glados.Module.PROCESS and all(burn in s.modules for s in servers)
+
+    def message(s, author, content):
+        author = SimpleNamespace(id=author, name=author, bot=False)
+        return SimpleNamespace(server=s.server, channel=s.server.id, author=author, content=content,
+                               clean_content=content, mentions=[], role_mentions=[])
+
+    # Burning someone twice on server 0 and once on server 1 keeps separate counts
+    await asyncio.gather(servers[0].process_message(message(servers[0], 'alice', '.burn bob')),
+                         servers[1].process_message(message(servers[1], 'carol', '.burn bob')))
+    await servers[0].process_message(message(servers[0], 'dave', '.burn bob'))
+    assert sorted(channel for channel, text in sent) == ['0', '0', '1']
+    assert burn.server_burns['0']['alice']['bob'] == 1 and burn.server_burns['1']['carol']['bob'] == 1
+    assert 'dave' in burn.server_burns['0'] and 'dave' not in burn.server_burns['1']
+
+    # Per server data of shared modules ends up in the directory of the right server
+    emotes = next(obj for obj in servers[1].modules if obj.full_name == 'mlp.emotes.Emotes')
+    glados.module.current_server_instance.set(servers[1])
+    emotes.db['allow nsfw'] = True
+    glados.module.current_server_instance.set(servers[0])
+    assert emotes.db['allow nsfw'] is False and emotes.local_data_dir == servers[0].local_data_dir
+    bot.persistence.flush()
+    with open(os.path.join(servers[1].local_data_dir, 'emotes.json')) as f:
+        assert json.loads(f.read())['allow nsfw'] is True
+    bot.scheduler.shutdown()
+    bot.databases.close()
+    print('Server context OK')
+
+
+def main():
+    if len(sys.argv) > 2:
+        child(sys.argv[1], sys.argv[2])
+        return
+
+    for mode in ('per server', 'shared'):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = subprocess.run([sys.executable, sys.argv[0], mode, tmp], stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL, universal_newlines=True, check=True).stdout
+            result = json.loads(output.strip().split('\n')[-1])
+            print('{:>10}: {:5d} module instances, {:6.1f} MiB traced, {:6.1f} MiB RSS, join latency median '
+                  '{:.2f}ms, worst {:.2f}ms'.format(
+                      mode, result['modules'], result['traced'] / 2**20, result['rss'] / 2**20,
+                      1000 * result['median'], 1000 * result['worst']))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sys.path.insert(0, os.path.abspath('modules'))
+        asyncio.run(check_context(tmp))
+
+
+main()
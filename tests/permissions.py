@@ -0,0 +1,108 @@
+# Crude benchmark file, intended to be run from CLI at repository root
+# Simulates a server with thousands of members, a lot of which are banned, blessed or moderators (either by ID or
+# through one of their roles), and measures how many permission checks per second the Permissions module can do.
+# The old implementation looked everything up in the database on every check, it's included here for comparison.
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import glados
+from modules.bot.permissions import Permissions
+
+MEMBERS = 5000
+MARKED_MEMBERS = 2000
+ROLES = 50
+CHECKS = 200000
+
+
+@glados.Permissions.moderator
+async def moderator_command(message, content):
+    pass
+
+
+async def command(message, content):
+    pass
+
+
+def old_is_member_still_marked_as(db, member, key):
+    try:
+        expiry_dates = [('IDs', member.id, db[key]['IDs'][member.id])]
+    except KeyError:
+        member_role_names = set(x.name for x in member.roles)
+        key_role_names = set(db[key]['roles'])
+        expiry_dates = [('roles', x, db[key]['roles'][x]) for x in member_role_names.intersection(key_role_names)]
+        if len(expiry_dates) == 0:
+            return False
+    expiry_dates_len = len(expiry_dates)
+    for type_key, item_key, expiry_date in expiry_dates:
+        if expiry_date == 'never':
+            continue
+        if datetime.now().isoformat() > expiry_date:
+            expiry_dates_len -= 1
+    return expiry_dates_len > 0
+
+
+def old_check_permissions(db, owner_id, member, callback):
+    owner = member.id == owner_id
+    admin = owner or old_is_member_still_marked_as(db, member, 'admin')
+    moderator = admin or old_is_member_still_marked_as(db, member, 'moderator')
+    if hasattr(callback, 'moderator') and not moderator:
+        return glados.Permissions.NEED_MODERATOR
+    if old_is_member_still_marked_as(db, member, 'banned') and not owner:
+        return glados.Permissions.BANNED
+    if old_is_member_still_marked_as(db, member, 'blessed') or owner or admin or moderator:
+        return glados.Permissions.SPAMABLE
+    return glados.Permissions.PUNISHABLE
+
+
+roles = [SimpleNamespace(name='role{}'.format(i)) for i in range(ROLES)]
+members = [SimpleNamespace(id=str(100000 + i), name='member{}'.format(i), roles=random.sample(roles, 3))
+           for i in range(MEMBERS)]
+
+in_a_day = (datetime.now() + timedelta(1)).isoformat()
+db = {key: {'IDs': {}, 'roles': {}} for key in ('banned', 'blessed', 'moderator', 'admin')}
+for member in random.sample(members, MARKED_MEMBERS):
+    db[random.choice(list(db))]['IDs'][member.id] = random.choice(['never', in_a_day])
+for role in random.sample(roles, 5):
+    db[random.choice(list(db))]['roles'][role.name] = random.choice(['never', in_a_day])
+
+with tempfile.TemporaryDirectory() as tmp:
+    with open(os.path.join(tmp, 'permissions.json'), 'w') as f:
+        f.write(json.dumps(db))
+    settings = {'permissions': {'bot owner': members[0].id}}
+    server_instance = SimpleNamespace(settings=settings, local_data_dir=tmp, server=SimpleNamespace(members=members),
+                                      persistence=glados.JSONStore())
+    permissions = Permissions(server_instance, 'bot.permissions.Permissions')
+
+    # Messages come from a few hundred active members
+    checks = [(random.choice(members[:500]), random.choice([command, moderator_command])) for _ in range(CHECKS)]
+
+    start = time.perf_counter()
+    expected = [old_check_permissions(db, members[0].id, member, callback) for member, callback in checks]
+    print('{:>20}: {:8.0f} checks/sec'.format('old', CHECKS / (time.perf_counter() - start)))
+
+    start = time.perf_counter()
+    results = [permissions.check_permissions(member, callback) for member, callback in checks]
+    print('{:>20}: {:8.0f} checks/sec'.format('cached', CHECKS / (time.perf_counter() - start)))
+    assert results == expected
+
+    # Changing a member's roles has to be picked up, even without invalidate()
+    member = members[1]
+    permissions.db['banned']['roles'][roles[0].name] = 'never'
+    permissions.invalidate()
+    member.roles = [roles[0]]
+    assert permissions.is_banned(member)
+    member.roles = [roles[1]] if roles[1].name not in permissions.db['banned']['roles'] else []
+    assert permissions.is_banned(member) == (member.id in permissions.db['banned']['IDs'])
+
+    # Expired marks are removed as soon as they are due. The member mustn't be blessed through a role
+    member.roles = []
+    permissions.db['blessed']['IDs'][member.id] = (datetime.now() - timedelta(0, 1)).isoformat()
+    permissions._Permissions__schedule_expiry('blessed', 'IDs', member.id, permissions.db['blessed']['IDs'][member.id])
+    permissions.invalidate()
+    assert not permissions.is_blessed(member) and member.id not in permissions.db['blessed']['IDs']
+    print('Expiry and role changes OK')
@@ -0,0 +1,66 @@
+# Crude benchmark file, intended to be run from CLI at repository root
+# Feeds 10k made up messages through the Seen and R9K modules, once flushing their documents after every message like
+# the modules used to do, and once letting the JSONStore write them in the background. Prints the number of files
+# written and how long the event loop was blocked in total and at most at once.
+import asyncio
+import json
+import os
+import random
+import re
+import tempfile
+import time
+from types import SimpleNamespace
+
+import glados
+from modules.general.r9k import R9K
+from modules.general.seen import Seen
+
+MESSAGES = 10000
+AUTHORS = 500
+
+words = ['the', 'a', 'bot', 'glados', 'pony', 'lol', 'what', 'is', 'this', 'code', 'compile', 'error', 'game']
+channel = SimpleNamespace(id='1', name='general')
+authors = [SimpleNamespace(id=str(i), name='user{}'.format(i)) for i in range(AUTHORS)]
+messages = [SimpleNamespace(author=random.choice(authors), channel=channel,
+                            clean_content=' '.join(random.choice(words) for _ in range(random.randint(2, 20))))
+            for _ in range(MESSAGES)]
+
+# Time every callback the event loop runs
+blocked = list()
+run = asyncio.events.Handle._run
+
+
+def timed_run(self):
+    start = time.perf_counter()
+    run(self)
+    blocked.append(time.perf_counter() - start)
+asyncio.events.Handle._run = timed_run
+
+
+async def feed(tmp, flush_every_message):
+    store = glados.JSONStore(flush_interval=0.1)
+    server_instance = SimpleNamespace(settings=dict(), local_data_dir=tmp, persistence=store)
+    seen = Seen(server_instance, 'general.seen.Seen')
+    r9k = R9K(server_instance, 'general.r9k.R9K')
+    for message in messages:
+        await seen.on_message(message, None)
+        await r9k.on_message(message, re.match('^(.*)$', message.clean_content))
+        if flush_every_message:
+            # This is what the modules used to do
+            store.flush()
+        await asyncio.sleep(0)
+    r9k.shutdown()
+    store.flush()
+    assert json.loads(open(os.path.join(tmp, 'seen.json')).read()) == seen.db
+    assert json.loads(open(os.path.join(tmp, 'r9k', 'scores.json')).read()) == r9k.scores
+    return store.writes
+
+
+for name, flush_every_message in (('write per message', True), ('JSONStore', False)):
+    with tempfile.TemporaryDirectory() as tmp:
+        blocked.clear()
+        start = time.perf_counter()
+        writes = asyncio.new_event_loop().run_until_complete(feed(tmp, flush_every_message))
+        elapsed = time.perf_counter() - start
+        print('{:>20}: {:6d} file writes, event loop blocked for {:6.2f}s in total, {:5.1f}ms at most '
+              '({:.2f}s wall time)'.format(name, writes, sum(blocked), 1000 * max(blocked), elapsed))
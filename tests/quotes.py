@@ -0,0 +1,85 @@
+# Crude testing file, intended to be run from CLI at repository root
+# Writes a quotes file in the old format (one .txt.xz file per author), migrates it to a QuoteStore and checks that the
+# quotes, word index and statistics match what the old implementation computed by decompressing the whole file.
+# Also simulates a crash while recording a quote, and prints how long a random quote and a search take compared to
+# the old implementation.
+import collections
+import os
+import random
+import re
+import tempfile
+import time
+from lzma import LZMAFile
+
+from modules.general.quotes2 import QuoteStore, escape_quote, unescape_quote
+
+QUOTES = 20000
+AUTHOR = '1234'
+
+words = ['the', 'a', 'bot', 'glados', 'pony', 'lol', 'what', 'is', 'this', 'code', 'compile', 'error', 'game', 'Pony,',
+         '(lol)', 'http://example.com', 'multi\nline']
+quotes = [' '.join(random.choice(words) for _ in range(random.randint(1, 15))) for _ in range(QUOTES)]
+
+
+def load_all_messages(file_name):
+    # This is what the old implementation did for every command
+    with LZMAFile(file_name, 'r') as f:
+        return [unescape_quote(line) for line in f.read().decode('utf-8').split('\n')]
+
+
+with tempfile.TemporaryDirectory() as tmp:
+    xz_file_name = os.path.join(tmp, AUTHOR + '.txt.xz')
+    for i in range(0, QUOTES, 1000):
+        with LZMAFile(xz_file_name, 'a') as f:
+            f.write(''.join(escape_quote(q) + '\n' for q in quotes[i:i + 1000]).encode('utf-8'))
+
+    start = time.perf_counter()
+    old_lines = load_all_messages(xz_file_name)
+    old_time = time.perf_counter() - start
+    # The old format always produced an empty line at the end
+    assert old_lines[:-1] == quotes and old_lines[-1] == ''
+
+    store = QuoteStore(tmp)
+    start = time.perf_counter()
+    assert store.count(AUTHOR) == QUOTES
+    print('Migrated {} quotes in {:.3f}s'.format(QUOTES, time.perf_counter() - start))
+    assert not os.path.exists(xz_file_name)
+    assert store.get_many(AUTHOR, range(QUOTES)) == quotes
+
+    start = time.perf_counter()
+    for _ in range(100):
+        assert store.get_random(AUTHOR) in quotes
+    print('Random quote: {:.6f}s (old implementation: {:.6f}s)'.format((time.perf_counter() - start) / 100, old_time))
+
+    start = time.perf_counter()
+    index = store.get_index(AUTHOR)
+    print('Built word index in {:.3f}s'.format(time.perf_counter() - start))
+    store.append(AUTHOR, 'a new quote about pony')
+    quotes.append('a new quote about pony')
+    assert index.quotes == QUOTES + 1 and store.get(AUTHOR, QUOTES) == quotes[-1]
+
+    # Compare against the statistics the old implementation computed
+    words = [x.strip().strip('?.",;:()[]{}') for x in ' '.join(quotes).split(' ')]
+    words = [x for x in words if not x == '']
+    assert index.words == collections.Counter(words)
+    assert index.total_word_length == sum(len(x) for x in words)
+    assert index.total_length == sum(len(x) for x in quotes)
+    all_words = ' '.join(quotes).lower()
+    assert index.grep_total == len(all_words.split())
+    assert index.grep_words['pony'] == len([w for w in all_words.split() if re.sub(r'\W+', '', w) == 'pony'])
+
+    start = time.perf_counter()
+    found = store.get_many(AUTHOR, index.quotes_containing(['pony', 'lol']))
+    elapsed = time.perf_counter() - start
+    expected = [q for q in quotes if re.search(r'\bpony\b', q, re.I) and re.search(r'\blol\b', q, re.I)]
+    assert found == expected
+    print('Found {} quotes containing "pony" and "lol" in {:.6f}s'.format(len(found), elapsed))
+
+    # Simulate a crash after the quote was written, but before its offset was
+    with open(store.text_file_name(AUTHOR), 'ab') as f:
+        f.write(b'half a quo')
+    store = QuoteStore(tmp)
+    assert store.count(AUTHOR) == QUOTES + 2 and store.get(AUTHOR, QUOTES + 1) == 'half a quo'
+    store.append(AUTHOR, 'after the crash')
+    assert store.get(AUTHOR, QUOTES + 2) == 'after the crash'
+    print('Recovered from crash')
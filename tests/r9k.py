@@ -0,0 +1,139 @@
+# Crude benchmark file, intended to be run from CLI at repository root
+# Compares the HashStore used by R9K against the set of hex digests older versions kept in memory. Prints messages/sec
+# and the memory used per million messages, and checks that both find the same unoriginal messages.
+# Also times the old per-message rewrite of scores.json on a few messages, since it's too slow for a million, and how
+# long add() blocks while new digests are merged into a large sorted file.
+import asyncio
+import hashlib
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from modules.general.r9k import HashStore
+
+MESSAGES = 1000000
+SCORE_MESSAGES = 2000
+SORTED_DIGESTS = 10000000
+MERGE_THRESHOLD = 10000
+
+# Roughly one in four messages is unoriginal
+phrases = ['message{}'.format(random.randrange(MESSAGES * 3)) for _ in range(MESSAGES)]
+
+
+def old_implementation(path):
+    hashes = set()
+    unoriginal = 0
+    with open(os.path.join(path, 'hashes.txt'), 'a') as f:
+        for phrase in phrases:
+            h = hashlib.sha256(phrase.encode('utf-8')).hexdigest()
+            if h in hashes:
+                unoriginal += 1
+            hashes.add(h)
+            f.write(h + '\n')
+    return unoriginal, hashes
+
+
+def hash_store(path, bloom_filter):
+    hashes = HashStore(path, bloom_filter=bloom_filter)
+    unoriginal = 0
+    for phrase in phrases:
+        h = HashStore.digest(phrase)
+        if h in hashes:
+            unoriginal += 1
+        else:
+            hashes.add(h)
+    hashes.flush()
+    return unoriginal, hashes
+
+
+def measure(name, func):
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        unoriginal, hashes = func(tmp)
+        elapsed = time.perf_counter() - start
+        del hashes
+
+    # Run again to measure memory, tracemalloc slows everything down
+    with tempfile.TemporaryDirectory() as tmp:
+        tracemalloc.start()
+        result = func(tmp)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        disk = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp))
+        del result
+
+    scale = 1000000.0 / MESSAGES
+    print('{:>22}: {:9.0f} messages/sec, {:6.1f} MB in memory, {:6.1f} MB on disk per million messages'.format(
+        name, MESSAGES / elapsed, current * scale / 1024 / 1024, disk * scale / 1024 / 1024))
+    return unoriginal
+
+
+expected = measure('set of hex digests', old_implementation)
+assert measure('HashStore', lambda path: hash_store(path, False)) == expected
+assert measure('HashStore + Bloom', lambda path: hash_store(path, True)) == expected
+print('{} of {} messages were unoriginal'.format(expected, MESSAGES))
+
+with tempfile.TemporaryDirectory() as tmp:
+    scores = {'user{}'.format(i): {'score': 0, 'message count': 0} for i in range(500)}
+    start = time.perf_counter()
+    for i in range(SCORE_MESSAGES):
+        scores['user{}'.format(i % 500)]['message count'] += 1
+        with open(os.path.join(tmp, 'scores.json'), 'w') as f:
+            f.write(json.dumps(scores))
+    print('Rewriting scores.json after every message: {:.0f} messages/sec'.format(
+        SCORE_MESSAGES / (time.perf_counter() - start)))
+
+    # Migrating the hex digests of older versions gives the same result
+    _, hashes = old_implementation(tmp)
+    store = HashStore(tmp)
+    assert len(store) == len(hashes) and not os.path.exists(os.path.join(tmp, 'hashes.txt'))
+    assert all(HashStore.digest(phrase) in store for phrase in phrases[:1000])
+    store.close()
+
+
+async def background_merges(path, digests):
+    store = HashStore(path, merge_threshold=MERGE_THRESHOLD)
+    worst = 0
+    for i, digest in enumerate(digests):
+        start = time.perf_counter()
+        store.add(digest)
+        worst = max(worst, time.perf_counter() - start)
+        assert digest in store
+        if i % 100 == 0:
+            await asyncio.sleep(0)
+    while store.is_merging:
+        await asyncio.sleep(0.01)
+    assert len(store) == SORTED_DIGESTS + len(digests) and all(int(d) in store for d in digests)
+    store.close()
+    return worst
+
+
+# Merging new digests into a large sorted file doesn't hold up add() (and with it the event loop)
+with tempfile.TemporaryDirectory() as tmp:
+    rng = np.random.default_rng()
+    digests = np.unique(rng.integers(0, 2**64, SORTED_DIGESTS + 3 * MERGE_THRESHOLD, dtype=np.uint64))
+    rng.shuffle(digests)
+    np.sort(digests[:SORTED_DIGESTS]).tofile(os.path.join(tmp, 'hashes.bin'))
+    new = [int(d) for d in digests[SORTED_DIGESTS:SORTED_DIGESTS + 3 * MERGE_THRESHOLD]]
+
+    start = time.perf_counter()
+    sorted_file = np.memmap(os.path.join(tmp, 'hashes.bin'), dtype=np.uint64, mode='r')
+    merged = np.sort(np.concatenate((sorted_file, np.array(new[:MERGE_THRESHOLD], dtype=np.uint64))), kind='stable')
+    merged.tofile(os.path.join(tmp, 'old.bin'))
+    old = time.perf_counter() - start
+    del merged, sorted_file
+    os.remove(os.path.join(tmp, 'old.bin'))
+
+    worst = asyncio.run(background_merges(tmp, new))
+    print('Merging {} digests into {}: old merge blocked for {:.0f}ms, longest add() {:.1f}ms'.format(
+        MERGE_THRESHOLD, SORTED_DIGESTS, 1000 * old, 1000 * worst))
+    merged = np.fromfile(os.path.join(tmp, 'hashes.bin'), dtype=np.uint64)
+    assert len(merged) > SORTED_DIGESTS and np.all(merged[1:] > merged[:-1])
+    assert sorted(os.listdir(tmp)) == ['hashes.bin', 'hashes.log']
+    assert len(HashStore(tmp)) == len(digests)
+    print('Background merges OK')
@@ -0,0 +1,49 @@
+# Crude benchmark file, intended to be run from CLI at repository root
+# Compares the per-message cost of matching every rule one by one against the RuleEngine, for a growing number of
+# rules. About half of the rules are catch-alls, like on a server running log, seen, r9k, quotes2, etc.
+import random
+import re
+import timeit
+
+from glados.rules import RuleEngine
+
+words = ['goto', 'singleton', 'glados', 'lugaru', 'bagel', 'morgen', 'hmkay', 'straight', 'spelling', 'profile']
+messages = [' '.join(random.choice(words + ['the', 'a', 'is', 'and', 'lol', 'what']) for _ in range(12))
+            for _ in range(1000)]
+
+
+def make_rules(count):
+    rules = list()
+    for i in range(count):
+        if i % 2 == 0:
+            pattern = random.choice(('^.*$', '^(.*)$'))
+        else:
+            pattern = '^.*{}{}.*$'.format(random.choice(words), i)
+        rules.append((None, None, re.compile(pattern, re.IGNORECASE), i % 3 == 0))
+    return rules
+
+
+def match_naive(rules, content, is_command):
+    ret = list()
+    for obj, callback, rule, ignorecommands in rules:
+        if ignorecommands and is_command:
+            continue
+        match = rule.match(content)
+        if match is None:
+            continue
+        ret.append((obj, callback, match))
+    return ret
+
+
+for count in (10, 50, 100, 500, 1000):
+    rules = make_rules(count)
+    engine = RuleEngine(rules)
+    for message in messages:
+        assert [m.group(0) for o, c, m in match_naive(rules, message, False)] == \
+               [m.group(0) for o, c, m in engine.match(message, False)]
+
+    naive = timeit.timeit(lambda: [match_naive(rules, m, False) for m in messages], number=5)
+    indexed = timeit.timeit(lambda: [engine.match(m, False) for m in messages], number=5)
+    per_message = 1e6 / (5 * len(messages))
+    print('{:5d} rules: naive {:8.2f} us/msg, engine {:8.2f} us/msg'.format(
+        count, naive * per_message, indexed * per_message))
@@ -0,0 +1,111 @@
+# Crude benchmark file, intended to be run from CLI at repository root
+# Schedules thousands of jobs, once with a task per job sleeping until it is due (like Announcements used to do) and
+# once with the Scheduler, and prints how many tasks were needed and how late the jobs ran. Then checks that a periodic
+# job doesn't drift, and that jobs survive a restart and are caught up on.
+import asyncio
+import tempfile
+import time
+
+import glados
+
+JOBS = 10000
+SPREAD = 2  # seconds over which the jobs are due
+
+
+async def old_job(due, lateness):
+    await asyncio.sleep(due - time.time())
+    lateness.append(time.time() - due)
+
+
+async def old_periodic(interval, runs):
+    for _ in range(len(runs), 10):
+        await asyncio.sleep(interval)
+        runs.append(time.time())
+        await asyncio.sleep(interval / 2)  # the announcement taking a while to send
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.time() + 0.5
+        dues = [start + SPREAD * i / JOBS for i in range(JOBS)]
+
+        lateness = list()
+        tasks_before = len(asyncio.all_tasks())
+        for due in dues:
+            asyncio.ensure_future(old_job(due, lateness))
+        tasks = len(asyncio.all_tasks()) - tasks_before
+        while len(lateness) < JOBS:
+            await asyncio.sleep(0.1)
+        print('{:>10}: {:6d} tasks, average lateness {:.1f}ms, worst {:.1f}ms'.format(
+            'task each', tasks, 1000 * sum(lateness) / JOBS, 1000 * max(lateness)))
+
+        database = glados.Database(tmp + '/glados.sqlite3')
+        scheduler = glados.Scheduler(database)
+        lateness = list()
+
+        async def handler(job):
+            lateness.append(job.late)
+            await asyncio.sleep(0)
+
+        scheduler.register('bench', handler)
+        start = time.time() + 0.5
+        tasks_before = len(asyncio.all_tasks())
+        for i in range(JOBS):
+            scheduler.schedule('bench', str(i), start + SPREAD * i / JOBS)
+        tasks = len(asyncio.all_tasks()) - tasks_before
+        while len(lateness) < JOBS:
+            await asyncio.sleep(0.1)
+        print('{:>10}: {:6d} tasks, average lateness {:.1f}ms, worst {:.1f}ms'.format(
+            'scheduler', tasks, 1000 * sum(lateness) / JOBS, 1000 * max(lateness)))
+        assert len(scheduler) == 0
+
+        # Periodic jobs stay on schedule even if the handler takes a while
+        interval = 0.1
+        old_runs = list()
+        start = time.time()
+        await old_periodic(interval, old_runs)
+        runs = list()
+
+        async def periodic(job):
+            runs.append(time.time())
+            await asyncio.sleep(interval / 2)
+
+        scheduler.register('periodic', periodic)
+        new_start = time.time()
+        scheduler.schedule('periodic', 'announcement', new_start + interval, interval=interval)
+        while len(runs) < 10:
+            await asyncio.sleep(0.01)
+        scheduler.unschedule('periodic', 'announcement')
+        print('{:>10}: 10th run of a periodic job is {:.0f}ms late with a task, {:.0f}ms with the scheduler'.format(
+            'drift', 1000 * (old_runs[-1] - start - 10 * interval), 1000 * (runs[-1] - new_start - 10 * interval)))
+        assert runs[-1] - new_start - 10 * interval < 0.05
+
+        # Jobs survive a restart. Ones that became due in the meantime are run once, periodic ones stay on schedule.
+        now = time.time()
+        scheduler.schedule('restart', 'once', now + 0.1, data={'message': 'hi'})
+        scheduler.schedule('restart', 'periodic', now + 0.1, interval=1)
+        scheduler.schedule('restart', 'later', now + 3600)
+        scheduler.shutdown()
+        database.close()
+        await asyncio.sleep(2.5)
+
+        database = glados.Database(tmp + '/glados.sqlite3')
+        scheduler = glados.Scheduler(database)
+        assert len(scheduler) == 3
+        ran = list()
+
+        async def restarted(job):
+            ran.append((job.name, job.data, job.late))
+
+        scheduler.register('restart', restarted)
+        await asyncio.sleep(0.1)
+        assert sorted(x[0] for x in ran) == ['once', 'periodic'] and ('once', {'message': 'hi'}) in [x[:2] for x in ran]
+        periodic_job = scheduler.get('restart', 'periodic')
+        assert abs((periodic_job.due - (now + 0.1)) % 1) < 1e-6 and periodic_job.due > time.time()
+        assert [job.name for job in scheduler.jobs('restart')] == ['periodic', 'later']
+        scheduler.shutdown()
+        database.close()
+        print('Restart and catch-up OK')
+
+
+asyncio.run(main())
@@ -0,0 +1,47 @@
+# Crude testing file, intended to be run from CLI at repository root
+# Checks that modifications anywhere in a TrackedDict are noticed, and compares the per-message cost of the old way of
+# detecting changes (comparing the whole settings dict against a copy) against checking the changed flag.
+import copy
+import json
+import time
+
+from glados.settings import TrackedDict, TrackedList
+
+MESSAGES = 10000
+
+changes = list()
+settings = TrackedDict({'modules': {'names': ['bot.help.Help'], 'whitelist': {}}}, lambda: changes.append(1))
+
+settings.setdefault('modules', {})
+assert len(changes) == 0, 'setdefault() on an existing key is not a modification'
+settings['modules']['names'].append('general.log.Log')
+settings['modules']['whitelist'].setdefault('1234', []).append('general.r9k.R9K')
+settings.setdefault('r9k', {}).setdefault('channels', [])
+settings['r9k']['channels'] += ['5678']
+del settings['modules']['whitelist']['1234'][0]
+assert len(changes) == 8, len(changes)  # += counts twice, once for extending and once for assigning
+assert isinstance(settings['r9k']['channels'], TrackedList)
+assert json.loads(json.dumps(settings)) == {
+    'modules': {'names': ['bot.help.Help', 'general.log.Log'], 'whitelist': {'1234': []}},
+    'r9k': {'channels': ['5678']}
+}
+print('Modifications tracked')
+
+# A settings file of a bot on a few hundred servers
+for i in range(500):
+    settings['modules']['whitelist'][str(i)] = ['general.r9k.R9K', 'general.log.Log', 'general.activity.Activity']
+    settings.setdefault('command prefix', {})[str(i)] = '.'
+original = copy.deepcopy(json.loads(json.dumps(settings)))
+
+start = time.perf_counter()
+for _ in range(MESSAGES):
+    assert settings == original
+elapsed = time.perf_counter() - start
+print('Comparing against a copy: {:.2f} us per message'.format(elapsed / MESSAGES * 1e6))
+
+start = time.perf_counter()
+changes.clear()
+for _ in range(MESSAGES):
+    assert not changes
+elapsed = time.perf_counter() - start
+print('Checking the changed flag: {:.2f} us per message'.format(elapsed / MESSAGES * 1e6))
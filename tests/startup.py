@@ -0,0 +1,160 @@
+# Crude benchmark file, intended to be run from CLI at repository root
+# Starts the bot with every module of the default module folders enabled, once importing all of them up front like
+# Bot.load_classlist used to and once loading them on first use, each in a fresh process. Measures the time from
+# importing glados until the modules are instantiated for a server (which is what happens before "Running as"), then
+# checks that stand-ins have the same commands and rules as the modules and load them when called, and that modules that
+# have to do something at startup (like Announcements scheduling announcements from before the scheduler) still do.
+import asyncio
+import inspect
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+FOLDERS = ('bot', 'general', 'mlp', 'gdnet', 'cdfs', 'dffu')
+class_pattern = re.compile(r'^class (\w+)\((?:glados\.)?Module\)', re.MULTILINE)
+
+
+def module_names(modules_path):
+    names = ['bot.modulemanager.ModuleManager']
+    for folder in FOLDERS:
+        for f in sorted(os.listdir(os.path.join(modules_path, folder))):
+            if f.endswith('.py') and f != '__init__.py':
+                with open(os.path.join(modules_path, folder, f)) as source:
+                    for class_name in class_pattern.findall(source.read()):
+                        names.append('{}.{}.{}'.format(folder, f[:-3], class_name))
+    return names
+
+
+def start_bot():
+    start = time.perf_counter()
+    import glados
+    imported = time.perf_counter()
+    bot = glados.Bot()
+    loaded = time.perf_counter()
+    server = SimpleNamespace(id='1', name='bench', members=[], roles=[])
+    s = glados.bot.ServerInstance(bot.client, bot.settings, server, bot.webapp, bot.http, bot.persistence,
+                                  bot.databases, bot.scheduler)
+    s.instantiate_modules(bot.class_list, bot.whitelist)
+    return bot, s, (imported - start, loaded - imported, time.perf_counter() - loaded)
+
+
+def child(mode, folder):
+    modules_path = os.path.abspath('modules')
+    sys.path.insert(0, os.getcwd())
+    os.chdir(folder)
+    with open('settings.json', 'w') as f:
+        f.write(json.dumps({'modules': {'names': module_names(modules_path), 'paths': [modules_path],
+                                        'lazy': mode == 'lazy'},
+                            'permissions': {'bot owner': '0'}}))
+    bot, s, times = start_bot()
+    print(json.dumps({
+        'times': times,
+        'imported': sum(spec.import_time is not None for name, spec in bot.class_list),
+        'classes': len(bot.class_list),
+        'matplotlib': 'matplotlib' in sys.modules,
+        'sys.modules': len(sys.modules)
+    }))
+
+
+async def check_stand_ins(bot, s):
+    import glados
+    for name, spec in bot.class_list:
+        if not spec.is_lazy:
+            continue
+        try:
+            class_ = spec.load_class()
+        except Exception:
+            continue  # missing dependency
+        stand_in = next(obj for obj in s.modules if obj.full_name == name)
+        for attr in ('commands', 'rules', 'bot_rules', 'spamalot', 'owner', 'admin', 'moderator'):
+            real = [(k, getattr(v, attr)) for k, v in inspect.getmembers(class_) if hasattr(v, attr)]
+            lazy = [(k, getattr(v, attr)) for k, v in inspect.getmembers(type(stand_in)) if hasattr(v, attr)]
+            if attr.endswith('rules'):
+                real = [(k, [(r.pattern, r.flags, i) for r, i in v]) for k, v in real]
+                lazy = [(k, [(r.pattern, r.flags, i) for r, i in v]) for k, v in lazy]
+            assert real == lazy, (name, attr, real, lazy)
+
+    sent = list()
+
+    async def send_message(channel, text):
+        sent.append(text)
+
+    bot.client.send_message = send_message
+    ping = next(obj for obj in s.modules if obj.full_name == 'bot.ping.Ping')
+    assert isinstance(ping, glados.LazyModule)
+    message = SimpleNamespace(channel=None)
+    await ping.ball(message, '')
+    assert sent == ['pong'] and not any(isinstance(obj, glados.LazyModule) for obj, c in s.callbacks
+                                        if obj.full_name == 'bot.ping.Ping')
+    await next(c for obj, c in s.callbacks if obj.full_name == 'bot.ping.Ping')(message, '')
+    assert sent == ['pong', 'pong']
+    print('Stand-ins OK')
+
+
+async def check_legacy_announcement(bot):
+    import glados
+    sent = list()
+
+    async def send_message(channel, text):
+        sent.append((channel.id, text))
+
+    bot.client.send_message = send_message
+    bot.client.get_channel = lambda channel_id: SimpleNamespace(id=channel_id)
+    # Written by a version of Announcements that didn't use the scheduler yet
+    os.makedirs(os.path.join('data', '2'))
+    with open(os.path.join('data', '2', 'announcements.json'), 'w') as f:
+        f.write(json.dumps({'1': {'date': '2017-01-01T12:00:00', 'message': 'legacy announcement', 'channel': '42'}}))
+    server = SimpleNamespace(id='2', name='legacy', members=[], roles=[])
+    s = glados.bot.ServerInstance(bot.client, bot.settings, server, bot.webapp, bot.http, bot.persistence,
+                                  bot.databases, bot.scheduler)
+    s.instantiate_modules([(name, spec) for name, spec in bot.class_list
+                           if name in ('general.announcements.Announcements', 'bot.modulemanager.ModuleManager')],
+                          bot.whitelist)
+    announcements = next(obj for obj in s.modules if obj.full_name == 'general.announcements.Announcements')
+    assert not isinstance(announcements, glados.LazyModule)
+    await asyncio.sleep(0.5)
+    assert sent == [('42', 'legacy announcement')], sent
+    print('Legacy announcement OK')
+
+
+async def check_lazy_bot(bot, s):
+    await check_stand_ins(bot, s)
+    await check_legacy_announcement(bot)
+
+
+def main():
+    if len(sys.argv) > 2:
+        child(sys.argv[1], sys.argv[2])
+        return
+
+    for mode in ('eager', 'lazy'):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = subprocess.run([sys.executable, sys.argv[0], mode, tmp], stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL, universal_newlines=True, check=True).stdout
+            result = json.loads(output.strip().split('\n')[-1])
+            import_time, bot_time, instantiate_time = result['times']
+            print('{:>6}: {:5.0f}ms total, {:5.0f}ms importing glados, {:5.0f}ms Bot() (load_classlist), {:4.0f}ms '
+                  'instantiating, {:2d}/{} modules imported, {} entries in sys.modules, matplotlib {}'.format(
+                      mode, 1000 * sum(result['times']), 1000 * import_time, 1000 * bot_time,
+                      1000 * instantiate_time, result['imported'], result['classes'], result['sys.modules'],
+                      'imported' if result['matplotlib'] else 'not imported'))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        modules_path = os.path.abspath('modules')
+        sys.path.insert(0, os.getcwd())
+        os.chdir(tmp)
+        with open('settings.json', 'w') as f:
+            f.write(json.dumps({'modules': {'names': module_names(modules_path), 'paths': [modules_path]},
+                                'permissions': {'bot owner': '0'}}))
+        bot, s, times = start_bot()
+        asyncio.run(check_lazy_bot(bot, s))
+        bot.scheduler.shutdown()
+        bot.databases.close()
+
+
+main()
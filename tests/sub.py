@@ -0,0 +1,133 @@
+# Crude benchmark file, intended to be run from CLI at repository root
+# Matches made up messages against a growing number of made up subscriptions, once by running every regex with the
+# SIGALRM based timeout Sub used to have, and once through the SubscriptionMatcher. Prints messages/sec, then checks
+# that a catastrophic regex is stopped by the RegexSandbox and doesn't block the event loop of the bot.
+import asyncio
+import errno
+import os
+import random
+import re
+import signal
+import tempfile
+import time
+from types import SimpleNamespace
+
+import glados
+from modules.general.sub import Sub, SubscriptionMatcher, RegexSandbox, is_plain
+
+MESSAGES = 200
+
+words = ['apple', 'banana', 'trash', 'can', 'glados', 'pony', 'twilight', 'sparkle', 'code', 'compile', 'error', 'game',
+         'python', 'regex', 'server', 'discord', 'music', 'quote', 'moon', 'sun', 'star', 'cake', 'lie', 'portal']
+words += ['{}{}'.format(random.choice(words), i) for i in range(2000)]
+
+
+class TimeoutError(Exception):
+    pass
+
+
+def old_timeout_match(regex, message, seconds=0.5):
+    def handle_timeout(signum, frame):
+        raise TimeoutError(os.strerror(errno.ETIME))
+    signal.signal(signal.SIGALRM, handle_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        return regex.search(message)
+    finally:
+        signal.alarm(0)
+
+
+def random_subscription():
+    kind = random.randrange(5)
+    if kind == 0:
+        return r'\b' + random.choice(words) + r'\b'
+    if kind == 1:
+        return '({}|{})'.format(random.choice(words), random.choice(words))
+    if kind == 2:
+        return '{} ?{}'.format(random.choice(words), random.choice(words))
+    if kind == 3:
+        return '{}.*{}'.format(random.choice(words), random.choice(words))
+    return random.choice(words) + 's?'
+
+
+def main():
+    messages = [' '.join(random.choice(words[:30] if random.random() < 0.8 else words)
+                         for _ in range(random.randint(3, 30))) for _ in range(MESSAGES)]
+    for count in (10, 100, 1000, 5000):
+        subscriptions = [(re.compile(random_subscription(), re.IGNORECASE), str(i)) for i in range(count)]
+        subscriptions.append((re.compile(r'\d{5}', re.IGNORECASE), 'no literal'))
+
+        start = time.perf_counter()
+        expected = [[x for x in subscriptions if old_timeout_match(x[0], m)] for m in messages]
+        old = MESSAGES / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        matcher = SubscriptionMatcher(subscriptions)
+        built = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = [[x for x in matcher.candidates(m) if x[0].search(m)] for m in messages]
+        new = MESSAGES / (time.perf_counter() - start)
+        assert results == expected
+        print('{:5d} subscriptions: {:8.0f} messages/sec old, {:8.0f} messages/sec matcher (built in {:.3f}s)'.format(
+            count, old, new, built))
+
+    # Case insensitive matches the prefilter has to find, even though the message doesn't contain the literal as is
+    matcher = SubscriptionMatcher([(re.compile('sx', re.IGNORECASE), 'long s'), (re.compile('kelvin', re.IGNORECASE),
+                                                                                  'kelvin')])
+    assert matcher.candidates('\u017fx') == matcher.subscriptions[:1]
+    assert matcher.candidates('\u212aELVIN') == matcher.subscriptions[1:]
+
+    assert not is_plain('(a+)+$') and not is_plain(r'(\w+\s?)*$') and not is_plain('.*.*.*.*.*x')
+    assert is_plain(r'\b(trash can|trashcan)\b') and not is_plain(r'\btrash ?can\b')
+    sandbox = RegexSandbox(timeout=0.5)
+    sandbox.search(['warm up'], '')
+    start = time.perf_counter()
+    results = sandbox.search(['apple', '(a+)+$', 'b+'], 'a' * 40 + '!b')
+    print('Sandbox returned {} after {:.2f}s'.format(results, time.perf_counter() - start))
+    assert results == [False, None, True]
+    asyncio.run(check_event_loop())
+
+
+class Member(SimpleNamespace):
+    __hash__ = object.__hash__
+
+
+async def check_event_loop():
+    # A subscription that takes forever is only noticed by its owner, everyone else keeps getting answers
+    sent = list()
+
+    async def send_message(destination, text):
+        sent.append(text)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        members = [Member(id=str(i), name='member{}'.format(i), nick=None, roles=[]) for i in range(2)]
+        server = SimpleNamespace(id='1', name='server', members=members, roles=[])
+        server_instance = SimpleNamespace(settings={}, local_data_dir=tmp, server=server,
+                                          client=SimpleNamespace(send_message=send_message),
+                                          persistence=glados.JSONStore(), member_index=glados.MemberIndex(server))
+        sub = Sub(server_instance, 'general.sub.Sub')
+        sub.subs['0'] = ['.*.*.*.*.*x']
+        sub._Sub__recompile_regex()
+
+        gaps = list()
+
+        async def tick():
+            last = time.perf_counter()
+            while True:
+                await asyncio.sleep(0.01)
+                gaps.append(time.perf_counter() - last)
+                last = time.perf_counter()
+
+        ticker = asyncio.ensure_future(tick())
+        message = SimpleNamespace(author=members[1], channel=None, content='x' + 'a' * 2000)
+        start = time.perf_counter()
+        await sub.on_message(message, None)
+        ticker.cancel()
+        print('Sub.on_message with ".*.*.*.*.*x" returned after {:.2f}s, event loop blocked for at most {:.3f}s'.format(
+            time.perf_counter() - start, max(gaps)))
+        assert max(gaps) < 0.2 and '0' not in sub.subs and any('Shit regex' in x for x in sent)
+
+
+if __name__ == '__main__':
+    main()